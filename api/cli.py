@@ -0,0 +1,128 @@
+# api/cli.py
+# Headless entry point for batch jobs. Prints JSON to stdout; exits 1 when
+# any user's job failed.
+#
+#   python -m api.cli log-meal --user alice --name Lunch --item banana:1:piece --item oats:50:g
+#   python -m api.cli log-meal --file meals.json        # [{"user", "name", "items", "timestamp"}]
+#   python -m api.cli import-wearable export.csv --user alice [--samples]
+#   python -m api.cli train --all-users [--incremental] [--from-archive]
+#   python -m api.cli predict --user alice --user bob --days 60
+#   python -m api.cli simulate --user alice --scenarios scenarios.json [--adaptive]
+#   python -m api.cli archive --all-users [--dataset meals]
+#   python -m api.cli serve [--host 127.0.0.1] [--port 8765]
+import argparse
+import json
+import logging
+import sys
+
+from api import operations
+from utils.archive import DATASETS
+
+
+def _parse_item(text):
+    # "food:quantity:unit", e.g. "peanut butter:2:tbsp"
+    try:
+        food, quantity, unit = text.rsplit(":", 2)
+        return {"food": food, "quantity": float(quantity), "unit": unit}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected food:quantity:unit, got {text!r}")
+
+
+def _add_user_args(parser):
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--user", action="append", dest="users",
+                       help="act for this user (repeatable; default: single-user data)")
+    group.add_argument("--all-users", action="store_true", help="act for every user under data/users")
+
+
+def _jobs(args, **kwargs):
+    return [{"user": user, **kwargs} for user in operations.resolve_users(users=args.users, all_users=args.all_users)]
+
+
+def _load_json(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless ingest, training and forecasting.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("log-meal", help="log meals (nutrition looked up as in the UI)")
+    _add_user_args(p)
+    p.add_argument("--name")
+    p.add_argument("--item", action="append", type=_parse_item, default=[], help="food:quantity:unit")
+    p.add_argument("--file", help="JSON list of meals, each {user, name, items, timestamp}")
+
+    p = commands.add_parser("import-wearable", help="import a wearable CSV export")
+    _add_user_args(p)
+    p.add_argument("csv_path")
+    p.add_argument("--samples", action="store_true", help="file holds minute-level samples")
+
+    p = commands.add_parser("train", help="train (or refresh) the forecasting models")
+    _add_user_args(p)
+    p.add_argument("--incremental", action="store_true")
+    p.add_argument("--from-archive", action="store_true", help="train on the exported features archive")
+
+    p = commands.add_parser("predict", help="forecast weight and fat%%")
+    _add_user_args(p)
+    p.add_argument("--days", type=int, default=30)
+    p.add_argument("--calories", type=float, help="assume this daily intake instead of the last day's")
+
+    p = commands.add_parser("simulate", help="apply diet scenarios to the forecast")
+    _add_user_args(p)
+    p.add_argument("--scenarios", required=True, help="JSON list of scenarios (see ml/simulation.py)")
+    p.add_argument("--days", type=int, default=30)
+    p.add_argument("--adaptive", action="store_true")
+
+    p = commands.add_parser("archive", help="export history to the Parquet/Arrow archive")
+    _add_user_args(p)
+    p.add_argument("--dataset", action="append", dest="datasets", choices=list(DATASETS), help="default: all")
+
+    p = commands.add_parser("serve", help="run the HTTP API (see api/server.py)")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--workers", type=int, help="request threads")
+
+    args = parser.parse_args(argv)
+    # Cached readers log bare-mode warnings outside `streamlit run`.
+    logging.disable(logging.WARNING)
+
+    if args.command == "serve":
+        from api.server import serve
+        serve(args.host, args.port, args.workers)
+        return 0
+
+    if args.command == "log-meal":
+        if args.file:
+            meals = _load_json(args.file)
+            results = operations.run_bulk(operations.log_meal, [
+                {"user": m.get("user"), "name": m.get("name"), "items": m["items"], "timestamp": m.get("timestamp")}
+                for m in meals
+            ])
+        elif args.item:
+            results = operations.run_bulk(operations.log_meal, _jobs(args, name=args.name, items=args.item))
+        else:
+            parser.error("log-meal needs --item or --file")
+    elif args.command == "import-wearable":
+        results = operations.run_bulk(operations.import_wearable,
+                                      _jobs(args, source=args.csv_path, samples=args.samples))
+    elif args.command == "train":
+        results = operations.run_bulk(operations.train,
+                                      _jobs(args, incremental=args.incremental, archive=args.from_archive))
+    elif args.command == "archive":
+        results = operations.run_bulk(operations.archive, _jobs(args, datasets=args.datasets))
+    elif args.command == "predict":
+        results = operations.run_bulk(operations.predict,
+                                      _jobs(args, days=args.days, calorie_override=args.calories))
+    else:
+        results = operations.run_bulk(operations.simulate_scenarios, _jobs(
+            args, scenarios=_load_json(args.scenarios), days=args.days, adaptive=args.adaptive))
+
+    json.dump(results, sys.stdout, indent=2, default=str)
+    print()
+    return 1 if any("error" in r for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
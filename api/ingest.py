@@ -0,0 +1,336 @@
+# api/ingest.py
+# Push ingestion for live wearable streams. Devices or bridge scripts send
+# one sample per line, either over a raw TCP connection or in the body of
+# HTTP POST /ingest requests:
+#
+#   {"user": "alice", "ts": 1718000000, "heart_rate": 62, "spo2": 97.5, "steps": 12}
+#   wearable,user=alice heart_rate=62,spo2=97.5,steps=12i 1718000000
+#
+# (the second is InfluxDB line protocol; the timestamp may be in s, ms, us
+# or ns and defaults to now; "user" is optional everywhere and means the
+# single-user data). Samples go into a bounded queue; when it is full,
+# readers stop reading, so TCP flow control pushes back on senders. One
+# flusher drains the queue in batches and hands each user's share to that
+# user's database writer (utils/db.py) as one insert_samples transaction,
+# so the hourly and daily rollups stay current.
+#
+#   python -m api.ingest [--tcp-port 8766] [--http-port 8767]
+#   GET /stats on the HTTP port reports counters and queue depth.
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import sys
+import time
+
+import pandas as pd
+
+from utils.cache import bump
+from utils.db import current_db_path, submit_write
+from utils.migrations import ensure_schema
+from utils.users import using_user, validate_user_id
+from utils.wearable_import import SAMPLE_RANGES
+from utils.wearable_store import SAMPLE_COLUMNS, insert_samples
+
+TCP_PORT = 8766
+HTTP_PORT = 8767
+# Samples buffered before readers block.
+QUEUE_SIZE = 50_000
+# A flush writes at most this many samples, or whatever arrived within
+# FLUSH_INTERVAL seconds of the first one.
+BATCH_SIZE = 5_000
+FLUSH_INTERVAL = 0.25
+MAX_LINE_BYTES = 64 * 1024
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+log = logging.getLogger(__name__)
+
+
+def _epoch_seconds(value):
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+            return int(parsed.timestamp())
+    value = float(value)
+    # Line protocol and many devices send ms, us or ns; epoch seconds stay
+    # below 1e11 for the next three millennia.
+    while value >= 1e11:
+        value /= 1000
+    return int(value)
+
+
+def _line_protocol(line):
+    # measurement[,tag=value...] field=value[,field=value...] [timestamp]
+    head, _, rest = line.partition(" ")
+    fields_text, _, ts = rest.strip().partition(" ")
+    tags = dict(tag.split("=", 1) for tag in head.split(",")[1:])
+    fields = {}
+    for field in fields_text.split(","):
+        key, value = field.split("=", 1)
+        fields[key] = float(value[:-1] if value.endswith("i") else value)
+    fields["ts"] = ts.strip() or time.time()
+    if "user" in tags:
+        fields["user"] = tags["user"]
+    return fields
+
+
+def parse_line(line):
+    # Returns (user, sample tuple in SAMPLE_COLUMNS order); ValueError when
+    # the line is malformed or a reading is out of range.
+    line = line.strip()
+    try:
+        record = json.loads(line) if line.startswith("{") else _line_protocol(line)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"unparseable line: {e}")
+    if not isinstance(record, dict) or "ts" not in record:
+        raise ValueError("sample has no ts")
+    user = record.get("user")
+    if user is not None:
+        validate_user_id(user)
+
+    sample = [_epoch_seconds(record["ts"])]
+    for col in SAMPLE_COLUMNS[1:]:
+        value = record.get(col)
+        if value is not None:
+            value = float(value)
+            low, high = SAMPLE_RANGES[col]
+            if not low <= value <= high:
+                raise ValueError(f"{col} out of range")
+        sample.append(value)
+    return user, tuple(sample)
+
+
+class IngestServer:
+    def __init__(self, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = {
+            "received": 0, "rejected": 0, "written": 0, "duplicates": 0, "failed": 0,
+            "flushes": 0, "backpressure_waits": 0, "started": time.time(),
+        }
+        self._schemas = set()
+        # Samples taken off the queue but not yet flushed.
+        self._batch = []
+        # Tasks serving open connections, cancelled on shutdown.
+        self._connections = set()
+
+    async def _accept(self, lines):
+        # Parses and queues lines; returns (accepted, rejected).
+        accepted = rejected = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                item = parse_line(line)
+            except ValueError:
+                rejected += 1
+                continue
+            if self.queue.full():
+                self.stats["backpressure_waits"] += 1
+            await self.queue.put(item)
+            accepted += 1
+        self.stats["received"] += accepted
+        self.stats["rejected"] += rejected
+        return accepted, rejected
+
+    # ---------- transports ----------
+    async def handle_tcp(self, reader, writer):
+        self._connections.add(asyncio.current_task())
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Longer than the stream limit; drop the connection.
+                    self.stats["rejected"] += 1
+                    break
+                if not line:
+                    break
+                await self._accept([line.decode("utf-8", "replace")])
+        except (ConnectionError, asyncio.CancelledError):
+            # Cancelled: shutting down (see close_connections()).
+            pass
+        finally:
+            writer.close()
+            self._connections.discard(asyncio.current_task())
+
+    async def handle_http(self, reader, writer):
+        # Minimal HTTP/1.1 with keep-alive: POST /ingest, GET /stats.
+        self._connections.add(asyncio.current_task())
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "body too large"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                if method == "POST" and path.split("?")[0] == "/ingest":
+                    accepted, rejected = await self._accept(body.decode("utf-8", "replace").splitlines())
+                    await self._respond(writer, 202, {"accepted": accepted, "rejected": rejected})
+                elif method == "GET" and path == "/stats":
+                    await self._respond(writer, 200, self.snapshot())
+                else:
+                    await self._respond(writer, 404, {"error": f"No route {method} {path}"})
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+            self._connections.discard(asyncio.current_task())
+
+    async def close_connections(self):
+        # Ends every open connection, even one blocked reading or waiting
+        # on a full queue, and waits until their handlers have returned.
+        tasks = list(self._connections)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    async def _respond(writer, status, payload, close=False):
+        data = json.dumps(payload).encode()
+        reason = {200: "OK", 202: "Accepted", 404: "Not Found", 413: "Payload Too Large"}[status]
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: {'close' if close else 'keep-alive'}\r\n\r\n".encode()
+            + data
+        )
+        await writer.drain()
+
+    def snapshot(self):
+        elapsed = max(time.time() - self.stats["started"], 1e-9)
+        return {
+            **self.stats,
+            "queued": self.queue.qsize(),
+            "written_per_second": round(self.stats["written"] / elapsed, 1),
+        }
+
+    # ---------- flushing ----------
+    async def _fill(self, batch):
+        loop = asyncio.get_running_loop()
+        batch.append(await self.queue.get())
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                await asyncio.sleep(min(remaining, 0.02))
+
+    async def _write_user(self, user, rows):
+        loop = asyncio.get_running_loop()
+        with using_user(user):
+            db_path = current_db_path()
+        if db_path not in self._schemas:
+            await loop.run_in_executor(None, ensure_schema, db_path)
+            self._schemas.add(db_path)
+        df = pd.DataFrame(rows, columns=SAMPLE_COLUMNS)
+        written = await asyncio.wrap_future(submit_write(lambda conn: insert_samples(conn, df), db_path))
+        with using_user(user):
+            bump("wearable")
+        return written
+
+    async def flush(self, batch):
+        by_user = {}
+        for user, sample in batch:
+            by_user.setdefault(user, []).append(sample)
+        # Users are on separate shards, so their writes run side by side.
+        users = list(by_user)
+        results = await asyncio.gather(*(self._write_user(u, by_user[u]) for u in users),
+                                       return_exceptions=True)
+        for user, result in zip(users, results):
+            if isinstance(result, BaseException):
+                log.error("Flush for user %s failed: %s", user, result)
+                self.stats["failed"] += len(by_user[user])
+            else:
+                self.stats["written"] += result
+                self.stats["duplicates"] += len(by_user[user]) - result
+        self.stats["flushes"] += 1
+
+    async def flusher(self):
+        while True:
+            self._batch = []
+            await self._fill(self._batch)
+            await self.flush(self._batch)
+
+    async def drain(self):
+        # Flushes the interrupted batch and whatever is still queued (used
+        # on shutdown). Re-sending samples is harmless: stored ts are skipped.
+        batch = self._batch
+        while batch or not self.queue.empty():
+            while not self.queue.empty() and len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+            await self.flush(batch)
+            batch = self._batch = []
+
+
+async def run(host="127.0.0.1", tcp_port=TCP_PORT, http_port=HTTP_PORT, ready=None, **options):
+    # Serves until cancelled; queued samples are flushed before returning.
+    # ready(servers), if given, is called once the sockets are listening.
+    ingest = IngestServer(**options)
+    servers = []
+    if tcp_port is not None:
+        servers.append(await asyncio.start_server(ingest.handle_tcp, host, tcp_port, limit=MAX_LINE_BYTES))
+    if http_port is not None:
+        servers.append(await asyncio.start_server(ingest.handle_http, host, http_port, limit=MAX_LINE_BYTES))
+    for server in servers:
+        for sock in server.sockets:
+            log.info("Listening on %s:%d", *sock.getsockname()[:2])
+    if ready is not None:
+        ready(servers)
+    flusher = asyncio.create_task(ingest.flusher())
+    try:
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+    finally:
+        for server in servers:
+            server.close()
+        await ingest.close_connections()
+        flusher.cancel()
+        await asyncio.gather(flusher, return_exceptions=True)
+        await ingest.drain()
+        log.info("Stopped: %s", ingest.snapshot())
+    return ingest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest live wearable samples over TCP and HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--tcp-port", type=int, default=TCP_PORT)
+    parser.add_argument("--http-port", type=int, default=HTTP_PORT)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", stream=sys.stderr)
+    try:
+        asyncio.run(run(args.host, args.tcp_port, args.http_port, queue_size=args.queue_size,
+                        batch_size=args.batch_size, flush_interval=args.flush_interval))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
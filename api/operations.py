@@ -0,0 +1,127 @@
+# api/operations.py
+# Headless operations shared by the CLI (api/cli.py) and the HTTP API
+# (api/server.py). Each acts for one user (None = the single-user data,
+# see utils/users.py), calls the same data-access and ml/ functions as the
+# Streamlit pages, and returns plain JSON-serializable values. run_bulk()
+# fans one operation out over many users.
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ml.simulation import rank_scenarios, simulate
+from ml.xgboost_model import load_training_data, predict_future, train_xgb_models
+from utils.archive import export_all
+from utils.database import save_meal_log
+from utils.nutrition import get_nutrition_info
+from utils.users import list_users, using_user
+from utils.wearable_import import CHUNKSIZE, import_wearable_csv
+
+# Threads used by run_bulk. Users are on separate shards, so their writes
+# and fits proceed in parallel.
+BULK_WORKERS = 4
+# Rejected rows echoed back per import; the count is always exact.
+MAX_RETURNED_REJECTS = 100
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    # Long-lived, so its threads keep their warm read connections.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=BULK_WORKERS, thread_name_prefix="bulk")
+        return _pool
+
+
+def resolve_users(user=None, users=None, all_users=False):
+    # The users a request targets; [None] means the single-user data.
+    if all_users:
+        return list_users()
+    if users:
+        return list(users)
+    return [user]
+
+
+def run_bulk(fn, jobs):
+    # fn(**job) for every job (each with its own "user"). A failing job is
+    # reported in place of its result instead of failing the batch.
+    def one(job):
+        try:
+            return fn(**job)
+        except Exception as e:
+            return {"user": job.get("user"), "error": str(e)}
+    return list(_get_pool().map(one, jobs))
+
+
+def _training_frame(archive=False):
+    df = load_training_data(archive=archive)
+    if len(df) < 2:
+        raise ValueError("Not enough body metrics to train on; log at least two days.")
+    return df
+
+
+def _forecast(df, days, calorie_override=None):
+    # Reuses the stored (and in-memory) models unless the data changed.
+    models = train_xgb_models(df)
+    return predict_future(models, df, days, calorie_override)
+
+
+def log_meal(user, name, items, timestamp=None, nutrition=None):
+    # items: [{"food", "quantity", "unit"}]; nutrition is looked up when
+    # not given, exactly as the meal logger page does.
+    with using_user(user):
+        nutrition = nutrition or get_nutrition_info(items)
+        save_meal_log(name or "Unnamed Meal", items, nutrition, timestamp or datetime.datetime.now())
+    return {"user": user, "name": name, "nutrition": nutrition}
+
+
+def import_wearable(user, source, samples=False, chunksize=CHUNKSIZE):
+    # source: CSV path or file-like, in the wearable_data page's format
+    # (or minute-level samples).
+    with using_user(user):
+        report = import_wearable_csv(source, chunksize, samples=samples)
+    report["rejects"] = report["rejects"][:MAX_RETURNED_REJECTS]
+    return {"user": user, **report}
+
+
+def train(user, incremental=False, archive=False):
+    # archive=True trains on the last exported features archive.
+    with using_user(user):
+        df = _training_frame(archive)
+        models = train_xgb_models(df, incremental=incremental)
+    return {"user": user, "rows": len(df), "targets": sorted(models)}
+
+
+def predict(user, days=30, calorie_override=None):
+    with using_user(user):
+        future = _forecast(_training_frame(), days, calorie_override)
+    future["date"] = future["date"].dt.strftime("%Y-%m-%d")
+    return {"user": user, "forecast": future.drop(columns=["day"]).to_dict("records")}
+
+
+def simulate_scenarios(user, scenarios, days=30, adaptive=False, labels=None):
+    # scenarios: lists of ml/simulation.py entries, all applied to the
+    # user's weight forecast.
+    with using_user(user):
+        future = _forecast(_training_frame(), days)
+        if "weight" not in future:
+            raise ValueError("No weight model: body metrics are missing weights.")
+        baseline = future["weight"].to_numpy()
+        trajectories = simulate(baseline, scenarios, adaptive=adaptive)
+    ranking = rank_scenarios(trajectories, baseline, labels)
+    return {
+        "user": user,
+        "dates": future["date"].dt.strftime("%Y-%m-%d").tolist(),
+        "baseline": baseline.tolist(),
+        "trajectories": trajectories.tolist(),
+        "ranking": ranking.to_dict("records"),
+    }
+
+
+def archive(user, datasets=None):
+    # Re-exports the user's history to the Parquet/Arrow archive.
+    manifests = export_all(user, datasets)
+    return {"user": user, "datasets": {m["dataset"]: {"rows": m["rows"], "partitions": m["partitions"]}
+                                       for m in manifests}}
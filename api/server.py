@@ -0,0 +1,231 @@
+# api/server.py
+# Local JSON-over-HTTP API around api/operations.py. One long-lived
+# process keeps trained models (ml/model_registry.py) and per-thread SQLite
+# connections warm across requests; requests run on a fixed thread pool so
+# those connections are reused instead of dying with a thread per request.
+#
+#   python -m api.cli serve --port 8765
+#
+#   GET  /health
+#   GET  /users
+#   POST /meals      {"user", "name", "items", "timestamp"?}  or  {"meals": [...]}
+#   POST /wearable?user=alice[&samples=1]     body: the CSV file
+#   POST /train      {"user" | "users" | "all_users", "incremental"?, "archive"?}
+#   POST /predict    {"user" | "users" | "all_users", "days"?, "calorie_override"?}
+#   POST /simulate   {"user" | "users" | "all_users", "scenarios", "days"?, "adaptive"?, "labels"?}
+#   GET  /export?dataset=meals[&user=alice][&format=csv|parquet]   streams the file
+#   POST /archive    {"user" | "users" | "all_users", "datasets"?}   refreshes the Parquet/Arrow archive
+#
+# Requests naming one "user" get that user's result; "users"/"all_users"
+# get {"results": [...]}, one entry per user.
+import json
+import logging
+import os
+import socketserver
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from api import operations
+from ml import model_registry
+from utils.archive import DATASETS, iter_export
+from utils.users import list_users, validate_user_id
+
+# Request threads; each keeps up to utils.db.MAX_THREAD_CONNECTIONS shards open.
+WORKERS = 8
+# Models kept deserialized; a server shared by many users wants more than
+# the Streamlit default.
+MEMORY_MODELS = 256
+# Uploads are spooled to disk past this size.
+SPOOL_BYTES = 8 * 1024 * 1024
+
+log = logging.getLogger(__name__)
+
+
+class _BadRequest(Exception):
+    pass
+
+
+def _targets(body):
+    # (users, bulk) for a request body.
+    users = operations.resolve_users(body.get("user"), body.get("users"), body.get("all_users", False))
+    for user in users:
+        if user is not None:
+            validate_user_id(user)
+    return users, "users" in body or body.get("all_users", False)
+
+
+def _per_user(fn, body, **kwargs):
+    users, bulk = _targets(body)
+    if not bulk:
+        return fn(user=users[0], **kwargs)
+    return {"results": operations.run_bulk(fn, [{"user": user, **kwargs} for user in users])}
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "FitnessAPI/1"
+
+    def _send(self, status, payload):
+        data = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _json_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            raise _BadRequest(f"Invalid JSON: {e}")
+        if not isinstance(body, dict):
+            raise _BadRequest("Expected a JSON object.")
+        return body
+
+    def _handle(self, routes):
+        url = urlsplit(self.path)
+        route = routes.get(url.path)
+        if route is None:
+            self._send(404, {"error": f"No route {self.command} {url.path}"})
+            return
+        try:
+            result = route(self, parse_qs(url.query))
+            # Streaming routes write their own response and return None.
+            if result is not None:
+                self._send(200, result)
+        except (_BadRequest, ValueError, KeyError, TypeError) as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            log.exception("%s %s failed", self.command, url.path)
+            self._send(500, {"error": str(e)})
+
+    def do_GET(self):
+        self._handle(GET_ROUTES)
+
+    def do_POST(self):
+        self._handle(POST_ROUTES)
+
+    # ---------- routes ----------
+    def health(self, query):
+        return {"status": "ok"}
+
+    def users(self, query):
+        return {"users": list_users()}
+
+    def export(self, query):
+        user = query.get("user", [None])[0]
+        if user is not None:
+            validate_user_id(user)
+        dataset = query.get("dataset", [""])[0]
+        if dataset not in DATASETS:
+            raise _BadRequest(f"Unknown dataset {dataset!r}; one of {', '.join(DATASETS)}.")
+        fmt = query.get("format", ["csv"])[0]
+        if fmt not in ("csv", "parquet"):
+            raise _BadRequest(f"Unknown format {fmt!r}; use csv or parquet.")
+        # Written chunk by chunk as the rows are read, so the response never
+        # sits in memory whole. Without a length, the body ends when the
+        # connection closes. The first chunk is produced before the headers
+        # go out, so most failures still get a proper error status.
+        chunks = iter_export(dataset, fmt, user)
+        first = next(chunks, b"")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv" if fmt == "csv" else "application/vnd.apache.parquet")
+        self.send_header("Content-Disposition", f'attachment; filename="{user or "data"}_{dataset}.{fmt}"')
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        self.wfile.write(first)
+        for chunk in chunks:
+            self.wfile.write(chunk)
+
+    def meals(self, query):
+        body = self._json_body()
+        if "meals" not in body:
+            return operations.log_meal(body.get("user"), body.get("name"), body["items"], body.get("timestamp"))
+        jobs = [{"user": m.get("user"), "name": m.get("name"), "items": m["items"],
+                 "timestamp": m.get("timestamp")} for m in body["meals"]]
+        for job in jobs:
+            if job["user"] is not None:
+                validate_user_id(job["user"])
+        return {"results": operations.run_bulk(operations.log_meal, jobs)}
+
+    def wearable(self, query):
+        user = query.get("user", [None])[0]
+        if user is not None:
+            validate_user_id(user)
+        samples = query.get("samples", ["0"])[0] not in ("0", "false", "")
+        length = int(self.headers.get("Content-Length") or 0)
+        # The CSV is streamed to a spooled file so large exports never sit
+        # in memory whole, then parsed in chunks by the importer.
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as upload:
+            remaining = length
+            while remaining:
+                chunk = self.rfile.read(min(remaining, 1 << 16))
+                if not chunk:
+                    raise _BadRequest("Upload ended early.")
+                upload.write(chunk)
+                remaining -= len(chunk)
+            upload.seek(0)
+            return operations.import_wearable(user, upload, samples=samples)
+
+    def train(self, query):
+        body = self._json_body()
+        return _per_user(operations.train, body, incremental=bool(body.get("incremental")),
+                         archive=bool(body.get("archive")))
+
+    def predict(self, query):
+        body = self._json_body()
+        return _per_user(operations.predict, body, days=int(body.get("days", 30)),
+                         calorie_override=body.get("calorie_override"))
+
+    def archive(self, query):
+        body = self._json_body()
+        return _per_user(operations.archive, body, datasets=body.get("datasets"))
+
+    def simulate(self, query):
+        body = self._json_body()
+        return _per_user(operations.simulate_scenarios, body, scenarios=body["scenarios"],
+                         days=int(body.get("days", 30)), adaptive=bool(body.get("adaptive")),
+                         labels=body.get("labels"))
+
+
+GET_ROUTES = {"/health": Handler.health, "/users": Handler.users, "/export": Handler.export}
+POST_ROUTES = {
+    "/meals": Handler.meals,
+    "/wearable": Handler.wearable,
+    "/train": Handler.train,
+    "/predict": Handler.predict,
+    "/simulate": Handler.simulate,
+    "/archive": Handler.archive,
+}
+
+
+class APIServer(socketserver.ThreadingMixIn, HTTPServer):
+    # ThreadingMixIn's per-request handling, run on a fixed pool.
+    daemon_threads = True
+
+    def __init__(self, address, workers=WORKERS):
+        super().__init__(address, Handler)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def serve(host="127.0.0.1", port=8765, workers=None):
+    model_registry.MAX_MEMORY_MODELS = max(model_registry.MAX_MEMORY_MODELS, MEMORY_MODELS)
+    server = APIServer((host, port), workers or WORKERS)
+    print(f"Serving on http://{host}:{server.server_address[1]} (pid {os.getpid()})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
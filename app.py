@@ -1,39 +1,34 @@
+import importlib
+
 import streamlit as st
-from pages.dashboard import show_dashboard
-from pages.log_meal import show_meal_logger
-from pages.log_workout import show_workout_logger
-from pages.log_supplement import show_supplement_logger
-from pages.progress_tracker import show_progress_tracker
-from pages.ai_predictions import show_ai_predictions
-from pages.body_metrics import show_body_metrics
-from util.db_utils import init_simulation_table
-init_simulation_table()
 
+from utils.db_utils import init_simulation_table
+from utils.users import select_user
 
 st.set_page_config(page_title="Fitness & Nutrition Tracker", layout="wide")
 
+# Sidebar label -> (module, render function). A page's module, and the ML
+# and plotting libraries it pulls in, are only imported once it is opened.
+PAGES = {
+    "Dashboard": ("pages.dashboard", "show_dashboard"),
+    "Log Meal": ("pages.log_meal", "show_meal_logger"),
+    "Log Workout": ("pages.log_workout", "show_workout_logger"),
+    "Log Supplement": ("pages.log_supplement", "show_supplement_logger"),
+    "Progress Tracker": ("pages.progress_tracker", "show_progress_tracker"),
+    "AI Predictions": ("pages.ai_predictions", "show_ai_predictions"),
+    "Body Metrics": ("pages.body_metrics", "show_body_metrics"),
+}
+
+
+def load_page(label):
+    module_name, func_name = PAGES[label]
+    return getattr(importlib.import_module(module_name), func_name)
+
+
 st.sidebar.title("🏋️ Navigation")
-tab = st.sidebar.radio("Go to", [
-    "Dashboard",
-    "Log Meal",
-    "Log Workout",
-    "Log Supplement",
-    "Progress Tracker",
-    "AI Predictions",
-    "Body Metrics",
-])
-
-if tab == "Dashboard":
-    show_dashboard()
-elif tab == "Log Meal":
-    show_meal_logger()
-elif tab == "Log Workout":
-    show_workout_logger()
-elif tab == "Log Supplement":
-    show_supplement_logger()
-elif tab == "Progress Tracker":
-    show_progress_tracker()
-elif tab == "AI Predictions":
-    show_ai_predictions()
-elif tab == "Body Metrics":
-    show_body_metrics()
+select_user()
+init_simulation_table()
+
+tab = st.sidebar.radio("Go to", list(PAGES))
+
+load_page(tab)()
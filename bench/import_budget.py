@@ -0,0 +1,97 @@
+# bench/import_budget.py
+# Cold-start import check. Each target is imported in a fresh interpreter
+# (so nothing is already cached in sys.modules) from an empty scratch
+# directory, timed, and checked for heavy libraries that should only load
+# once a page actually needs them.
+#
+#   python -m bench.import_budget
+#   python -m bench.import_budget --budget app=1.5 --runs 5
+#
+# Exits with status 1 when any target is over budget or pulled in a
+# deferred library.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds, best of --runs. Streamlit plus pandas account for about 1s of
+# each; xgboost or scikit-learn alone would add 2s more.
+BUDGETS = {
+    "app": 2.0,
+    "pages.ai_predictions": 2.0,
+    "pages.Predictions_And_Trends": 2.0,
+    "pages.wearable_data": 2.0,
+    "pages.Body_Metrics": 2.0,
+    "pages.log_meal": 2.0,
+    "pages.Meal_Logger": 2.0,
+    "pages.Diagnostics": 2.0,
+}
+DEFAULT_RUNS = 3
+
+# Imported by the code paths that use them, never at startup. (Streamlit
+# itself loads plotly.graph_objects; plotly.express is the costly part.)
+DEFERRED = ["xgboost", "sklearn", "plotly.express", "matplotlib"]
+
+_PROBE = """
+import json, logging, sys, time
+sys.path.insert(0, {root!r})
+logging.disable(logging.WARNING)
+start = time.perf_counter()
+__import__({target!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed,
+                  "deferred": sorted(m for m in {deferred!r} if m in sys.modules)}}))
+"""
+
+
+def measure(target, runs=DEFAULT_RUNS):
+    # Returns {"seconds": best of runs, "deferred": libraries that loaded}.
+    best = None
+    with tempfile.TemporaryDirectory(prefix="import-budget-") as work:
+        # app.py creates the schema under ./data on startup.
+        os.makedirs(os.path.join(work, "data"))
+        code = _PROBE.format(root=REPO_ROOT, target=target, deferred=DEFERRED)
+        for _ in range(runs):
+            out = subprocess.run([sys.executable, "-c", code], cwd=work, check=True,
+                                 capture_output=True, text=True).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            if best is None or result["seconds"] < best["seconds"]:
+                best = result
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail when cold-start imports go over budget.")
+    parser.add_argument("--budget", action="append", default=[], metavar="TARGET=SECONDS",
+                        help="override or add a target's budget (repeatable)")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--only", action="append", help="check only these targets")
+    args = parser.parse_args(argv)
+
+    budgets = dict(BUDGETS)
+    for item in args.budget:
+        target, _, seconds = item.partition("=")
+        budgets[target] = float(seconds)
+    if args.only:
+        budgets = {t: budgets[t] for t in args.only}
+
+    failed = False
+    for target, budget in budgets.items():
+        result = measure(target, args.runs)
+        problems = []
+        if result["seconds"] > budget:
+            problems.append(f"over budget ({budget:.2f}s)")
+        if result["deferred"]:
+            problems.append(f"imported {', '.join(result['deferred'])}")
+        failed = failed or bool(problems)
+        status = "FAIL " + "; ".join(problems) if problems else "ok"
+        print(f"{target:32} {result['seconds']:6.2f}s  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
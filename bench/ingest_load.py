@@ -0,0 +1,149 @@
+# bench/ingest_load.py
+# Local load generator for the ingestion server (api/ingest.py). Simulates
+# devices that each stream minute-level samples for one user, at a fixed
+# total rate, over TCP or HTTP, then reads the server's /stats to report
+# how much was written and how far the writer lagged behind.
+#
+#   python -m api.ingest &
+#   python -m bench.ingest_load --devices 20 --rate 5000 --seconds 10
+#   python -m bench.ingest_load --transport http --format line --batch 500
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from api.ingest import HTTP_PORT, TCP_PORT
+
+DEFAULT_DEVICES = 10
+DEFAULT_RATE = 2000
+DEFAULT_SECONDS = 10
+# Samples per write (TCP) or per request (HTTP).
+DEFAULT_BATCH = 200
+# Seconds to wait for the server to catch up after sending stops.
+DRAIN_TIMEOUT = 60
+
+
+def sample_line(user, ts, fmt, rng):
+    heart_rate = round(rng.gauss(70, 8), 1)
+    spo2 = round(min(100.0, rng.gauss(97, 1)), 1)
+    steps = rng.randint(0, 120)
+    if fmt == "line":
+        return f"wearable,user={user} heart_rate={heart_rate},spo2={spo2},steps={steps}i {ts}\n"
+    return json.dumps({"user": user, "ts": ts, "heart_rate": heart_rate, "spo2": spo2, "steps": steps}) + "\n"
+
+
+async def _http_request(reader, writer, method, path, body=b""):
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    await reader.readline()
+    length = 0
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b""):
+            break
+        name, _, value = header.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return json.loads(await reader.readexactly(length))
+
+
+async def device(index, args, per_device_rate, deadline, sent):
+    # One connection per device; paces itself to per_device_rate samples/s.
+    rng = random.Random(index)
+    user = f"{args.user_prefix}{index % args.users}"
+    # Distinct minutes per device so nothing is dropped as a duplicate.
+    ts = args.start + index * 10_000_000 * 60
+    port = args.tcp_port if args.transport == "tcp" else args.http_port
+    reader, writer = await asyncio.open_connection(args.host, port)
+    interval = args.batch / per_device_rate
+    next_send = time.perf_counter()
+    try:
+        while time.perf_counter() < deadline:
+            lines = []
+            for _ in range(args.batch):
+                lines.append(sample_line(user, ts, args.format, rng))
+                ts += 60
+            payload = "".join(lines).encode()
+            if args.transport == "tcp":
+                writer.write(payload)
+                # Blocks while the server applies backpressure.
+                await writer.drain()
+            else:
+                await _http_request(reader, writer, "POST", "/ingest", payload)
+            sent[index] += args.batch
+            next_send += interval
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+    finally:
+        writer.close()
+
+
+def _processed(stats):
+    return stats["written"] + stats["duplicates"] + stats["failed"] + stats["rejected"]
+
+
+async def stats(args):
+    reader, writer = await asyncio.open_connection(args.host, args.http_port)
+    try:
+        return await _http_request(reader, writer, "GET", "/stats")
+    finally:
+        writer.close()
+
+
+async def run(args):
+    before = await stats(args)
+    sent = [0] * args.devices
+    start = time.perf_counter()
+    deadline = start + args.seconds
+    await asyncio.gather(*(device(i, args, args.rate / args.devices, deadline, sent) for i in range(args.devices)))
+    send_seconds = time.perf_counter() - start
+
+    # Wait for the server to process everything that was sent.
+    target = _processed(before) + sum(sent)
+    give_up = time.perf_counter() + DRAIN_TIMEOUT
+    while True:
+        after = await stats(args)
+        if _processed(after) >= target and after["queued"] == 0:
+            break
+        if time.perf_counter() > give_up:
+            print(f"Server still behind after {DRAIN_TIMEOUT}s; reporting partial results.", file=sys.stderr)
+            break
+        await asyncio.sleep(0.1)
+    total_seconds = time.perf_counter() - start
+    written = after["written"] - before["written"]
+    return {
+        "sent": sum(sent),
+        "send_rate": round(sum(sent) / send_seconds, 1),
+        "written": written,
+        "rejected": after["rejected"] - before["rejected"],
+        "write_rate": round(written / total_seconds, 1),
+        "drain_lag_seconds": round(total_seconds - send_seconds, 3),
+        "backpressure_waits": after["backpressure_waits"] - before["backpressure_waits"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate wearable sample load for api/ingest.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--tcp-port", type=int, default=TCP_PORT)
+    parser.add_argument("--http-port", type=int, default=HTTP_PORT, help="also used for /stats")
+    parser.add_argument("--transport", choices=["tcp", "http"], default="tcp")
+    parser.add_argument("--format", choices=["json", "line"], default="json")
+    parser.add_argument("--devices", type=int, default=DEFAULT_DEVICES)
+    parser.add_argument("--users", type=int, default=DEFAULT_DEVICES, help="devices are spread over this many users")
+    parser.add_argument("--user-prefix", default="load_")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="total samples per second")
+    parser.add_argument("--seconds", type=float, default=DEFAULT_SECONDS)
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH)
+    parser.add_argument("--start", type=int, default=1_600_000_000, help="first sample's epoch seconds")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+# bench/run.py
+# Benchmark suite for the data and model hot paths. Runs against one
+# synthetic (or real) user directory, writes results as JSON and flags
+# regressions against a previous results file.
+#
+#   python -m bench.synthetic /tmp/bench --years 3
+#   python -m bench.run --data /tmp/bench/user_0 --out base.json
+#   ... change code ...
+#   python -m bench.run --data /tmp/bench/user_0 --out new.json --baseline base.json
+#
+# Exits with status 1 when any benchmark's median is slower than the
+# baseline's by more than --tolerance.
+import argparse
+import datetime
+import importlib
+import json
+import logging
+import os
+import shutil
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS = {}
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.2
+
+
+def benchmark(name, number=1):
+    # Registers a setup function that returns the callable to time.
+    # `number` calls of it make up one measured repeat.
+    def register(setup):
+        BENCHMARKS[name] = (setup, number)
+        return setup
+    return register
+
+
+def _page(name):
+    # Importing a page only defines its helpers; nothing renders.
+    return importlib.import_module(f"pages.{name}")
+
+
+def _fresh_model_dir():
+    from ml import model_registry
+    model_registry.MODEL_DIR = tempfile.mkdtemp(prefix="bench-models-")
+    model_registry._memory.clear()
+
+
+@benchmark("load_training_data")
+def _load_training_data():
+    from ml.xgboost_model import load_training_data
+    return load_training_data
+
+
+@benchmark("train_xgb_models[cold]")
+def _train_cold():
+    from ml.xgboost_model import load_training_data, train_xgb_models
+    df = load_training_data()
+
+    def run():
+        _fresh_model_dir()
+        train_xgb_models(df)
+    return run
+
+
+@benchmark("train_xgb_models[cached]")
+def _train_cached():
+    from ml.xgboost_model import load_training_data, train_xgb_models
+    df = load_training_data()
+    train_xgb_models(df)
+    return lambda: train_xgb_models(df)
+
+
+@benchmark("predict_future[xgboost_model]", number=20)
+def _predict_xgb():
+    from ml.xgboost_model import load_training_data, predict_future, train_xgb_models
+    df = load_training_data()
+    models = train_xgb_models(df)
+    return lambda: predict_future(models, df, 30)
+
+
+@benchmark("predict_future[ai_predictions]")
+def _predict_page():
+    page = _page("ai_predictions")
+    df = page.load_metrics()
+    page.predict_future(df, target_days=30)
+    return lambda: page.predict_future(df, target_days=30)
+
+
+@benchmark("get_nutrition_info", number=50)
+def _nutrition():
+    from utils.database import get_meal_templates
+    from utils.nutrition import get_nutrition_info
+    items = [
+        {"food": i["food"], "quantity": i.get("qty", i.get("quantity")), "unit": i["unit"]}
+        for i in next(iter(get_meal_templates().values()))
+    ]
+    return lambda: get_nutrition_info(items)
+
+
+@benchmark("get_template_nutrition", number=50)
+def _template_nutrition():
+    from utils.database import get_meal_templates, get_template_nutrition
+    name = next(iter(get_meal_templates()))
+    return lambda: get_template_nutrition(name)
+
+
+@benchmark("insert_wearable_data")
+def _insert_wearable():
+    import numpy as np
+    import pandas as pd
+    page = _page("wearable_data")
+    days = pd.date_range(end=datetime.date.today(), periods=365)
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "date": days.strftime("%Y-%m-%d"),
+        "heart_rate_avg": rng.normal(65, 5, len(days)),
+        "spo2_avg": rng.normal(97, 1, len(days)),
+        "sleep_hours": rng.normal(7, 1, len(days)),
+        "steps": rng.integers(2000, 15000, len(days)),
+    })
+    return lambda: page.insert_wearable_data(df)
+
+
+@benchmark("decimate[lttb, 500k points]")
+def _decimate():
+    import numpy as np
+    import pandas as pd
+    from utils.charts import decimate
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "ts": pd.date_range("2024-01-01", periods=500_000, freq="min"),
+        "heart_rate": 65 + np.cumsum(rng.normal(0, 0.1, 500_000)),
+    })
+    return lambda: decimate(df, "ts", ["heart_rate"], 1_400)
+
+
+@benchmark("save_meal_log", number=50)
+def _save_meal():
+    from utils.database import get_meal_templates, save_meal_log
+    items = next(iter(get_meal_templates().values()))
+    nutrition = {"calories": 500.0, "protein": 30.0, "carbs": 50.0, "fats": 20.0}
+    return lambda: save_meal_log("Bench meal", items, nutrition, datetime.datetime.now())
+
+
+def run_benchmark(name, repeat=DEFAULT_REPEAT):
+    setup, number = BENCHMARKS[name]
+    fn = setup()
+    fn()  # warm-up: imports, caches, first-touch I/O
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "timings": timings,
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    # {name: ratio} of current/baseline medians that exceed 1 + tolerance.
+    regressions = {}
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get("median"):
+            continue
+        ratio = result["median"] / base["median"]
+        if ratio > 1 + tolerance:
+            regressions[name] = ratio
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite.")
+    parser.add_argument("--data", help="user directory containing data/ (default: generate 1 year in a temp dir)")
+    parser.add_argument("--out", default="bench-results.json")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--only", nargs="*", help="benchmark names to run")
+    args = parser.parse_args(argv)
+
+    out_path = os.path.abspath(args.out)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+
+    data_dir = args.data
+    work_dir = tempfile.mkdtemp(prefix="bench-data-")
+    if data_dir is None:
+        from bench.synthetic import generate_user
+        generate_user(work_dir)
+    else:
+        # Benchmarks write; work on a copy so every run starts from the same data.
+        shutil.copytree(os.path.join(data_dir, "data"), os.path.join(work_dir, "data"))
+    # The app resolves data/... relative to the working directory.
+    os.chdir(work_dir)
+    _fresh_model_dir()
+    # Cached readers log bare-mode warnings outside `streamlit run`.
+    logging.disable(logging.WARNING)
+
+    names = args.only or list(BENCHMARKS)
+    results = {}
+    for name in names:
+        results[name] = run_benchmark(name, args.repeat)
+        print(f"{name:<34} median {results[name]['median'] * 1000:10.3f} ms", file=sys.stderr)
+
+    payload = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "data": os.path.abspath(data_dir) if data_dir else None,
+        },
+        "results": results,
+    }
+
+    regressions = compare(results, baseline, args.tolerance) if baseline else {}
+    payload["regressions"] = regressions
+    with open(out_path, "w") as f:
+        json.dump(payload, f, indent=2)
+
+    for name, ratio in regressions.items():
+        print(f"REGRESSION {name}: {ratio:.2f}x baseline median", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+# bench/synthetic.py
+# Synthetic data for benchmarks: per user, a data/ directory holding
+# user_data.db (body metrics, meals, wearable data), food_db.json and
+# meal_templates.json, laid out like the app's own data/ directory.
+#
+#   python -m bench.synthetic OUT_DIR --users 2 --years 3 --wearable minute
+#
+# The app is single-user, so each user gets a separate tree
+# OUT_DIR/user_<i>/; run the app or benchmarks from inside one of them.
+import argparse
+import datetime
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.database import _INSERT_MEAL, _meal_row
+from utils.db import run_write
+from utils.migrations import ensure_schema
+from utils.wearable_import import write_wearable_rows
+from utils.wearable_store import insert_samples
+
+FOOD_UNITS = ["g", "g", "g", "ml", "piece", "tbsp", "cup", "slice"]
+SAMPLE_CHUNK_DAYS = 30
+
+
+def make_foods(n_foods, rng):
+    # {name: {"calories","protein","carbs","fats"}} per 100 g.
+    protein = rng.uniform(0, 30, n_foods)
+    carbs = rng.uniform(0, 80, n_foods)
+    fats = rng.uniform(0, 40, n_foods)
+    calories = 4 * protein + 4 * carbs + 9 * fats
+    return {
+        f"food {i:05d}": {
+            "calories": round(float(calories[i]), 1),
+            "protein": round(float(protein[i]), 1),
+            "carbs": round(float(carbs[i]), 1),
+            "fats": round(float(fats[i]), 1),
+        }
+        for i in range(n_foods)
+    }
+
+
+def make_meal_items(foods, rng, n_items=None):
+    names = list(foods)
+    n_items = n_items or int(rng.integers(1, 6))
+    return [
+        {
+            "food": names[int(rng.integers(len(names)))],
+            "quantity": float(rng.integers(1, 4) * 50),
+            "unit": "g",
+        }
+        for _ in range(n_items)
+    ]
+
+
+def _meal_rows(days, foods, meals_per_day, rng):
+    names = list(foods)
+    per_gram = np.array([[foods[n][k] for k in ("calories", "protein", "carbs", "fats")] for n in names]) / 100
+    rows = []
+    for day in days:
+        for slot in range(meals_per_day):
+            items = make_meal_items(foods, rng)
+            grams = np.array([item["quantity"] for item in items])
+            idx = [int(item["food"].split()[-1]) for item in items]
+            totals = grams @ per_gram[idx]
+            timestamp = datetime.datetime.combine(day, datetime.time(7 + 5 * slot))
+            rows.append(_meal_row(f"Meal {slot + 1}", items, dict(zip(("calories", "protein", "carbs", "fats"), totals)), timestamp))
+    return rows
+
+
+def _body_metrics(days, rng):
+    weight = 85 + np.cumsum(rng.normal(-0.01, 0.15, len(days)))
+    fat = 25 + np.cumsum(rng.normal(-0.005, 0.05, len(days)))
+    height = 178.0
+    return pd.DataFrame({
+        "date": [d.isoformat() for d in days],
+        "weight": weight.round(2),
+        "height_cm": height,
+        "bmi": (weight / (height / 100) ** 2).round(2),
+        "fat_percent": fat.round(2),
+        "waist_cm": (weight * 0.98).round(1),
+        "biceps_cm": 35.0,
+        "lats_cm": 110.0,
+    })
+
+
+def _daily_wearable(days, rng):
+    return pd.DataFrame({
+        "date": [d.isoformat() for d in days],
+        "heart_rate_avg": rng.normal(65, 5, len(days)).round(1),
+        "spo2_avg": rng.normal(97, 1, len(days)).clip(90, 100).round(1),
+        "sleep_hours": rng.normal(7, 1, len(days)).clip(3, 11).round(2),
+        "steps": rng.integers(2000, 15000, len(days)),
+    })
+
+
+def _minute_samples(start, n_days, rng):
+    ts = int(pd.Timestamp(start).timestamp()) + 60 * np.arange(n_days * 1440)
+    minute_of_day = (ts // 60) % 1440
+    asleep = minute_of_day < 7 * 60
+    return pd.DataFrame({
+        "ts": ts,
+        "heart_rate": np.where(asleep, rng.normal(55, 3, len(ts)), rng.normal(72, 8, len(ts))).round(1),
+        "spo2": rng.normal(97, 1, len(ts)).clip(90, 100).round(1),
+        "steps": np.where(asleep, 0, rng.poisson(8, len(ts))),
+        "sleep_minutes": asleep.astype(float),
+    })
+
+
+def generate_user(root, years=1, wearable="daily", n_foods=2000, meals_per_day=3, seed=0, end=None):
+    # Fills root/data/ for one user; returns row counts.
+    rng = np.random.default_rng(seed)
+    data_dir = os.path.join(root, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    db_path = os.path.join(data_dir, "user_data.db")
+    ensure_schema(db_path)
+
+    end = end or datetime.date.today()
+    days = [end - datetime.timedelta(days=i) for i in range(int(365 * years) - 1, -1, -1)]
+
+    foods = make_foods(n_foods, rng)
+    with open(os.path.join(data_dir, "food_db.json"), "w") as f:
+        json.dump(foods, f)
+    templates = {f"Template {i}": make_meal_items(foods, rng) for i in range(20)}
+    with open(os.path.join(data_dir, "meal_templates.json"), "w") as f:
+        json.dump({name: [{"food": i["food"], "qty": i["quantity"], "unit": i["unit"]} for i in items]
+                   for name, items in templates.items()}, f)
+
+    metrics = _body_metrics(days, rng)
+    meals = _meal_rows(days, foods, meals_per_day, rng)
+    cols = ", ".join(metrics.columns)
+    run_write(lambda conn: conn.executemany(
+        f"INSERT OR REPLACE INTO body_metrics ({cols}) VALUES ({', '.join('?' * len(metrics.columns))})",
+        metrics.itertuples(index=False, name=None),
+    ), db_path)
+    run_write(lambda conn: conn.executemany(_INSERT_MEAL, meals), db_path)
+
+    counts = {"days": len(days), "body_metrics": len(metrics), "meals": len(meals), "foods": len(foods)}
+    if wearable == "minute":
+        written = 0
+        for start in range(0, len(days), SAMPLE_CHUNK_DAYS):
+            chunk = _minute_samples(days[start], min(SAMPLE_CHUNK_DAYS, len(days) - start), rng)
+            written += run_write(lambda conn: insert_samples(conn, chunk), db_path)
+        counts["wearable_samples"] = written
+    else:
+        daily = _daily_wearable(days, rng)
+        run_write(lambda conn: write_wearable_rows(conn, daily), db_path)
+        counts["wearable_data"] = len(daily)
+    return counts
+
+
+def generate(out_dir, users=1, years=1, wearable="daily", n_foods=2000, meals_per_day=3, seed=0):
+    seeds = np.random.SeedSequence(seed).spawn(users)
+    return {
+        f"user_{i}": generate_user(
+            os.path.join(out_dir, f"user_{i}"), years, wearable, n_foods, meals_per_day, seeds[i]
+        )
+        for i in range(users)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic app data for benchmarks.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--years", type=float, default=1)
+    parser.add_argument("--wearable", choices=["daily", "minute"], default="daily")
+    parser.add_argument("--foods", type=int, default=2000)
+    parser.add_argument("--meals-per-day", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    counts = generate(args.out_dir, args.users, args.years, args.wearable, args.foods, args.meals_per_day, args.seed)
+    print(json.dumps(counts, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,26 @@
 # init_db.py
-import sqlite3
+# Creates or upgrades data/user_data.db to the current schema (see
+# utils/migrations.py) and imports the legacy JSON meal log once.
+#   python init_db.py                 # single-user data/
+#   python init_db.py --user alice    # data/users/alice/
+import argparse
 
-conn = sqlite3.connect("data/user_data.db")
+from utils.database import migrate_json_meal_logs
+from utils.migrations import SCHEMA_VERSION, migrate
+from utils.users import using_user
 
-# Table for body metrics (already exists)
-conn.execute("""
-CREATE TABLE IF NOT EXISTS body_metrics (
-    date TEXT,
-    weight REAL,
-    fat_percent REAL
-);
-""")
+parser = argparse.ArgumentParser(description="Create or upgrade a user database.")
+parser.add_argument("--user", help="initialize this user's database instead of the single-user one")
+args = parser.parse_args()
 
-# Table for wearable data
-conn.execute("""
-CREATE TABLE IF NOT EXISTS wearable_data (
-    date TEXT PRIMARY KEY,
-    heart_rate_avg REAL,
-    spo2_avg REAL,
-    sleep_hours REAL,
-    steps INTEGER
-);
-""")
+with using_user(args.user):
+    applied = migrate()
+    if applied:
+        print(f"✅ Applied migrations {applied} (schema v{SCHEMA_VERSION}).")
 
-# Table for simulation history
-conn.execute("""
-CREATE TABLE IF NOT EXISTS simulation_history (
-    date TEXT,
-    action TEXT,
-    food TEXT,
-    quantity REAL,
-    unit TEXT,
-    caloric_change REAL,
-    duration_days INTEGER
-);
-""")
-
-conn.commit()
-conn.close()
+    # The legacy JSON log predates users; it is imported into whichever
+    # database is being initialized.
+    migrated = migrate_json_meal_logs()
+    if migrated:
+        print(f"✅ Migrated {migrated} meals from data/meal_logs.json.")
 print("✅ Database initialized.")
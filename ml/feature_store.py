@@ -0,0 +1,197 @@
+# ml/feature_store.py
+# Materialized daily_features table: one row per epoch day joining body
+# metrics, the wearable daily series and per-day meal totals. Source
+# tables mark changed days in feature_dirty (triggers, see
+# utils/migrations.py); sync_features() recomputes only those days and
+# feeds them to the incremental trend statistics (utils/calculations.py).
+import pandas as pd
+
+from utils.calculations import STAT_COLUMNS, TRENDS_VERSION, apply_days, ensure_trend_tables, rebuild_series
+from utils.db import fetch_all, read_df, run_write
+from utils.instrumentation import span
+from utils.migrations import FEATURE_SOURCE_TABLES, ensure_schema
+
+# Bump whenever FEATURES_DDL or REFRESH_SQL change; the next sync drops
+# the table and rebuilds every day under the new definitions.
+FEATURE_VERSION = 1
+
+FEATURE_COLUMNS = [
+    "weight", "fat_percent",
+    "heart_rate_avg", "spo2_avg", "sleep_hours", "steps",
+    "total_calories", "meal_count",
+]
+
+FEATURES_DDL = """
+    CREATE TABLE IF NOT EXISTS daily_features (
+        day INTEGER PRIMARY KEY,
+        date TEXT NOT NULL,
+        has_body_metrics INTEGER NOT NULL,
+        weight REAL,
+        fat_percent REAL,
+        heart_rate_avg REAL,
+        spo2_avg REAL,
+        sleep_hours REAL,
+        steps INTEGER,
+        total_calories REAL NOT NULL,
+        meal_count INTEGER NOT NULL
+    )
+"""
+
+# Series with trend statistics: name -> value expression over
+# daily_features, NULL where the day has no point. Days without meals
+# are missing data, not zero-calorie days.
+TREND_SERIES = {
+    "weight": "weight",
+    "fat_percent": "fat_percent",
+    "total_calories": "CASE WHEN meal_count > 0 THEN total_calories END",
+    "steps": "steps",
+}
+
+# Recomputes the days staged in temp.feature_days. Days no source knows
+# about any more simply produce no row.
+REFRESH_SQL = """
+    INSERT OR REPLACE INTO daily_features
+    SELECT d.day,
+           date(d.day * 86400, 'unixepoch'),
+           b.day IS NOT NULL,
+           b.weight, b.fat_percent,
+           w.heart_rate_avg, w.spo2_avg, w.sleep_hours, w.steps,
+           COALESCE(m.total_calories, 0), COALESCE(m.meal_count, 0)
+    FROM temp.feature_days d
+    LEFT JOIN body_metrics b ON b.day = d.day
+    LEFT JOIN wearable_daily_view w ON w.day = d.day
+    LEFT JOIN (
+        SELECT day, SUM(calories) AS total_calories, COUNT(*) AS meal_count
+        FROM meals
+        WHERE day IN (SELECT day FROM temp.feature_days)
+        GROUP BY day
+    ) m ON m.day = d.day
+    WHERE b.day IS NOT NULL OR w.day IS NOT NULL OR m.day IS NOT NULL
+"""
+
+
+def _stored_version(conn):
+    row = conn.execute("SELECT value FROM feature_meta WHERE key = 'feature_version'").fetchone()
+    return int(row[0]) if row else None
+
+
+def _rebuild(conn):
+    conn.execute("DROP TABLE IF EXISTS daily_features")
+    conn.execute(FEATURES_DDL)
+    conn.execute("CREATE INDEX idx_daily_features_metrics ON daily_features (day) WHERE has_body_metrics")
+    for table in FEATURE_SOURCE_TABLES:
+        conn.execute(f"INSERT OR IGNORE INTO feature_dirty (day) SELECT day FROM {table} WHERE day IS NOT NULL")
+    conn.execute(
+        "INSERT OR REPLACE INTO feature_meta (key, value) VALUES ('feature_version', ?)",
+        (str(FEATURE_VERSION),),
+    )
+
+
+def _series_points(conn, expr):
+    return conn.execute(f"SELECT day, {expr} FROM daily_features WHERE {expr} IS NOT NULL ORDER BY day").fetchall()
+
+
+def _refresh_trends(conn):
+    # Applies the staged days to every trend series; a series is rebuilt
+    # from daily_features only on a backfill or a TRENDS_VERSION change.
+    row = conn.execute("SELECT value FROM feature_meta WHERE key = 'trends_version'").fetchone()
+    if ensure_trend_tables(conn, int(row[0]) if row else None):
+        conn.execute(
+            "INSERT OR REPLACE INTO feature_meta (key, value) VALUES ('trends_version', ?)",
+            (str(TRENDS_VERSION),),
+        )
+        for series, expr in TREND_SERIES.items():
+            rebuild_series(conn, series, _series_points(conn, expr))
+        return
+    for series, expr in TREND_SERIES.items():
+        points = conn.execute(
+            f"SELECT d.day, {expr} FROM temp.feature_days d LEFT JOIN daily_features USING (day) ORDER BY d.day"
+        ).fetchall()
+        if not apply_days(conn, series, points):
+            rebuild_series(conn, series, _series_points(conn, expr))
+
+
+def _refresh(conn):
+    # Runs on the writer thread. Returns the number of days recomputed.
+    if _stored_version(conn) != FEATURE_VERSION:
+        _rebuild(conn)
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS feature_days (day INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM temp.feature_days")
+    conn.execute("INSERT INTO temp.feature_days SELECT day FROM feature_dirty")
+    conn.execute("DELETE FROM daily_features WHERE day IN (SELECT day FROM temp.feature_days)")
+    conn.execute(REFRESH_SQL)
+    _refresh_trends(conn)
+    conn.execute("DELETE FROM feature_dirty WHERE day IN (SELECT day FROM temp.feature_days)")
+    return conn.execute("SELECT COUNT(*) FROM temp.feature_days").fetchone()[0]
+
+
+@span("feature_store.sync_features")
+def sync_features(db_path=None):
+    # Brings daily_features up to date; a single cheap read when nothing
+    # changed. Returns the number of days recomputed.
+    ensure_schema(db_path)
+    version, trends_version, dirty = fetch_all(
+        "SELECT (SELECT value FROM feature_meta WHERE key = 'feature_version'),"
+        " (SELECT value FROM feature_meta WHERE key = 'trends_version'),"
+        " EXISTS (SELECT 1 FROM feature_dirty)",
+        db_path=db_path,
+    )[0]
+    if version == str(FEATURE_VERSION) and trends_version == str(TRENDS_VERSION) and not dirty:
+        return 0
+    return run_write(_refresh, db_path)
+
+
+@span("feature_store.load_features")
+def load_features(body_metrics_only=False, db_path=None, archive=False):
+    # The materialized frame, ordered by day, with `date` as a datetime
+    # derived from the integer key. body_metrics_only keeps the days that
+    # have a body_metrics row (the training targets). archive=True reads
+    # the current user's memory-mapped "features" archive (utils/archive.py)
+    # as of its last export, falling back to the table when there is none.
+    if archive:
+        import pyarrow.compute as pc
+
+        from utils.archive import read_archive
+        try:
+            table = read_archive("features", ["day", "has_body_metrics", *FEATURE_COLUMNS])
+        except FileNotFoundError:
+            pass
+        else:
+            if body_metrics_only:
+                table = table.filter(pc.not_equal(table["has_body_metrics"], 0))
+            df = table.drop_columns(["has_body_metrics"]).to_pandas()
+            df.insert(1, "date", pd.to_datetime(df["day"], unit="D"))
+            return df
+    sync_features(db_path)
+    where = "WHERE has_body_metrics" if body_metrics_only else ""
+    df = read_df(
+        f"SELECT day, {', '.join(FEATURE_COLUMNS)} FROM daily_features {where} ORDER BY day",
+        db_path=db_path,
+    )
+    df.insert(1, "date", pd.to_datetime(df["day"], unit="D"))
+    return df
+
+
+@span("feature_store.load_trends")
+def load_trends(series, start_day=None, end_day=None, db_path=None):
+    # Per-day trend statistics of one TREND_SERIES entry (columns as in
+    # utils.calculations.STAT_COLUMNS), ordered by day, with `date`.
+    sync_features(db_path)
+    df = read_df(
+        f"SELECT day, {', '.join(STAT_COLUMNS)} FROM daily_trends"
+        " WHERE series = ? AND day >= ? AND day <= ? ORDER BY day",
+        (series, -2**62 if start_day is None else start_day, 2**62 if end_day is None else end_day),
+        db_path=db_path,
+    )
+    df.insert(1, "date", pd.to_datetime(df["day"], unit="D"))
+    return df
+
+
+def load_weekly_totals(series, db_path=None):
+    # Sum, day count and daily mean per Monday-based week of one series.
+    sync_features(db_path)
+    df = read_df("SELECT week, total, days FROM weekly_totals WHERE series = ? ORDER BY week", (series,),
+                 db_path=db_path)
+    df.insert(0, "week_start", pd.to_datetime(df["week"] * 7 - 3, unit="D"))
+    df["mean"] = df["total"] / df["days"]
+    return df
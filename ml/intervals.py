@@ -0,0 +1,155 @@
+# ml/intervals.py
+# Monte Carlo prediction intervals for the weight / fat% forecasts.
+#   "bootstrap": refit the model on resampled training rows, one fit per
+#                replica, spread over a process pool.
+#   "residual":  fit once and add resampled residuals over the horizon;
+#                cheap enough to stay in-process and vectorized.
+# Every replica draws from its own child of one SeedSequence, so a given
+# seed gives the same bands whatever the worker count.
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.instrumentation import span
+
+N_REPLICAS = 500
+QUANTILES = (0.05, 0.5, 0.95)
+# Linear fits are microseconds each, so the pool only pays off with many
+# replica-rows. An XGBoost refit costs far more than the pool round trip
+# whatever the row count, so there the replica count alone decides.
+MIN_PARALLEL_WORK = 20_000
+MIN_PARALLEL_REPLICAS = 16
+# Bootstrap path matrices kept per (caller key, kind, replicas, seed, horizon).
+MAX_CACHED_PATHS = 16
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+_paths = OrderedDict()
+_paths_lock = threading.Lock()
+
+
+def _make_model(kind, params):
+    if kind == "linear":
+        from sklearn.linear_model import LinearRegression
+        return LinearRegression(**(params or {}))
+    import xgboost as xgb
+    # One thread per fit: parallelism comes from the pool.
+    return xgb.XGBRegressor(**{**(params or {}), "n_jobs": 1})
+
+
+def _get_pool(max_workers):
+    # Persistent pool so workers import numpy/xgboost once. Spawned rather
+    # than forked: the parent runs SQLite writer and Streamlit threads.
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = max_workers
+        return _pool
+
+
+def _bootstrap_chunk(kind, params, X, y, X_future, seeds):
+    # Runs in a worker: one resample-and-refit per seed.
+    n = len(X)
+    out = np.empty((len(seeds), len(X_future)))
+    for i, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        rows = rng.integers(0, n, n)
+        model = _make_model(kind, params)
+        if kind != "linear":
+            model.set_params(random_state=int(rng.integers(2**31 - 1)))
+        model.fit(X[rows], y[rows])
+        out[i] = model.predict(X_future)
+    return out
+
+
+def bootstrap_paths(X, y, X_future, kind="xgb", params=None, n_replicas=N_REPLICAS, seed=None, max_workers=None):
+    # n_replicas x horizon matrix of forecasts from bootstrap refits.
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    X_future = np.asarray(X_future, dtype=float)
+    seeds = np.random.SeedSequence(seed).spawn(n_replicas)
+
+    workers = max_workers or os.cpu_count() or 1
+    if kind == "linear":
+        small = n_replicas * len(X) < MIN_PARALLEL_WORK
+    else:
+        small = n_replicas < MIN_PARALLEL_REPLICAS
+    if workers == 1 or small:
+        return _bootstrap_chunk(kind, params, X, y, X_future, seeds)
+
+    # A few chunks per worker keeps cores busy when fits take uneven time.
+    chunks = [c for c in np.array_split(np.arange(n_replicas), workers * 4) if len(c)]
+    pool = _get_pool(workers)
+    futures = [
+        pool.submit(_bootstrap_chunk, kind, params, X, y, X_future, [seeds[i] for i in chunk])
+        for chunk in chunks
+    ]
+    return np.vstack([f.result() for f in futures])
+
+
+def _cached_paths(key, compute):
+    # Small LRU like the model registry's: the same training data, seed and
+    # horizon always give the same paths, so reruns skip the refits.
+    with _paths_lock:
+        paths = _paths.get(key)
+        if paths is not None:
+            _paths.move_to_end(key)
+            return paths
+    paths = compute()
+    with _paths_lock:
+        _paths[key] = paths
+        while len(_paths) > MAX_CACHED_PATHS:
+            _paths.popitem(last=False)
+    return paths
+
+
+def residual_paths(model, X, y, X_future, n_replicas=N_REPLICAS, seed=None):
+    # Point forecast of an already fitted model plus residuals drawn with
+    # replacement for every future day. In-sample residuals understate the
+    # error of flexible models such as XGBoost; prefer bootstrap there.
+    residuals = np.asarray(y, dtype=float) - model.predict(X)
+    point = np.asarray(model.predict(X_future), dtype=float)
+    rng = np.random.default_rng(np.random.SeedSequence(seed))
+    return point[None, :] + rng.choice(residuals, size=(n_replicas, len(point)))
+
+
+def quantile_bands(paths, quantiles=QUANTILES):
+    # {quantile: array over the horizon}
+    values = np.quantile(paths, quantiles, axis=0)
+    return {q: values[i] for i, q in enumerate(quantiles)}
+
+
+@span("intervals.prediction_intervals")
+def prediction_intervals(X, y, X_future, kind="xgb", params=None, method="bootstrap",
+                         n_replicas=N_REPLICAS, quantiles=QUANTILES, seed=None, model=None,
+                         max_workers=None, cache_key=None):
+    # Quantile bands for the forecast at X_future. kind is "xgb" or
+    # "linear"; method "residual" needs the fitted `model` (or fits one).
+    # cache_key identifies the training data and params (e.g. the model
+    # registry fingerprint); with a seed it lets bootstrap paths be reused.
+    if isinstance(X_future, pd.DataFrame):
+        X_future = X_future[list(X.columns)] if isinstance(X, pd.DataFrame) else X_future
+    if method == "residual":
+        if model is None:
+            model = _make_model(kind, params).fit(X, y)
+        paths = residual_paths(model, X, y, X_future, n_replicas, seed)
+    else:
+        def compute():
+            return bootstrap_paths(X, y, X_future, kind, params, n_replicas, seed, max_workers)
+
+        if cache_key is None or seed is None:
+            paths = compute()
+        else:
+            horizon = hashlib.sha256(np.ascontiguousarray(X_future, dtype=float).tobytes()).hexdigest()[:16]
+            paths = _cached_paths((cache_key, kind, n_replicas, seed, horizon), compute)
+    return quantile_bands(paths, quantiles)
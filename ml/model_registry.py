@@ -0,0 +1,298 @@
+# ml/model_registry.py
+# On-disk registry of trained XGBoost models, keyed by a fingerprint of the
+# training rows, feature list and hyperparameters. Shared by every session
+# and process that points at the same MODEL_DIR; each user (utils/users.py)
+# has their own directory next to their data.
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.instrumentation import span
+from utils.users import current_user, user_path
+
+# Single-user location; see model_dir().
+MODEL_DIR = "data/models"
+
+# Versions kept on disk per model name; older ones are evicted by last use.
+MAX_VERSIONS_PER_NAME = 5
+# Models kept deserialized in this process.
+MAX_MEMORY_MODELS = 16
+
+# Incremental updates: boosting rounds added per update, rows that may be
+# appended incrementally before a full rebuild, and how many standard
+# deviations the new rows' target mean may move before it counts as drift.
+INCREMENTAL_ROUNDS = 10
+REBUILD_ROW_THRESHOLD = 30
+DRIFT_FACTOR = 3.0
+
+# Threads per fit or prediction. Training runs inside the shared app and
+# API processes; XGBoost's default of every core would let one user's
+# retrain stall all other sessions (ml/intervals.py caps its workers the
+# same way).
+N_JOBS = 1
+
+_memory = OrderedDict()
+_lock = threading.Lock()
+_training_locks = {}
+
+
+def fingerprint(X, y, params):
+    digest = hashlib.sha256()
+    digest.update(json.dumps(list(map(str, X.columns))).encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(pd.Series(y), index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:32]
+
+
+def model_dir():
+    user_id = current_user()
+    return MODEL_DIR if user_id is None else user_path("models", user_id)
+
+
+def _folder(name):
+    return os.path.join(model_dir(), name)
+
+
+def _model_path(name, fp):
+    return os.path.join(_folder(name), f"{fp}.json")
+
+
+def _training_lock():
+    # One fit at a time per model directory, i.e. per user: rapid reruns
+    # queue behind each other instead of piling up fits, and never behind
+    # another user's.
+    with _lock:
+        return _training_locks.setdefault(model_dir(), threading.Lock())
+
+
+def _remember(key, model):
+    with _lock:
+        _memory[key] = model
+        _memory.move_to_end(key)
+        while len(_memory) > MAX_MEMORY_MODELS:
+            _memory.popitem(last=False)
+
+
+def _atomic_write_json(path, payload):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".pending-", suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+
+
+def save_model(name, fp, model, metadata):
+    # Written to a temp file and renamed so concurrent readers in other
+    # processes never see a partial model.
+    os.makedirs(_folder(name), exist_ok=True)
+    path = _model_path(name, fp)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".pending-", suffix=".json")
+    os.close(fd)
+    model.save_model(tmp)
+    os.replace(tmp, path)
+    _atomic_write_json(path[:-len(".json")] + ".meta.json", metadata)
+    _remember(path, model)
+    evict(name)
+
+
+def load_model(name, fp):
+    # In-memory models are keyed by path, which includes the user.
+    path = _model_path(name, fp)
+    with _lock:
+        model = _memory.get(path)
+        if model is not None:
+            _memory.move_to_end(path)
+    if model is not None:
+        # evict() goes by file mtime, so a hit refreshes it too; otherwise
+        # a model served from memory would look unused on disk.
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return model
+
+    if not os.path.exists(path):
+        return None
+    # xgboost is imported on first use so pages that merely link here stay
+    # cheap to import.
+    import xgboost as xgb
+
+    model = xgb.XGBRegressor()
+    try:
+        model.load_model(path)
+        model.set_params(n_jobs=N_JOBS)
+    except (OSError, xgb.core.XGBoostError):
+        # Evicted or replaced by another process between the check and the load.
+        return None
+    os.utime(path)
+    _remember(path, model)
+    return model
+
+
+def load_metadata(name, fp):
+    try:
+        with open(_model_path(name, fp)[:-len(".json")] + ".meta.json", "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def evict(name, keep=MAX_VERSIONS_PER_NAME):
+    folder = _folder(name)
+    try:
+        models = [
+            os.path.join(folder, f) for f in os.listdir(folder)
+            if f.endswith(".json") and not f.endswith(".meta.json") and not f.startswith(".")
+        ]
+    except FileNotFoundError:
+        return
+    models.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0, reverse=True)
+    for path in models[keep:]:
+        for stale in (path, path[:-len(".json")] + ".meta.json"):
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+        with _lock:
+            _memory.pop(path, None)
+
+
+def _row_hashes(X, y):
+    rows = X.copy()
+    rows["__target__"] = pd.Series(y).to_numpy()
+    return pd.util.hash_pandas_object(rows, index=False).to_numpy()
+
+
+def _rows_digest(hashes):
+    return hashlib.sha256(hashes.tobytes()).hexdigest()
+
+
+def latest_version(name):
+    # (fingerprint, metadata) of the most recently trained version, if any.
+    folder = _folder(name)
+    best = None
+    try:
+        names = os.listdir(folder)
+    except FileNotFoundError:
+        return None
+    for f in names:
+        if not f.endswith(".meta.json") or f.startswith("."):
+            continue
+        fp = f[:-len(".meta.json")]
+        meta = load_metadata(name, fp)
+        if meta and (best is None or meta.get("trained_at", 0) > best[1].get("trained_at", 0)):
+            best = (fp, meta)
+    return best
+
+
+@span("model_registry.train_incremental")
+def train_incremental(name, X, y, params, row_keys, rebuild_threshold=REBUILD_ROW_THRESHOLD):
+    # Continues boosting the latest version on rows it has not seen yet.
+    # Falls back to a full rebuild when the old rows changed, too many rows
+    # accumulated since the last rebuild, or the new rows look like drift.
+    # Returns (model, mode) with mode "cached", "incremental" or "full".
+    fp = fingerprint(X, y, params)
+    model = load_model(name, fp)
+    if model is not None:
+        return model, "cached"
+    with _training_lock():
+        # A rerun waited on above may have trained this exact version.
+        model = load_model(name, fp)
+        if model is not None:
+            return model, "cached"
+        return _train_incremental(name, X, y, params, fp, row_keys, rebuild_threshold)
+
+
+def _train_incremental(name, X, y, params, fp, row_keys, rebuild_threshold):
+    import xgboost as xgb
+
+    row_keys = [str(k) for k in row_keys]
+    hashes = _row_hashes(X, y)
+    position = {key: i for i, key in enumerate(row_keys)}
+    features = list(map(str, X.columns))
+
+    latest = latest_version(name)
+    previous = None
+    new_idx = None
+    if latest is not None:
+        prev_fp, meta = latest
+        seen = meta.get("seen_keys", [])
+        same_setup = meta.get("features") == features and meta.get("params") == params
+        if same_setup and seen and all(key in position for key in seen):
+            seen_idx = [position[key] for key in seen]
+            if _rows_digest(hashes[seen_idx]) == meta.get("rows_digest"):
+                seen_set = set(seen)
+                new_idx = [i for i, key in enumerate(row_keys) if key not in seen_set]
+                if meta.get("rows_since_rebuild", 0) + len(new_idx) <= rebuild_threshold:
+                    previous = load_model(name, prev_fp)
+
+    if previous is not None and new_idx:
+        X_new, y_new = X.iloc[new_idx], pd.Series(y).iloc[new_idx]
+        shift = abs(float(y_new.mean()) - meta.get("target_mean", 0.0))
+        drifted = shift > DRIFT_FACTOR * max(meta.get("target_std", 0.0), 1e-6)
+        if not drifted:
+            model = xgb.XGBRegressor(**{**params, "n_estimators": INCREMENTAL_ROUNDS, "n_jobs": N_JOBS})
+            model.fit(X_new, y_new, xgb_model=previous.get_booster())
+            seen_keys = meta["seen_keys"] + [row_keys[i] for i in new_idx]
+            save_model(name, fp, model, {
+                "features": features,
+                "params": params,
+                "n_rows": int(len(X)),
+                "trained_at": time.time(),
+                "mode": "incremental",
+                "parent": prev_fp,
+                "seen_keys": seen_keys,
+                "rows_digest": _rows_digest(hashes[[position[k] for k in seen_keys]]),
+                "rows_since_rebuild": meta.get("rows_since_rebuild", 0) + len(new_idx),
+                # Drift is judged against the distribution at the last full rebuild.
+                "target_mean": meta.get("target_mean", 0.0),
+                "target_std": meta.get("target_std", 0.0),
+            })
+            return model, "incremental"
+
+    model = xgb.XGBRegressor(**{**params, "n_jobs": N_JOBS})
+    model.fit(X, y)
+    save_model(name, fp, model, {
+        "features": features,
+        "params": params,
+        "n_rows": int(len(X)),
+        "trained_at": time.time(),
+        "mode": "full",
+        "seen_keys": row_keys,
+        "rows_digest": _rows_digest(hashes),
+        "rows_since_rebuild": 0,
+        "target_mean": float(pd.Series(y).mean()),
+        "target_std": float(pd.Series(y).std(ddof=0)),
+    })
+    return model, "full"
+
+
+@span("model_registry.get_or_train")
+def get_or_train(name, X, y, params):
+    # Returns a fitted XGBRegressor, training it only if no model with the
+    # same data/features/params fingerprint exists yet.
+    fp = fingerprint(X, y, params)
+    model = load_model(name, fp)
+    if model is not None:
+        return model
+    with _training_lock():
+        model = load_model(name, fp)
+        if model is not None:
+            return model
+        import xgboost as xgb
+
+        model = xgb.XGBRegressor(**{**params, "n_jobs": N_JOBS})
+        model.fit(X, y)
+        save_model(name, fp, model, {
+            "features": list(map(str, X.columns)),
+            "params": params,
+            "n_rows": int(len(X)),
+            "trained_at": time.time(),
+        })
+    return model
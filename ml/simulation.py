@@ -0,0 +1,92 @@
+# ml/simulation.py
+# Batched what-if diet simulation. A scenario is a list of entries
+#   {"action": "add"|"remove", "food": str, "quantity": float,
+#    "unit": str, "duration_days": int}
+# (optionally with "kcal_per_100g" to skip the food lookup). Every scenario
+# is applied to the same baseline forecast, giving a scenarios x days
+# trajectory matrix computed with NumPy in one pass.
+import numpy as np
+import pandas as pd
+
+from utils.food_index import get_foods
+from utils.instrumentation import span
+from utils.nutrition import grams_per_unit
+
+# Energy content of one kg of body-weight change.
+KCAL_PER_KG = 7700.0
+
+# Adaptive model: every kg gained (lost) raises (lowers) daily energy
+# expenditure by this much, so a fixed surplus levels off instead of
+# accumulating linearly.
+ADAPTATION_KCAL_PER_KG = 22.0
+
+
+def entry_kcal(entry, food_data=None):
+    # Daily kcal change of one entry; negative for removals.
+    food = entry.get("food") or ""
+    kcal_per_100g = entry.get("kcal_per_100g")
+    if kcal_per_100g is None:
+        record = (food_data or get_foods([food])).get(food.lower())
+        if record is None:
+            raise ValueError(f"Food '{food}' not found in the food database.")
+        kcal_per_100g = record["calories"]
+    grams = float(entry.get("quantity", 0)) * grams_per_unit(food.lower(), entry.get("unit", "g"))
+    kcal = grams / 100 * float(kcal_per_100g)
+    return -kcal if str(entry.get("action", "add")).lower().startswith("remove") else kcal
+
+
+def daily_kcal_matrix(scenarios, days):
+    # scenarios x days matrix of kcal added per day by each scenario.
+    entries = [(i, entry) for i, scenario in enumerate(scenarios) for entry in scenario]
+    matrix = np.zeros((len(scenarios), days))
+    if not entries:
+        return matrix
+
+    names = {e["food"] for _, e in entries if e.get("kcal_per_100g") is None}
+    food_data = get_foods(sorted(names)) if names else {}
+    owner = np.array([i for i, _ in entries])
+    kcal = np.array([entry_kcal(e, food_data) for _, e in entries])
+    duration = np.array([int(e.get("duration_days", days)) for _, e in entries])
+
+    active = np.arange(days)[None, :] < duration[:, None]
+    np.add.at(matrix, owner, kcal[:, None] * active)
+    return matrix
+
+
+def weight_deltas(daily_kcal, adaptive=False):
+    # Cumulative weight change (kg) at the end of each day.
+    daily_kcal = np.atleast_2d(np.asarray(daily_kcal, dtype=float))
+    if not adaptive:
+        return np.cumsum(daily_kcal, axis=1) / KCAL_PER_KG
+
+    # Energy balance: today's surplus net of the expenditure change caused
+    # by the weight already gained. Stepped over days, vectorized over scenarios.
+    deltas = np.empty_like(daily_kcal)
+    delta = np.zeros(daily_kcal.shape[0])
+    for day in range(daily_kcal.shape[1]):
+        delta = delta + (daily_kcal[:, day] - ADAPTATION_KCAL_PER_KG * delta) / KCAL_PER_KG
+        deltas[:, day] = delta
+    return deltas
+
+
+@span("simulation.simulate")
+def simulate(baseline, scenarios, adaptive=False):
+    # baseline: forecast weights for the next len(baseline) days.
+    # Returns a len(scenarios) x len(baseline) matrix of weights.
+    baseline = np.asarray(baseline, dtype=float)
+    daily_kcal = daily_kcal_matrix(scenarios, len(baseline))
+    return baseline[None, :] + weight_deltas(daily_kcal, adaptive)
+
+
+def rank_scenarios(trajectories, baseline, labels=None, target=None):
+    # One row per scenario, ordered by final weight (ascending), or by
+    # distance from `target` when given.
+    trajectories = np.atleast_2d(trajectories)
+    final = trajectories[:, -1]
+    summary = pd.DataFrame({
+        "scenario": labels if labels is not None else np.arange(len(final)),
+        "final_weight": final,
+        "vs_baseline": final - float(np.asarray(baseline)[-1]),
+    })
+    key = final if target is None else np.abs(final - target)
+    return summary.iloc[np.argsort(key, kind="stable")].reset_index(drop=True)
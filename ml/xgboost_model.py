@@ -1,55 +1,49 @@
 # ml/xgboost_model.py
-import sqlite3
 import pandas as pd
 import numpy as np
-import xgboost as xgb
 from datetime import datetime
-
-DB_PATH = "data/user_data.db"
-
-def load_training_data():
-    conn = sqlite3.connect(DB_PATH)
-
-    metrics = pd.read_sql_query("""
-        SELECT date, weight, fat_percent
-        FROM body_metrics
-        ORDER BY date
-    """, conn)
-
-    meals = pd.read_sql_query("""
-        SELECT date, SUM(calories) as total_calories
-        FROM meals
-        GROUP BY date
-    """, conn)
-
-    conn.close()
-
-    # Preprocess
-    metrics['date'] = pd.to_datetime(metrics['date'])
-    meals['date'] = pd.to_datetime(meals['date'])
-
-    df = pd.merge(metrics, meals, on='date', how='left')
-    df['total_calories'].fillna(0, inplace=True)
-    df['day'] = (df['date'] - df['date'].min()).dt.days
+from ml.model_registry import REBUILD_ROW_THRESHOLD, get_or_train, train_incremental
+from ml.feature_store import load_features
+from utils.instrumentation import span
+
+XGB_PARAMS = {"objective": "reg:squarederror", "n_estimators": 100}
+FEATURES = ['day', 'total_calories']
+
+@span("xgboost_model.load_training_data")
+def load_training_data(archive=False):
+    # Body-metric days from the materialized feature table (ml/feature_store.py),
+    # already joined with per-day calorie totals. archive=True reads the
+    # exported features archive instead (for batch jobs over long histories).
+    df = load_features(body_metrics_only=True, archive=archive)
+    df = df[['day', 'date', 'weight', 'fat_percent', 'total_calories']].rename(columns={'day': 'epoch_day'})
+    df['day'] = df['epoch_day'] - df['epoch_day'].min()
 
     return df
 
-def train_xgb_models(df):
+@span("xgboost_model.train_xgb_models")
+def train_xgb_models(df, incremental=False, rebuild_threshold=REBUILD_ROW_THRESHOLD):
     models = {}
 
     for target in ['weight', 'fat_percent']:
         if df[target].isnull().any():
             continue
 
-        X = df[['day', 'total_calories']]
+        X = df[FEATURES]
         y = df[target]
 
-        model = xgb.XGBRegressor(objective='reg:squarederror', n_estimators=100)
-        model.fit(X, y)
-        models[target] = model
+        # Reuses the stored model when rows, features and params are unchanged.
+        # Incremental mode continues boosting on rows the last model has not
+        # seen, keyed by date.
+        if incremental:
+            models[target], _ = train_incremental(
+                f"xgb_{target}", X, y, XGB_PARAMS, df['date'].astype(str), rebuild_threshold
+            )
+        else:
+            models[target] = get_or_train(f"xgb_{target}", X, y, XGB_PARAMS)
 
     return models
 
+@span("xgboost_model.predict_future")
 def predict_future(models, df, future_days=30, calorie_override=None):
     last_day = df['day'].max()
     last_cal = df['total_calories'].iloc[-1] if calorie_override is None else calorie_override
@@ -0,0 +1,77 @@
+# pages/Diagnostics.py
+# Latency of the instrumented spans (see utils/instrumentation.py) and a
+# one-off cProfile capture of another page's rerun.
+import os
+import runpy
+import time
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import StopException
+
+from utils.instrumentation import load_spans, percentiles_over_time, profile_call, summarize
+
+WINDOWS = {
+    "Last hour": (3600, "1min"),
+    "Last 24 hours": (86400, "15min"),
+    "Last 7 days": (7 * 86400, "1h"),
+    "Last 30 days": (30 * 86400, "6h"),
+}
+
+PAGES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_page(path):
+    # Executes a page script as Streamlit would on a rerun; st.stop() in
+    # the page only ends that page.
+    try:
+        runpy.run_path(path, run_name="__main__")
+    except StopException:
+        pass
+
+
+def main():
+    import plotly.express as px
+
+    st.title("🩺 Performance Diagnostics")
+
+    window = st.selectbox("Window", list(WINDOWS), index=1, key="diag_window")
+    seconds, freq = WINDOWS[window]
+    spans = load_spans(since=time.time() - seconds)
+
+    if spans.empty:
+        st.info("No spans recorded in this window yet. Use the other pages, then come back.")
+    else:
+        st.subheader("⏱ Latency per span")
+        summary = summarize(spans)
+        st.dataframe(summary.round(2))
+
+        default = summary["name"].head(5).tolist()
+        chosen = st.multiselect("Spans to chart", summary["name"].tolist(), default=default, key="diag_spans")
+        if chosen:
+            series = percentiles_over_time(spans[spans["name"].isin(chosen)], freq)
+            fig = px.line(series.melt(id_vars=["time", "name"], var_name="percentile", value_name="ms"),
+                          x="time", y="ms", color="name", line_dash="percentile",
+                          title="p50 / p95 latency over time", markers=True)
+            st.plotly_chart(fig)
+
+    st.divider()
+    st.subheader("🔬 Profile a single rerun")
+    pages = sorted(f for f in os.listdir(PAGES_DIR) if f.endswith(".py") and f != os.path.basename(__file__))
+    target = st.selectbox("Page", pages, key="diag_profile_page")
+    top_n = st.slider("Functions to show", 10, 100, 30, key="diag_profile_top")
+
+    if st.button("Run page under cProfile", key="diag_profile_run"):
+        with st.expander("Page output", expanded=False):
+            _, stats, raw = profile_call(run_page, os.path.join(PAGES_DIR, target))
+        st.dataframe(stats.head(top_n))
+        st.download_button(
+            "📥 Download .prof",
+            data=raw,
+            file_name=f"{target[:-3]}.prof",
+            mime="application/octet-stream",
+            key="diag_profile_download",
+        )
+
+
+if __name__ == "__main__":
+    main()
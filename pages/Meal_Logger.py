@@ -1,25 +1,11 @@
 import streamlit as st
-import json
-import os
+from utils.database import delete_meal_template, get_meal_templates, save_meal_template
+from utils.food_index import autocomplete_options
+from utils.food_utils import get_valid_units_for_food
+from utils.users import select_user
 
-TEMPLATES_FILE = "data/meal_templates.json"
 UNIT_OPTIONS = ["gm", "ml", "tbsp", "tsp", "piece", "cup", "slice", "oz"]
 
-# Create the file if it doesn't exist
-if not os.path.exists(TEMPLATES_FILE):
-    with open(TEMPLATES_FILE, 'w') as f:
-        json.dump({}, f)
-
-
-def load_templates():
-    with open(TEMPLATES_FILE, 'r') as f:
-        return json.load(f)
-
-
-def save_templates(templates):
-    with open(TEMPLATES_FILE, 'w') as f:
-        json.dump(templates, f, indent=4)
-
 
 def add_meal_template():
     st.subheader("📝 Create a New Meal Template")
@@ -28,7 +14,8 @@ def add_meal_template():
     st.markdown("### Add Food Items:")
     food_items = []
     cols = st.columns([2, 1, 1])
-    food = cols[0].text_input("Food", key="food1")
+    food_query = cols[0].text_input("Search Food", key="food_query1")
+    food = cols[0].selectbox("Food", autocomplete_options(food_query), key="food1")
     qty = cols[1].number_input("Quantity", min_value=0.0, key="qty1")
     unit = cols[2].selectbox("Unit", UNIT_OPTIONS, key="unit1")
 
@@ -44,7 +31,8 @@ def add_meal_template():
 
     for i, item in enumerate(st.session_state.more_items):
         cols = st.columns([2, 1, 1])
-        item["food"] = cols[0].text_input(f"Food {i+2}", key=f"food{i+2}")
+        query = cols[0].text_input(f"Search Food {i+2}", key=f"food_query{i+2}")
+        item["food"] = cols[0].selectbox(f"Food {i+2}", autocomplete_options(query), key=f"food{i+2}")
         item["qty"] = cols[1].number_input(f"Qty {i+2}", min_value=0.0, key=f"qty{i+2}")
         item["unit"] = cols[2].selectbox(f"Unit {i+2}", UNIT_OPTIONS, key=f"unit{i+2}")
         food_items.append(item)
@@ -55,16 +43,14 @@ def add_meal_template():
         elif any(not item["food"] for item in food_items):
             st.error("Please ensure all food names are filled.")
         else:
-            templates = load_templates()
-            templates[meal_name] = food_items
-            save_templates(templates)
+            save_meal_template(meal_name, food_items)
             st.success(f"'{meal_name}' template saved successfully!")
             st.session_state.more_items = []  # Reset after save
 
 
 def show_saved_templates():
     st.subheader("📦 Saved Meal Templates")
-    templates = load_templates()
+    templates = get_meal_templates()
 
     if not templates:
         st.info("No templates saved yet.")
@@ -92,7 +78,8 @@ def show_saved_templates():
 
         # Add or update ingredient
         st.markdown("### ➕ Add/Update Ingredient")
-        new_food = st.text_input("Food name")
+        new_food_query = st.text_input("Search food name")
+        new_food = st.selectbox("Food name", [""] + autocomplete_options(new_food_query))
         new_qty = st.text_input("Quantity (e.g., 100)")
         if new_food:
             valid_units = get_valid_units_for_food(new_food)
@@ -124,19 +111,17 @@ def show_saved_templates():
 
         # Save button
         if st.button("💾 Save Changes"):
-            templates[selected_meal_to_edit] = edited_ingredients
-            save_templates(templates)
+            save_meal_template(selected_meal_to_edit, edited_ingredients)
             st.success(f"✅ Saved changes to '{selected_meal_to_edit}'")
 
         # Undo button
         if st.button("↩️ Undo Changes"):
-            templates = load_templates()
+            templates = get_meal_templates()
             st.warning("Changes reverted. Reloaded last saved version.")
 
         # Delete template
         if st.button(f"❌ Delete '{selected_meal_to_edit}'"):
-            del templates[selected_meal_to_edit]
-            save_templates(templates)
+            delete_meal_template(selected_meal_to_edit)
             st.warning(f"🗑 Deleted '{selected_meal_to_edit}'")
             st.experimental_rerun()
 
@@ -155,4 +140,5 @@ def main():
 
 
 if __name__ == "__main__":
+    select_user()
     main()
@@ -1,23 +1,38 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import numpy as np
 import datetime
-import json
-import matplotlib.pyplot as plt
-from sklearn.linear_model import LinearRegression
-
-DB_PATH = "data/user_data.db"
-
+from utils.cache import cached_read
+from utils.charts import line_chart
+from utils.db import read_df
+from utils.food_index import get_food, search_foods
+from ml.feature_store import load_trends, load_weekly_totals
+from ml.simulation import entry_kcal, simulate
+from ml.intervals import QUANTILES, prediction_intervals
+from utils.instrumentation import span
+from utils.users import select_user
+
+@cached_read("body_metrics")
 def load_metrics():
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query("SELECT date, weight, fat_percent FROM body_metrics ORDER BY date", conn)
-    conn.close()
+    df = read_df("SELECT day, weight, fat_percent FROM body_metrics ORDER BY day")
+    # Dates come from the integer epoch-day key; no string parsing.
+    df.insert(0, 'date', pd.to_datetime(df.pop('day'), unit='D'))
     return df
 
-def predict_future(df, target_days=30):
+# Rolling statistics maintained incrementally in the feature store.
+@cached_read("body_metrics", "wearable", "meals")
+def load_weight_trend():
+    return load_trends("weight")
+
+@cached_read("body_metrics", "wearable", "meals")
+def load_weekly(series):
+    return load_weekly_totals(series)
+
+def predict_future(df, target_days=30, intervals=False):
     if df.empty or df.shape[0] < 2:
         return None
+    # scikit-learn takes seconds to import; only pay for it when forecasting.
+    from sklearn.linear_model import LinearRegression
 
     df['date'] = pd.to_datetime(df['date'])
     df['days_since_start'] = (df['date'] - df['date'].min()).dt.days
@@ -38,92 +53,97 @@ def predict_future(df, target_days=30):
 
         future_dates = [df['date'].max() + datetime.timedelta(days=i) for i in range(1, target_days + 1)]
         preds[col] = pd.DataFrame({'date': future_dates, col: predictions})
+        if intervals:
+            bands = prediction_intervals(X.to_numpy(), y, future_days, kind="linear", seed=0)
+            preds[col]['lower'] = bands[QUANTILES[0]]
+            preds[col]['upper'] = bands[QUANTILES[-1]]
 
     return preds
 
 # -------- Streamlit UI --------
-st.title("📊 Predictions & Trends")
-
-metrics_df = load_metrics()
-
-if metrics_df.empty:
-    st.warning("No body metrics data found. Please log weight and fat% in the 'Body Metrics' tab first.")
-    st.stop()
-
-st.subheader("📈 Historical Trends")
-st.line_chart(metrics_df.set_index("date")[['weight', 'fat_percent']])
-
-st.subheader("🔮 Future Predictions")
-days = st.slider("Predict for how many days ahead?", 7, 90, 30)
-
-predictions = predict_future(metrics_df, days)
-
-if predictions:
-    for key, df in predictions.items():
-        st.markdown(f"**Predicted {key.replace('_', ' ').title()}**")
-        st.line_chart(df.set_index("date"))
-else:
-    st.info("Not enough data to predict. Please log more metrics over time.")
-
-st.divider()
-st.subheader("🧪 Simulate Progress by Adding/Removing Foods")
-
-# Load food data
-def load_food_data():
-    with open("data/food_data.json", "r") as f:
-        return json.load(f)
-
-food_data = load_food_data()
-food_names = list(food_data.keys())
-
-st.markdown("### Simulate a dietary change")
-
-action = st.radio("Do you want to add or remove a food item?", ["Add", "Remove"])
-selected_food = st.selectbox("Choose a food item", food_names)
-qty = st.number_input("Quantity (per day)", min_value=0.0, value=100.0)
-unit = st.selectbox("Unit", ["g", "ml", "piece", "tbsp", "tsp", "cup"])
-
-caloric_change = 0
-
-if selected_food in food_data:
-    cal_per_100g = food_data[selected_food].get("calories", 0)
-    caloric_change = (cal_per_100g / 100) * qty
-    if action == "Remove":
-        caloric_change *= -1
-
-    st.info(f"Estimated caloric change per day: **{caloric_change:.2f} kcal**")
-
-# Show hypothetical impact on weight
-st.markdown("### 📉 Hypothetical Future Prediction")
-
-if st.button("🔍 Simulate Effect"):
-    weight_df = metrics_df.dropna(subset=["weight"]).copy()
-    if not weight_df.empty:
-        weight_df['date'] = pd.to_datetime(weight_df['date'])
-        weight_df['days_since_start'] = (weight_df['date'] - weight_df['date'].min()).dt.days
-        
-        X = weight_df[['days_since_start']]
-        y = weight_df['weight']
-
-        model = LinearRegression()
-        model.fit(X, y)
-
-        # Add simulated daily effect: 7700 kcal = ~1 kg
-        daily_weight_change = caloric_change / 7700
-
-        future_days = np.arange(weight_df['days_since_start'].max() + 1,
-                                weight_df['days_since_start'].max() + days + 1)
-        predicted_weight = model.predict(future_days.reshape(-1, 1))
-        predicted_weight_sim = predicted_weight + np.cumsum([daily_weight_change] * days)
-
-        future_dates = [weight_df['date'].max() + datetime.timedelta(days=i) for i in range(1, days + 1)]
-
-        sim_df = pd.DataFrame({
-            "date": future_dates,
-            "Original Prediction": predicted_weight,
-            "With Simulated Change": predicted_weight_sim
-        }).set_index("date")
-
-        st.line_chart(sim_df)
-    else:
-        st.warning("Not enough weight data to simulate. Please log more.")
+def main():
+    st.title("📊 Predictions & Trends")
+
+    with span("predictions_and_trends.load_metrics"):
+        metrics_df = load_metrics()
+
+    if metrics_df.empty:
+        st.warning("No body metrics data found. Please log weight and fat% in the 'Body Metrics' tab first.")
+        st.stop()
+
+    with span("predictions_and_trends.trends"):
+        st.subheader("📈 Historical Trends")
+        st.plotly_chart(line_chart(metrics_df, "date", ['weight', 'fat_percent'],
+                                   data_key="predictions_and_trends.metrics", sources=load_metrics.sources))
+
+        trend_df = load_weight_trend()
+        if not trend_df.empty:
+            st.plotly_chart(line_chart(trend_df, "date", ["value", "mean_7", "mean_30", "ewma"], title="Weight Trend",
+                                       data_key="predictions_and_trends.weight_trend",
+                                       sources=load_weight_trend.sources,
+                                       labels={"value": "weight", "mean_7": "7-day average",
+                                               "mean_30": "30-day average", "ewma": "EWMA"}))
+        col1, col2 = st.columns(2)
+        for col, series, label in [(col1, "total_calories", "Avg daily calories"), (col2, "steps", "Avg daily steps")]:
+            weekly = load_weekly(series)
+            if not weekly.empty:
+                col.markdown(f"**{label} per week**")
+                col.bar_chart(weekly.set_index("week_start")["mean"])
+
+    with span("predictions_and_trends.forecast"):
+        st.subheader("🔮 Future Predictions")
+        days = st.slider("Predict for how many days ahead?", 7, 90, 30)
+
+        show_bands = st.checkbox("Show 90% prediction interval (bootstrap refits)")
+        predictions = predict_future(metrics_df, days, intervals=show_bands)
+
+        if predictions:
+            for key, df in predictions.items():
+                st.markdown(f"**Predicted {key.replace('_', ' ').title()}**")
+                st.line_chart(df.set_index("date"))
+        else:
+            st.info("Not enough data to predict. Please log more metrics over time.")
+
+    st.divider()
+    st.subheader("🧪 Simulate Progress by Adding/Removing Foods")
+
+    st.markdown("### Simulate a dietary change")
+
+    action = st.radio("Do you want to add or remove a food item?", ["Add", "Remove"])
+    food_query = st.text_input("Search food item", placeholder="e.g. Banana")
+    selected_food = st.selectbox("Choose a food item", search_foods(food_query, k=20))
+    qty = st.number_input("Quantity (per day)", min_value=0.0, value=100.0)
+    unit = st.selectbox("Unit", ["g", "ml", "piece", "tbsp", "tsp", "cup"])
+
+    scenario = []
+    food_info = get_food(selected_food) if selected_food else None
+    if food_info:
+        scenario = [{"action": action, "food": selected_food, "quantity": qty, "unit": unit, "duration_days": days}]
+        caloric_change = entry_kcal(scenario[0], {selected_food.lower(): food_info})
+        st.info(f"Estimated caloric change per day: **{caloric_change:.2f} kcal**")
+
+    # Show hypothetical impact on weight
+    st.markdown("### 📉 Hypothetical Future Prediction")
+    adaptive = st.checkbox("Adaptive energy balance (expenditure follows weight change)")
+
+    if st.button("🔍 Simulate Effect"):
+        with span("predictions_and_trends.simulate_effect"):
+            if predictions and "weight" in predictions:
+                # Applied to the forecast computed above; no refit per what-if.
+                baseline_df = predictions["weight"]
+                simulated = simulate(baseline_df["weight"].to_numpy(), [scenario], adaptive=adaptive)[0]
+
+                sim_df = pd.DataFrame({
+                    "date": baseline_df["date"],
+                    "Original Prediction": baseline_df["weight"],
+                    "With Simulated Change": simulated
+                }).set_index("date")
+
+                st.line_chart(sim_df)
+            else:
+                st.warning("Not enough weight data to simulate. Please log more.")
+
+
+if __name__ == "__main__":
+    select_user()
+    main()
@@ -2,50 +2,42 @@
 
 import streamlit as st
 import pandas as pd
-import sqlite3
 import numpy as np
 import datetime
-import matplotlib.pyplot as plt
-import xgboost as xgb
-from util.food_utils import load_local_food_data
-import plotly.graph_objects as go
-import plotly.express as px
-from ml.xgboost_model import load_training_data, train_xgb_models, predict_future as predict_xgb
+from utils.archive import DATASETS, export_to_file
+from utils.cache import bump, cached_read
+from utils.charts import line_chart
+from utils.db import execute_write
+from utils.food_index import search_foods
+from utils.migrations import ensure_schema
+from utils.pagination import paged_table
+from ml.model_registry import fingerprint, get_or_train
+from ml.feature_store import load_features
+from ml.simulation import KCAL_PER_KG, rank_scenarios, simulate
+from ml.intervals import QUANTILES, prediction_intervals
+from utils.instrumentation import span
+from utils.users import current_user, select_user
 
 
-DB_PATH = "data/user_data.db"
-
 # ---------- DB & Prediction Helpers ----------
+@cached_read("body_metrics", "wearable", "meals")
 def load_metrics():
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query("SELECT date, weight, fat_percent FROM body_metrics ORDER BY date", conn)
-    conn.close()
-    return df
+    # Body-metric days with their wearable and calorie features, pre-joined
+    # in the daily_features table.
+    return load_features(body_metrics_only=True)
+
+# Longest forecast the page offers. Bands are always computed this far out
+# and sliced, so moving the horizon slider reuses the cached bootstrap paths.
+MAX_FORECAST_DAYS = 90
 
-def predict_future(df, calorie_offset=0, target_days=30):
+def predict_future(df, calorie_offset=0, target_days=30, intervals=False):
     if df.empty or df.shape[0] < 2:
         return None
 
-    # Step 1: Load wearable data
-    conn = sqlite3.connect(DB_PATH)
-    wearable_df = pd.read_sql_query("SELECT * FROM wearable_data", conn)
-    conn.close()
-
-    if wearable_df.empty:
-        wearable_df = pd.DataFrame(columns=["date", "heart_rate_avg", "spo2_avg", "sleep_hours", "steps"])
-
-    wearable_df['date'] = pd.to_datetime(wearable_df['date'])
-    df['date'] = pd.to_datetime(df['date'])
-
-    # Step 2: Merge
-    merged_df = pd.merge(df, wearable_df, on='date', how='left')
+    # Fill missing wearable data from neighbouring days, or 0 if there is none at all
+    merged_df = df.ffill().bfill().fillna(0)
 
-    # Fill missing wearable data with mean or 0 (if no wearable data at all)
-    merged_df.fillna(method='ffill', inplace=True)
-    merged_df.fillna(method='bfill', inplace=True)
-    merged_df.fillna(0, inplace=True)
-
-    merged_df['days_since_start'] = (merged_df['date'] - merged_df['date'].min()).dt.days
+    merged_df['days_since_start'] = merged_df['day'] - merged_df['day'].min()
 
     preds = {}
     features = ['days_since_start', 'sleep_hours', 'steps', 'heart_rate_avg', 'spo2_avg']
@@ -56,13 +48,15 @@ def predict_future(df, calorie_offset=0, target_days=30):
 
         X = merged_df[features]
         y = merged_df[col]
+        params = {"n_estimators": 100, "objective": "reg:squarederror"}
 
-        model = xgb.XGBRegressor(n_estimators=100, objective='reg:squarederror')
-        model.fit(X, y)
+        # Cached across reruns and sessions; only retrains when the data changes.
+        model = get_or_train(f"ai_predictions_{col}", X, y, params)
 
         # Create future data
         last_day = merged_df['days_since_start'].max()
-        future_days = np.arange(last_day + 1, last_day + target_days + 1)
+        horizon = max(target_days, MAX_FORECAST_DAYS) if intervals else target_days
+        future_days = np.arange(last_day + 1, last_day + horizon + 1)
 
         future_df = pd.DataFrame({
             'days_since_start': future_days,
@@ -72,175 +66,213 @@ def predict_future(df, calorie_offset=0, target_days=30):
             'spo2_avg': merged_df['spo2_avg'].mean()
         })
 
-        future_pred = model.predict(future_df)
+        future_pred = model.predict(future_df)[:target_days]
+        # Fixed seed: the band does not jitter between reruns, and the
+        # paths are cached on the training-data fingerprint.
+        bands = prediction_intervals(X, y, future_df, params=params, seed=0,
+                                     cache_key=fingerprint(X, y, params)) if intervals else None
 
         # Apply calorie offset for weight
-        if col == 'weight':
-            weight_offset = calorie_offset / 7700
-            future_pred += weight_offset
+        weight_offset = calorie_offset / KCAL_PER_KG if col == 'weight' else 0
+        future_pred += weight_offset
 
         future_dates = [merged_df['date'].max() + datetime.timedelta(days=i) for i in range(1, target_days + 1)]
         preds[col] = pd.DataFrame({'date': future_dates, col: future_pred})
+        if bands:
+            preds[col]['lower'] = bands[QUANTILES[0]][:target_days] + weight_offset
+            preds[col]['upper'] = bands[QUANTILES[-1]][:target_days] + weight_offset
 
     return preds
 
 def log_simulation(action, food, qty, unit, kcal_change, duration):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
+    execute_write("""
         INSERT INTO simulation_history (date, action, food, quantity, unit, caloric_change, duration_days)
         VALUES (?, ?, ?, ?, ?, ?, ?)
     """, (
         datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         action, food, qty, unit, kcal_change, duration
     ))
-    conn.commit()
-    conn.close()
-
-def fetch_simulation_history():
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query("SELECT * FROM simulation_history ORDER BY date DESC", conn)
-    conn.close()
-    return df
+    bump("simulation_history")
 
 # ---------- Streamlit UI ----------
-st.title("📊 Predictions & Simulations")
-
-metrics_df = load_metrics()
-if metrics_df.empty:
-    st.warning("No body metrics data found. Please log weight and fat% in the 'Body Metrics' tab first.")
-    st.stop()
-
-st.subheader("📈 Historical Trends")
-st.plotly_chart(px.line(metrics_df, x='date', y=['weight', 'fat_percent'], 
-                        labels={'value': 'Metric Value', 'variable': 'Metric'},
-                        title='📈 Historical Trends (Weight & Fat%)'))
-
-# ---------- Future Predictions ----------
-st.subheader("🔮 Future Predictions")
-days = st.slider("Predict for how many days ahead?", 7, 90, 30)
-predictions = predict_future(metrics_df, target_days=days)
-
-if predictions:
-    for key, pred_df in predictions.items():
-        fig = px.line(pred_df, x='date', y=key, title=f'🔮 Predicted {key.replace("_", " ").title()}')
+def show_food_simulation(metrics_df):
+    # Returns early, rather than st.stop(), so the sections after it
+    # still render.
+    import plotly.express as px
+
+    st.subheader("🍽 Simulate Impact of Food Changes from Food DB")
+
+    food_query = st.text_input("Search food item", placeholder="e.g. Banana", key="sim_food_query")
+    food_names = search_foods(food_query, k=20)
+    if not food_names:
+        st.info("Type to search the food DB. Log meals to add new foods to it.")
+        return
+
+    selected_foods = st.multiselect("Choose food items to compare", food_names, default=food_names[:1])
+    if not selected_foods:
+        return
+
+    qty2 = st.number_input("Quantity to simulate (e.g., 100g/ml)", value=100, key="sim_qty")
+    unit2 = st.selectbox("Unit", ["g", "ml", "piece", "tbsp", "tsp", "cup"], key="sim_unit")
+    action2 = st.radio("Action", ["➕ Add daily", "➖ Remove daily"], key="sim_action")
+    adaptive = st.checkbox("Adaptive energy balance (expenditure follows weight change)", key="sim_adaptive")
+
+    # One scenario per food, all evaluated against the same baseline in one call
+    sim_days = 30
+    action_name = "remove" if "Remove" in action2 else "add"
+    scenarios = [
+        [{"action": action_name, "food": food, "quantity": qty2, "unit": unit2, "duration_days": sim_days}]
+        for food in selected_foods
+    ]
+    with span("ai_predictions.food_simulation"):
+        # Same baseline as the API and the trends page: the weight forecast,
+        # or the latest weight held flat when there is too little data.
+        forecast = (predict_future(metrics_df, target_days=sim_days) or {}).get('weight')
+        if forecast is not None:
+            baseline = forecast['weight'].to_numpy()
+            dates = pd.to_datetime(forecast['date'])
+        else:
+            baseline = np.full(sim_days, metrics_df['weight'].iloc[-1])
+            dates = pd.date_range(pd.Timestamp.today().normalize() + pd.Timedelta(days=1), periods=sim_days)
+        trajectories = simulate(baseline, scenarios, adaptive=adaptive)
+
+        sim_df = pd.DataFrame(trajectories.T, columns=selected_foods)
+        sim_df.insert(0, "date", dates.to_numpy())
+
+        st.markdown(f"🔍 Simulating **{action2.lower()}** {qty2}{unit2} of each selected food for next {sim_days} days, against the weight forecast.")
+
+        fig = px.line(sim_df, x="date", y=selected_foods,
+                      title="📈 Simulated Weight Over Time",
+                      labels={"value": "Weight (kg)", "variable": "Food"})
         st.plotly_chart(fig)
-else:
-    st.info("Not enough data to predict. Please log more metrics over time.")
-
-# ---------- Simulation: Custom Calorie Input ----------
-st.subheader("🧪 Simulate Adding or Removing a Food (Manual Entry)")
-with st.form("simulate_form"):
-    action = st.radio("Simulation Type", ["Add Food", "Remove Food"])
-    food = st.text_input("Food Name", placeholder="e.g. Banana")
-    qty = st.number_input("Quantity", min_value=0.0, step=0.1)
-    unit = st.selectbox("Unit", ["g", "ml", "tbsp", "piece", "cup"])
-    kcal_per_100g = st.number_input("Estimated Calories per 100g/ml", min_value=0.0, step=1.0)
-    duration = st.slider("Simulate over (days)", 7, 90, 30)
-    submitted = st.form_submit_button("Run Simulation")
-
-    if submitted and food and kcal_per_100g > 0:
-        actual_kcal = (qty / 100) * kcal_per_100g
-        if action == "Remove Food":
-            actual_kcal = -actual_kcal
-        log_simulation(action, food, qty, unit, actual_kcal, duration)
-        st.success(f"Logged simulation of {action.lower()} {qty}{unit} {food} with {actual_kcal:.2f} kcal change.")
-        st.experimental_rerun()
-
-# wearables log data
-st.subheader("📲 Log Wearable Data (Manual)")
-
-with st.form("wearable_form"):
-    date = st.date_input("Date", datetime.date.today())
-    heart_rate = st.number_input("Average Heart Rate (bpm)", min_value=30.0, max_value=200.0)
-    spo2 = st.number_input("Average SpO₂ (%)", min_value=70.0, max_value=100.0)
-    sleep = st.number_input("Sleep Hours", min_value=0.0, max_value=24.0)
-    steps = st.number_input("Steps", min_value=0)
-    submit = st.form_submit_button("Save")
-
-    if submit:
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("""
-            INSERT OR REPLACE INTO wearable_data (date, heart_rate_avg, spo2_avg, sleep_hours, steps)
-            VALUES (?, ?, ?, ?, ?)
-        """, (str(date), heart_rate, spo2, sleep, steps))
-        conn.commit()
-        conn.close()
-        st.success("Wearable data saved successfully!")
-        
-# ---------- Simulation History ----------
-st.divider()
-st.subheader("📜 Simulation History")
-history = fetch_simulation_history()
-if history.empty:
-    st.info("No simulation history yet.")
-else:
-    st.dataframe(history)
-
-# ---------- Food Database-Based Simulation ----------
-st.subheader("🍽 Simulate Impact of Food Changes from Food DB")
-
-food_data = load_local_food_data()
-if not food_data:
-    st.info("No food data available. Please log meals to build food DB.")
-    st.stop()
-
-food_names = list(food_data.keys())
-selected_food = st.selectbox("Choose a food item", food_names)
-
-qty2 = st.number_input("Quantity to simulate (e.g., 100g/ml)", value=100, key="sim_qty")
-unit2 = st.text_input("Unit (just for reference)", value="g", key="sim_unit")
-action2 = st.radio("Action", ["➕ Add daily", "➖ Remove daily"], key="sim_action")
-
-# Calculate kcal impact
-kcal_per_100 = food_data[selected_food]["calories"]
-total_kcal = kcal_per_100 * (qty2 / 100)
-if "Remove" in action2:
-    total_kcal = -total_kcal
-
-# Simulate weight change
-weight_change_per_day = total_kcal / 7700.0
-sim_days = 30
-today = pd.Timestamp.today()
-sim_dates = [today + pd.Timedelta(days=i) for i in range(sim_days)]
-start_weight = metrics_df['weight'].iloc[-1]
-sim_weights = [start_weight + i * weight_change_per_day for i in range(sim_days)]
-
-sim_df = pd.DataFrame({
-    "date": sim_dates,
-    "simulated_weight": sim_weights
-})
-
-st.markdown(f"🔍 Simulating **{action2.lower()}** `{selected_food}` ({qty2}{unit2}) for next {sim_days} days.")
-
-fig = px.line(sim_df, x="date", y="simulated_weight", 
-              title="📈 Simulated Weight Over Time",
-              labels={"simulated_weight": "Weight (kg)"})
-st.plotly_chart(fig)
-
-# Download Simulation Data
-st.subheader("⬇️ Export Simulation Data")
-
-csv = sim_df.to_csv(index=False).encode('utf-8')
-st.download_button(
-    label="📥 Download as CSV",
-    data=csv,
-    file_name=f'{selected_food.lower().replace(" ", "_")}_simulation.csv',
-    mime='text/csv'
-)
-
-# Show Wearable History (Diagnostics)
-st.divider()
-st.subheader("📋 Logged Wearable Data")
-
-conn = sqlite3.connect(DB_PATH)
-wearable_data_df = pd.read_sql_query("SELECT * FROM wearable_data ORDER BY date DESC", conn)
-conn.close()
-
-if wearable_data_df.empty:
-    st.info("No wearable data logged yet.")
-else:
-    st.dataframe(wearable_data_df)
-
-
-
+        st.dataframe(rank_scenarios(trajectories, baseline, labels=selected_foods))
+
+    # Download Simulation Data
+    st.subheader("⬇️ Export Simulation Data")
+
+    # Deferred: the CSV is only built when the button is clicked.
+    st.download_button(
+        label="📥 Download as CSV",
+        data=lambda: sim_df.to_csv(index=False).encode('utf-8'),
+        file_name=f'{"_".join(f.lower().replace(" ", "_") for f in selected_foods)[:80]}_simulation.csv',
+        mime='text/csv'
+    )
+
+
+def show_ai_predictions():
+    # Plotting libraries load with the page, not with the app.
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    st.title("📊 Predictions & Simulations")
+    ensure_schema()
+
+    metrics_df = load_metrics()
+    if metrics_df.empty:
+        st.warning("No body metrics data found. Please log weight and fat% in the 'Body Metrics' tab first.")
+        st.stop()
+
+    with span("ai_predictions.trends"):
+        st.subheader("📈 Historical Trends")
+        st.plotly_chart(line_chart(metrics_df, 'date', ['weight', 'fat_percent'],
+                                   labels={'value': 'Metric Value'},
+                                   title='📈 Historical Trends (Weight & Fat%)',
+                                   data_key="ai_predictions.metrics", sources=load_metrics.sources))
+
+    # ---------- Future Predictions ----------
+    with span("ai_predictions.forecast"):
+        st.subheader("🔮 Future Predictions")
+        days = st.slider("Predict for how many days ahead?", 7, MAX_FORECAST_DAYS, 30)
+        show_bands = st.checkbox("Show 90% prediction interval (bootstrap refits)")
+        with st.spinner("Fitting bootstrap replicas..." if show_bands else "Forecasting..."):
+            predictions = predict_future(metrics_df, target_days=days, intervals=show_bands)
+
+        if predictions:
+            for key, pred_df in predictions.items():
+                fig = px.line(pred_df, x='date', y=key, title=f'🔮 Predicted {key.replace("_", " ").title()}')
+                if 'upper' in pred_df:
+                    fig.add_trace(go.Scatter(x=pred_df['date'], y=pred_df['upper'], line=dict(width=0), showlegend=False))
+                    fig.add_trace(go.Scatter(x=pred_df['date'], y=pred_df['lower'], line=dict(width=0), fill='tonexty',
+                                             fillcolor='rgba(99, 110, 250, 0.2)', name='90% interval'))
+                st.plotly_chart(fig)
+        else:
+            st.info("Not enough data to predict. Please log more metrics over time.")
+
+    # ---------- Simulation: Custom Calorie Input ----------
+    st.subheader("🧪 Simulate Adding or Removing a Food (Manual Entry)")
+    with st.form("simulate_form"):
+        action = st.radio("Simulation Type", ["Add Food", "Remove Food"])
+        food = st.text_input("Food Name", placeholder="e.g. Banana")
+        qty = st.number_input("Quantity", min_value=0.0, step=0.1)
+        unit = st.selectbox("Unit", ["g", "ml", "tbsp", "piece", "cup"])
+        kcal_per_100g = st.number_input("Estimated Calories per 100g/ml", min_value=0.0, step=1.0)
+        duration = st.slider("Simulate over (days)", 7, 90, 30)
+        submitted = st.form_submit_button("Run Simulation")
+
+        if submitted and food and kcal_per_100g > 0:
+            actual_kcal = (qty / 100) * kcal_per_100g
+            if action == "Remove Food":
+                actual_kcal = -actual_kcal
+            log_simulation(action, food, qty, unit, actual_kcal, duration)
+            st.success(f"Logged simulation of {action.lower()} {qty}{unit} {food} with {actual_kcal:.2f} kcal change.")
+            st.experimental_rerun()
+
+    # wearables log data
+    st.subheader("📲 Log Wearable Data (Manual)")
+
+    with st.form("wearable_form"):
+        date = st.date_input("Date", datetime.date.today())
+        heart_rate = st.number_input("Average Heart Rate (bpm)", min_value=30.0, max_value=200.0)
+        spo2 = st.number_input("Average SpO₂ (%)", min_value=70.0, max_value=100.0)
+        sleep = st.number_input("Sleep Hours", min_value=0.0, max_value=24.0)
+        steps = st.number_input("Steps", min_value=0)
+        submit = st.form_submit_button("Save")
+
+        if submit:
+            execute_write("""
+                INSERT OR REPLACE INTO wearable_data (date, heart_rate_avg, spo2_avg, sleep_hours, steps)
+                VALUES (?, ?, ?, ?, ?)
+            """, (str(date), heart_rate, spo2, sleep, steps))
+            bump("wearable")
+            st.success("Wearable data saved successfully!")
+
+    # ---------- Simulation History ----------
+    with span("ai_predictions.simulation_history"):
+        st.divider()
+        st.subheader("📜 Simulation History")
+        if paged_table("simulation_history", key="simulation_history_pages").empty:
+            st.info("No simulation history yet.")
+
+    # ---------- History Export ----------
+    # Full histories, written chunk by chunk to a temp file on click
+    # (utils/archive.py). Streamlit still loads the finished file to serve
+    # it; GET /export on the HTTP API (api/server.py) streams end to end.
+    # The callable runs outside this script run, so the user is captured.
+    with st.expander("📦 Export full history"):
+        user = current_user()
+        col1, col2 = st.columns(2)
+        dataset = col1.selectbox("Dataset", list(DATASETS), key="export_dataset")
+        fmt = col2.radio("Format", ["csv", "parquet"], horizontal=True, key="export_format")
+        st.download_button(
+            label=f"📥 Download {dataset}.{fmt}",
+            data=lambda: export_to_file(dataset, fmt, user),
+            file_name=f"{dataset}.{fmt}",
+            mime="text/csv" if fmt == "csv" else "application/vnd.apache.parquet",
+            key="export_history_download",
+        )
+
+    # ---------- Food Database-Based Simulation ----------
+    show_food_simulation(metrics_df)
+
+    # Show Wearable History (Diagnostics)
+    st.divider()
+    st.subheader("📋 Logged Wearable Data")
+
+    with span("ai_predictions.wearable_history"):
+        if paged_table("wearable", key="wearable_history_pages").empty:
+            st.info("No wearable data logged yet.")
+
+
+if __name__ == "__main__":
+    select_user()
+    show_ai_predictions()
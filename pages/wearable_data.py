@@ -1,75 +1,117 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
-import plotly.express as px
 from datetime import datetime
-
-DB_PATH = "data/user_data.db"
+from utils.archive import archive_status, export_all, read_archive
+from utils.cache import bump, cached_read
+from utils.charts import line_chart
+from utils.db import get_connection, run_write
+from utils.migrations import ensure_schema
+from utils.pagination import date_range_filter, paged_table
+from utils.wearable_import import import_wearable_csv, write_wearable_rows
+from utils.instrumentation import span
+from utils.wearable_store import load_daily_wearable
+from utils.users import select_user
 
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS wearable_data (
-            date TEXT PRIMARY KEY,
-            heart_rate_avg REAL,
-            spo2_avg REAL,
-            sleep_hours REAL,
-            steps INTEGER
-        );
-    """)
-    conn.commit()
-    conn.close()
+    ensure_schema()
 
 def insert_wearable_data(df):
-    conn = sqlite3.connect(DB_PATH)
-    for _, row in df.iterrows():
-        conn.execute("""
-            INSERT OR REPLACE INTO wearable_data (date, heart_rate_avg, spo2_avg, sleep_hours, steps)
-            VALUES (?, ?, ?, ?, ?)
-        """, (row['date'], row['heart_rate_avg'], row['spo2_avg'], row['sleep_hours'], row['steps']))
-    conn.commit()
-    conn.close()
+    run_write(lambda conn: write_wearable_rows(conn, df))
+    bump("wearable")
 
-def load_wearable_data():
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql("SELECT * FROM wearable_data ORDER BY date", conn)
-    conn.close()
-    return df
+# Only plotted, never modified: one shared frame for every session.
+@cached_read("wearable", shared=True)
+def load_wearable_data(start_day=None, end_day=None):
+    return load_daily_wearable(get_connection(), start_day, end_day)
 
 # ---------- Streamlit UI ----------
-st.title("⌚ Wearable Data Tracker")
+def main():
+    st.title("⌚ Wearable Data Tracker")
+
+    init_db()
+
+    st.subheader("📤 Upload Wearable CSV")
+    with st.expander("CSV Format Guide"):
+        st.markdown("""
+        Your CSV file should have the following headers:
 
-init_db()
+        - `date` (YYYY-MM-DD)
+        - `heart_rate_avg`
+        - `spo2_avg`
+        - `sleep_hours`
+        - `steps`
+        """)
 
-st.subheader("📤 Upload Wearable CSV")
-with st.expander("CSV Format Guide"):
-    st.markdown("""
-    Your CSV file should have the following headers:
+    uploaded_file = st.file_uploader("Upload CSV", type="csv")
+    minute_samples = st.checkbox("File contains minute-level samples (ts, heart_rate, spo2, steps, sleep_minutes)")
 
-    - `date` (YYYY-MM-DD)
-    - `heart_rate_avg`
-    - `spo2_avg`
-    - `sleep_hours`
-    - `steps`
-    """)
+    if uploaded_file:
+        progress_bar = st.progress(0.0, text="Importing...")
+        total_bytes = max(uploaded_file.size, 1)
 
-uploaded_file = st.file_uploader("Upload CSV", type="csv")
+        def show_progress(report):
+            fraction = min(uploaded_file.tell() / total_bytes, 1.0)
+            progress_bar.progress(fraction, text=f"{report['rows_read']:,} rows read")
 
-if uploaded_file:
-    df = pd.read_csv(uploaded_file)
-    try:
-        df['date'] = pd.to_datetime(df['date']).dt.date.astype(str)
-        insert_wearable_data(df)
-        st.success("Wearable data uploaded successfully!")
-    except Exception as e:
-        st.error(f"Error processing file: {e}")
+        try:
+            report = import_wearable_csv(uploaded_file, progress=show_progress, samples=minute_samples)
+            progress_bar.progress(1.0, text="Done")
+            st.success(f"Imported {report['rows_written']:,} rows of wearable data.")
+            if report["rows_rejected"]:
+                st.warning(f"{report['rows_rejected']:,} rows were rejected.")
+                st.dataframe(pd.DataFrame(report["rejects"]))
+        except Exception as e:
+            st.error(f"Error processing file: {e}")
 
-# ---------- Display and Visualize ----------
-wearable_df = load_wearable_data()
-if wearable_df.empty:
-    st.info("No data available.")
-else:
+    # ---------- Display and Visualize ----------
+    # One date window, filtered in SQL, for the charts and the table.
     st.subheader("📊 Trends from Wearables")
-    for metric in ['heart_rate_avg', 'spo2_avg', 'sleep_hours', 'steps']:
-        st.plotly_chart(px.line(wearable_df, x='date', y=metric, title=f"{metric.replace('_', ' ').title()}"))
+    start_day, end_day = date_range_filter("wearable_window")
+    with span("wearable_data.trends"):
+        wearable_df = load_wearable_data(start_day, end_day)
+        if wearable_df.empty:
+            st.info("No data available.")
+        else:
+            for metric in ['heart_rate_avg', 'spo2_avg', 'sleep_hours', 'steps']:
+                st.plotly_chart(line_chart(wearable_df, 'date', metric, title=f"{metric.replace('_', ' ').title()}",
+                                           data_key=("wearable_daily", start_day, end_day),
+                                           sources=load_wearable_data.sources))
+            with st.expander("📋 Daily values"):
+                paged_table("wearable", key="wearable_days_pages", start_day=start_day, end_day=end_day,
+                            date_filter=False)
+
+    # ---------- Archive ----------
+    # Minute-level history is read from the memory-mapped Arrow archive
+    # (utils/archive.py), one year at a time, rather than from SQLite.
+    with span("wearable_data.archive"):
+        st.subheader("🗄️ Sample Archive")
+        try:
+            if st.button("Refresh archive", key="wearable_archive_refresh"):
+                with st.spinner("Exporting..."):
+                    export_all(datasets=["wearable", "wearable_samples"])
+            samples = archive_status().get("wearable_samples")
+        except ImportError as e:
+            st.info(str(e))
+            samples = None
+        if not samples or not samples["partitions"]:
+            st.info("No archived minute-level samples yet.")
+        else:
+            st.caption(f"{samples['rows']:,} samples, exported {datetime.fromtimestamp(samples['exported_at']):%Y-%m-%d %H:%M}")
+            year = st.selectbox("Year", samples["partitions"][::-1], key="wearable_archive_year")
+            minutes = read_archive("wearable_samples", ["ts", "heart_rate"], years=[year]).to_pandas()
+            minutes["ts"] = pd.to_datetime(minutes["ts"], unit="s")
+            # Zooming re-decimates inside the window, down to single minutes.
+            first, last = minutes["ts"].iloc[0].to_pydatetime(), minutes["ts"].iloc[-1].to_pydatetime()
+            window = (first, last)
+            if first < last:
+                window = st.slider("Zoom", first, last, (first, last), format="YYYY-MM-DD HH:mm",
+                                   key="wearable_archive_zoom")
+            # Min/max buckets, so short heart-rate spikes stay visible.
+            st.plotly_chart(line_chart(minutes, "ts", "heart_rate", title=f"Heart Rate ({year})", x_range=window,
+                                       method="minmax",
+                                       data_key=("wearable_samples_archive", year, samples["exported_at"])))
+
 
+if __name__ == "__main__":
+    select_user()
+    main()
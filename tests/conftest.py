@@ -0,0 +1,24 @@
+# Modules resolve their data files relative to the working directory
+# (data/...), so every test runs in its own temp dir and gets its own
+# database file.
+import os
+
+# Timing spans write to their own metrics database; not needed here.
+os.environ.setdefault("FITNESS_SPANS", "0")
+
+import pytest
+
+from utils.migrations import ensure_schema
+
+
+@pytest.fixture(autouse=True)
+def _in_tmp_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    # A fully migrated database.
+    path = str(tmp_path / "user_data.db")
+    ensure_schema(path)
+    return path
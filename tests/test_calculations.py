@@ -0,0 +1,79 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.calculations import STAT_COLUMNS, WINDOWS, apply_days, ensure_trend_tables, rebuild_series
+
+
+def _conn():
+    conn = sqlite3.connect(":memory:")
+    ensure_trend_tables(conn, None)
+    return conn
+
+
+def _trends(conn):
+    return pd.read_sql_query(f"SELECT day, {', '.join(STAT_COLUMNS)} FROM daily_trends ORDER BY day", conn)
+
+
+def _weekly(conn):
+    return pd.read_sql_query("SELECT week, total, days FROM weekly_totals ORDER BY week", conn)
+
+
+@pytest.fixture
+def points():
+    # A year of values with gaps, some of several days.
+    rng = np.random.default_rng(7)
+    days = np.flatnonzero(rng.random(365) < 0.7) + 19_000
+    return [(int(day), float(value)) for day, value in zip(days, 80 + np.cumsum(rng.normal(0, 0.3, len(days))))]
+
+
+def _apply_incrementally(conn, points):
+    # Day by day, as feature refreshes would: the open day first gets a
+    # provisional value (meals logged later that day), and a day without a
+    # value for this series is passed as None. The first point needs a
+    # rebuild, as in ml/feature_store.py.
+    assert not apply_days(conn, "s", [points[0]])
+    rebuild_series(conn, "s", [points[0]])
+    previous = points[0][0]
+    for day, value in points[1:]:
+        assert apply_days(conn, "s", [(gap, None) for gap in range(previous + 1, day)] + [(day, value - 1.0)])
+        assert apply_days(conn, "s", [(day, value)])
+        previous = day
+
+
+def test_incremental_matches_rebuild(points):
+    incremental, full = _conn(), _conn()
+    _apply_incrementally(incremental, points)
+    rebuild_series(full, "s", points)
+
+    pd.testing.assert_frame_equal(_trends(incremental), _trends(full), rtol=1e-9)
+    pd.testing.assert_frame_equal(_weekly(incremental), _weekly(full), rtol=1e-9)
+
+
+def test_incremental_matches_pandas_rolling(points):
+    conn = _conn()
+    _apply_incrementally(conn, points)
+    trends = _trends(conn)
+    values = pd.Series([v for _, v in points], index=pd.to_datetime([d for d, _ in points], unit="D"))
+
+    for days in WINDOWS:
+        rolling = values.rolling(f"{days}D")
+        for stat, expected in [("count", rolling.count()), ("mean", rolling.mean()), ("var", rolling.var()),
+                               ("min", rolling.min()), ("max", rolling.max())]:
+            np.testing.assert_allclose(trends[f"{stat}_{days}"].to_numpy(float), expected.to_numpy(float),
+                                       rtol=1e-8, equal_nan=True, err_msg=f"{stat}_{days}")
+
+
+def test_backfill_asks_for_a_rebuild(points):
+    conn = _conn()
+    _apply_incrementally(conn, points[:50])
+    before = _trends(conn)
+    day, value = points[10]
+
+    assert apply_days(conn, "s", [(day, value)])
+    assert not apply_days(conn, "s", [(day, value + 1)])
+    assert not apply_days(conn, "s", [(day, None)])
+    assert not apply_days(conn, "s", [(points[49][0], None)])
+    pd.testing.assert_frame_equal(_trends(conn), before)
@@ -0,0 +1,23 @@
+import pandas as pd
+
+from utils.db import fetch_all, run_write
+from utils.wearable_store import insert_samples
+
+DAY = 86_400
+
+
+def _samples(start, minutes):
+    ts = [start + 60 * i for i in range(minutes)]
+    return pd.DataFrame({"ts": ts, "heart_rate": 60.0, "spo2": 97.0, "steps": 10, "sleep_minutes": 0.0})
+
+
+def test_overlapping_sample_batches_mark_days_dirty_once(db_path):
+    # The second batch upserts wearable_daily rows whose day is already in
+    # feature_dirty; the triggers must not turn that into a conflict.
+    day = 19_000
+    first = run_write(lambda conn: insert_samples(conn, _samples(day * DAY, 90)), db_path)
+    second = run_write(lambda conn: insert_samples(conn, _samples(day * DAY + 60 * 60, 24 * 60)), db_path)
+
+    assert (first, second) == (90, 24 * 60 - 30)
+    assert fetch_all("SELECT day FROM feature_dirty ORDER BY day", db_path=db_path) == [(day,), (day + 1,)]
+    assert fetch_all("SELECT sample_count FROM wearable_daily ORDER BY date", db_path=db_path) == [(1440,), (60,)]
@@ -0,0 +1,64 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.db import read_df, run_write
+from utils.pagination import fetch_page
+from utils.wearable_store import insert_samples
+
+START = datetime.date(2024, 1, 1)
+
+
+@pytest.fixture
+def history(db_path):
+    # Several meals on most days (ties on day), body metrics with gaps, and
+    # wearable days from both branches of the daily view.
+    rng = np.random.default_rng(3)
+    dates = [(START + datetime.timedelta(days=i)).isoformat() for i in range(120)]
+    meals = [(d, f"{d}T12:00", "meal", "[]", 500.0, 30.0, 50.0, 20.0)
+             for d in dates for _ in range(rng.integers(0, 4))]
+    metrics = [(d, 80.0 - i / 100) for i, d in enumerate(dates) if rng.random() < 0.6]
+    wearable = [(d, 60.0, 97.0, 7.0, 8000) for d in dates[::2]]
+    samples = pd.DataFrame({"ts": [int(pd.Timestamp(d).timestamp()) + 3600 for d in dates[::3]], "heart_rate": 65.0})
+
+    def write(conn):
+        conn.executemany("INSERT INTO meals (date, timestamp, name, items, calories, protein, carbs, fats)"
+                         " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", meals)
+        conn.executemany("INSERT INTO body_metrics (date, weight) VALUES (?, ?)", metrics)
+        conn.executemany("INSERT INTO wearable_data (date, heart_rate_avg, spo2_avg, sleep_hours, steps)"
+                         " VALUES (?, ?, ?, ?, ?)", wearable)
+        insert_samples(conn, samples)
+
+    run_write(write, db_path)
+    return db_path
+
+
+def _walk(source, db_path, start_day=None, end_day=None, limit=7):
+    pages, cursor = [], None
+    while True:
+        page, cursor = fetch_page(source, cursor, start_day, end_day, limit, db_path)
+        assert len(page) <= limit
+        pages.append(page)
+        if cursor is None:
+            return pd.concat(pages, ignore_index=True)
+
+
+@pytest.mark.parametrize("source, relation, order", [
+    ("meals", "meals", "day DESC, id DESC"),
+    ("body_metrics", "body_metrics", "day DESC"),
+    ("wearable", "wearable_daily_view", "day DESC"),
+])
+@pytest.mark.parametrize("window", [(None, None), (19_740, 19_800)])
+def test_walk_matches_ordered_query(history, source, relation, order, window):
+    start_day, end_day = window
+    expected = read_df(
+        f"SELECT * FROM {relation} WHERE day >= ? AND day <= ? ORDER BY {order}",
+        (-2**62 if start_day is None else start_day, 2**62 if end_day is None else end_day),
+        history,
+    )
+    assert len(expected) > 14
+    # A page whose column is all NULL comes back as object dtype.
+    walked = _walk(source, history, start_day, end_day).astype(expected.dtypes.to_dict())
+    pd.testing.assert_frame_equal(walked, expected)
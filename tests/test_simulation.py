@@ -0,0 +1,15 @@
+import pytest
+
+from ml.simulation import entry_kcal
+
+
+def test_entry_kcal_uses_food_unit_grams_whatever_the_case():
+    # A banana "piece" is 118 g, not the generic piece weight.
+    entry = {"food": "Banana", "quantity": 1, "unit": "piece", "kcal_per_100g": 89}
+    assert entry_kcal(entry) == pytest.approx(105.02)
+    assert entry_kcal({**entry, "food": "banana"}) == pytest.approx(105.02)
+
+
+def test_entry_kcal_removal_is_negative():
+    entry = {"action": "Remove", "food": "Rice", "quantity": 200, "unit": "g", "kcal_per_100g": 130}
+    assert entry_kcal(entry) == pytest.approx(-260.0)
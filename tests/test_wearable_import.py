@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+from utils.wearable_import import SAMPLE_COLUMNS, validate_chunk
+
+
+def test_sample_chunk_with_only_some_readings():
+    chunk = pd.DataFrame({"ts": ["1700000000", "1700000060"], "heart_rate": ["61", "62"]})
+    clean, rejected = validate_chunk(chunk, samples=True)
+
+    assert rejected.empty
+    assert list(clean.columns) == SAMPLE_COLUMNS
+    assert clean["heart_rate"].tolist() == [61, 62]
+    assert clean[["spo2", "steps", "sleep_minutes"]].isna().all().all()
+
+
+def test_sample_chunk_without_ts_is_refused():
+    with pytest.raises(ValueError, match="ts"):
+        validate_chunk(pd.DataFrame({"heart_rate": ["61"]}), samples=True)
+
+
+def test_sample_chunk_rejects_out_of_range_rows():
+    chunk = pd.DataFrame({"ts": ["1700000000", "1700000060"], "spo2": ["98", "30"]})
+    clean, rejected = validate_chunk(chunk, samples=True)
+
+    assert clean["ts"].tolist() == [1700000000]
+    assert rejected["reason"].tolist() == ["invalid spo2"]
@@ -0,0 +1,272 @@
+# utils/archive.py
+# Columnar history archive. export_dataset() streams one table out of the
+# user's SQLite shard, CHUNK_ROWS rows at a time, into year partitions:
+#
+#   <archive>/<dataset>/parquet/year=2024/part-0.parquet   zstd Parquet, for other tools
+#   <archive>/<dataset>/arrow/year=2024/part-0.arrow       uncompressed Arrow IPC, memory-mapped by read_archive()
+#
+# Only one chunk is in memory at a time, and a new export replaces the old
+# one atomically. read_archive() maps the Arrow files instead of reading
+# them, so column buffers point straight into the page cache.
+# iter_export() yields a single CSV or Parquet file in chunks for downloads.
+#
+# pyarrow is optional: it is imported on use, and nothing else needs it.
+#   python -m utils.archive [--user alice] [--dataset meals ...]
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from utils.db import connect, current_db_path
+from utils.migrations import ensure_schema
+from utils.users import current_user, user_path, using_user
+
+ARCHIVE_DIR = "archive"
+CHUNK_ROWS = 50_000
+# Bytes per chunk yielded by iter_export().
+STREAM_BYTES = 1 << 20
+
+# Dataset -> (table or view, time column). Rows are exported in time
+# order and partitioned by year.
+DATASETS = {
+    "body_metrics": ("body_metrics", "day"),
+    "wearable": ("wearable_daily_view", "day"),
+    "wearable_samples": ("wearable_samples", "ts"),
+    "meals": ("meals", "day"),
+    "simulation_history": ("simulation_history", "day"),
+    "features": ("daily_features", "day"),
+}
+
+_YEAR_SQL = {
+    "day": "CAST(strftime('%Y', day * 86400, 'unixepoch') AS INTEGER)",
+    "ts": "CAST(strftime('%Y', ts, 'unixepoch') AS INTEGER)",
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("The history archive needs pyarrow: pip install pyarrow") from e
+    return pa, pq
+
+
+def archive_dir(user_id=None):
+    return user_path(ARCHIVE_DIR, user_id)
+
+
+def _db_path(user_id):
+    # user_id=None means the current user here, as in user_path().
+    with using_user(user_id or current_user()):
+        db_path = current_db_path()
+    ensure_schema(db_path)
+    return db_path
+
+
+def _schema(pa, conn, table):
+    # From the declared SQLite types, so every chunk (and every partition)
+    # gets the same schema even when a chunk's column is all NULL.
+    types = {"INTEGER": pa.int64(), "TEXT": pa.string()}
+    columns = [(row[1], row[2].upper()) for row in conn.execute(f"PRAGMA table_xinfo({table})")]
+    return pa.schema([(name, types.get(decl, pa.float64())) for name, decl in columns])
+
+
+def _dataset_schema(pa, dataset, db_path):
+    conn = connect(db_path)
+    try:
+        return _schema(pa, conn, DATASETS[dataset][0])
+    finally:
+        conn.close()
+
+
+def _batches(dataset, db_path, chunk_rows):
+    # (year, RecordBatch) in time order, one chunk (or less) at a time.
+    pa, _ = _pyarrow()
+    table, key = DATASETS[dataset]
+    if dataset == "features":
+        # daily_features is derived; bring it up to date first.
+        from ml.feature_store import sync_features
+        sync_features(db_path)
+    conn = connect(db_path)
+    try:
+        schema = _schema(pa, conn, table)
+        names = ", ".join(schema.names)
+        cursor = conn.execute(f"SELECT {names}, {_YEAR_SQL[key]} FROM {table} ORDER BY {key}")
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            columns = list(zip(*rows))
+            years = columns.pop()
+            start = 0
+            # Sorted by time, so each year is one contiguous run.
+            for end in range(1, len(years) + 1):
+                if end == len(years) or years[end] != years[start]:
+                    arrays = [pa.array(col[start:end], type=field.type) for col, field in zip(columns, schema)]
+                    yield years[start], pa.RecordBatch.from_arrays(arrays, schema=schema)
+                    start = end
+    finally:
+        conn.close()
+
+
+def export_dataset(dataset, user_id=None, chunk_rows=CHUNK_ROWS):
+    # Rewrites one dataset's partitions; returns its manifest.
+    pa, pq = _pyarrow()
+    db_path = _db_path(user_id)
+    root = archive_dir(user_id)
+    os.makedirs(root, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=root, prefix=f".{dataset}-")
+
+    manifest = {"dataset": dataset, "rows": 0, "partitions": [], "exported_at": time.time()}
+    year = writers = None
+    try:
+        for batch_year, batch in _batches(dataset, db_path, chunk_rows):
+            if batch_year != year:
+                # One partition's writers open at a time.
+                if writers:
+                    for writer in writers:
+                        writer.close()
+                year = batch_year
+                paths = [os.path.join(staging, kind, f"year={year}", f"part-0.{kind}") for kind in ("parquet", "arrow")]
+                for path in paths:
+                    os.makedirs(os.path.dirname(path))
+                writers = (
+                    pq.ParquetWriter(paths[0], batch.schema, compression="zstd"),
+                    pa.ipc.new_file(paths[1], batch.schema),
+                )
+                manifest["partitions"].append(year)
+            writers[0].write_batch(batch)
+            writers[1].write_batch(batch)
+            manifest["rows"] += batch.num_rows
+        if writers:
+            for writer in writers:
+                writer.close()
+        # The schema on its own, so empty datasets and year filters that
+        # match nothing still read back as typed, empty tables.
+        with pa.ipc.new_file(os.path.join(staging, "_schema.arrow"), _dataset_schema(pa, dataset, db_path)):
+            pass
+        with open(os.path.join(staging, "_manifest.json"), "w") as f:
+            json.dump(manifest, f)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    target = os.path.join(root, dataset)
+    retired = None
+    if os.path.exists(target):
+        retired = tempfile.mkdtemp(dir=root, prefix=f".{dataset}-old-")
+        os.replace(target, os.path.join(retired, dataset))
+    os.replace(staging, target)
+    if retired:
+        shutil.rmtree(retired, ignore_errors=True)
+    return manifest
+
+
+def export_all(user_id=None, datasets=None, chunk_rows=CHUNK_ROWS):
+    return [export_dataset(name, user_id, chunk_rows) for name in (datasets or DATASETS)]
+
+
+def archive_status(user_id=None):
+    # Manifests of the datasets archived so far.
+    status = {}
+    for name in DATASETS:
+        try:
+            with open(os.path.join(archive_dir(user_id), name, "_manifest.json"), "r") as f:
+                status[name] = json.load(f)
+        except (OSError, ValueError):
+            continue
+    return status
+
+
+def read_archive(dataset, columns=None, years=None, user_id=None):
+    # The archived dataset as one Arrow table backed by memory-mapped
+    # files; selecting columns or years copies nothing. Raises
+    # FileNotFoundError when the dataset has not been exported.
+    pa, _ = _pyarrow()
+    root = os.path.join(archive_dir(user_id), dataset)
+    if not os.path.exists(os.path.join(root, "_schema.arrow")):
+        raise FileNotFoundError(f"No archive for {dataset!r}; export it first.")
+    tables = []
+    for path in sorted(glob.glob(os.path.join(root, "arrow", "year=*", "part-*.arrow"))):
+        year = int(os.path.basename(os.path.dirname(path))[len("year="):])
+        if years is not None and year not in years:
+            continue
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        tables.append(table.select(columns) if columns else table)
+    if not tables:
+        schema = pa.ipc.open_file(pa.memory_map(os.path.join(root, "_schema.arrow"), "r")).schema
+        table = schema.empty_table()
+        return table.select(columns) if columns else table
+    return pa.concat_tables(tables)
+
+
+def load_archive(dataset, columns=None, years=None, user_id=None):
+    # read_archive() as a DataFrame. Numeric columns without NULLs convert
+    # without copying; the rest are materialized once.
+    return read_archive(dataset, columns, years, user_id).to_pandas(split_blocks=True)
+
+
+def iter_export(dataset, fmt="csv", user_id=None, chunk_rows=CHUNK_ROWS):
+    # One downloadable file, straight from the database, as byte chunks.
+    # CSV is encoded chunk by chunk; Parquet is written to a spooled temp
+    # file (Parquet needs its footer last) and then read back in pieces.
+    pa, pq = _pyarrow()
+    db_path = _db_path(user_id)
+    if fmt == "csv":
+        import pyarrow.csv as pacsv
+
+        header = True
+        for _, batch in _batches(dataset, db_path, chunk_rows):
+            sink = pa.BufferOutputStream()
+            pacsv.write_csv(batch, sink, pacsv.WriteOptions(include_header=header))
+            header = False
+            yield sink.getvalue().to_pybytes()
+        if header:
+            # No rows: still a valid file with the column names.
+            schema = _dataset_schema(pa, dataset, db_path)
+            yield (",".join(f'"{name}"' for name in schema.names) + "\n").encode()
+        return
+    if fmt != "parquet":
+        raise ValueError(f"Unknown export format {fmt!r}; use csv or parquet.")
+    with tempfile.SpooledTemporaryFile(max_size=STREAM_BYTES * 8) as spool:
+        writer = None
+        for _, batch in _batches(dataset, db_path, chunk_rows):
+            if writer is None:
+                writer = pq.ParquetWriter(spool, batch.schema, compression="zstd")
+            writer.write_batch(batch)
+        if writer is None:
+            writer = pq.ParquetWriter(spool, _dataset_schema(pa, dataset, db_path), compression="zstd")
+        writer.close()
+        spool.seek(0)
+        while chunk := spool.read(STREAM_BYTES):
+            yield chunk
+
+
+def export_to_file(dataset, fmt="csv", user_id=None):
+    # iter_export() into a temp file; returns it open and rewound. For
+    # callers that need a file object (st.download_button).
+    spool = tempfile.TemporaryFile()
+    for chunk in iter_export(dataset, fmt, user_id):
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export history to the Parquet/Arrow archive.")
+    parser.add_argument("--user", help="archive this user's data (default: single-user data)")
+    parser.add_argument("--dataset", action="append", choices=list(DATASETS), help="default: all")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+    for manifest in export_all(args.user, args.dataset, args.chunk_rows):
+        print(f"✅ {manifest['dataset']}: {manifest['rows']:,} rows in {len(manifest['partitions'])} partitions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# utils/cache.py
+# Streamlit-cached reads that invalidate on writes. Every table or file a
+# reader depends on has a write version in memory; write helpers call
+# bump(source) after committing, and cached readers include the current
+# versions of their sources in the cache key. A write makes the next read
+# miss exactly once; every other rerun, in any session, is served from
+# memory without querying the database.
+#
+# Sources: "body_metrics", "wearable", "meals", "simulation_history",
+# "meal_templates", "food_db". Versions and cache entries are per user
+# (utils/users.py) except for SHARED_SOURCES, so one user's writes never
+# invalidate another user's reads.
+#
+# Writes from other processes (the CLI and HTTP API in api/) cannot bump
+# this process's versions. Keys also carry the database's
+# external_version() (utils/db.py), which only moves on other processes'
+# commits, so a write here never invalidates other tables' reads. File
+# sources carry the file's size and mtime: one stat per read.
+import functools
+import itertools
+import os
+import threading
+
+from utils.db import external_version
+from utils.users import current_user, user_path
+
+# Entries kept per cached function, across all users; old versions and
+# inactive users age out.
+MAX_ENTRIES = 256
+
+# Reference data read by every user.
+SHARED_SOURCES = {"food_db"}
+
+_versions = {}
+_counter = itertools.count(1)
+_lock = threading.Lock()
+
+
+def _scope(source):
+    return (None if source in SHARED_SOURCES else current_user(), source)
+
+
+def _signature(source):
+    # Imported here: these modules use this one.
+    from utils.database import TEMPLATE_FILE
+    from utils.food_utils import FOOD_DB_PATH
+
+    if source == "meal_templates":
+        path = user_path(TEMPLATE_FILE)
+    elif source == "food_db":
+        path = FOOD_DB_PATH
+    else:
+        return external_version()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def version(source):
+    return _versions.get(_scope(source), 0)
+
+
+def bump(*sources):
+    # One process-wide counter, so versions only ever increase. Bumps the
+    # current user's sources.
+    with _lock:
+        for source in sources:
+            _versions[_scope(source)] = next(_counter)
+
+
+def cache_key(*sources):
+    # What a cached result over `sources` is keyed on: each source's
+    # scope, write version and external signature.
+    return tuple((_scope(source), version(source), _signature(source)) for source in sources)
+
+
+def cached_read(*sources, shared=False, max_entries=MAX_ENTRIES):
+    # Decorator. By default results are st.cache_data copies, safe to
+    # mutate; shared=True hands every caller the same object through
+    # st.cache_resource and is for read-only results. Streamlit is imported
+    # on first call, so scripts and CLIs that never read pay nothing.
+    def decorate(fn):
+        cached = None
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            nonlocal cached
+            if cached is None:
+                import streamlit as st
+
+                def versioned(versions, *args, **kwargs):
+                    return fn(*args, **kwargs)
+
+                # Streamlit keys caches by module and qualified name.
+                versioned.__module__ = fn.__module__
+                versioned.__qualname__ = f"{fn.__qualname__}.versioned"
+                cache = st.cache_resource if shared else st.cache_data
+                cached = cache(max_entries=max_entries, show_spinner=False)(versioned)
+            # The key carries the user of every per-user source.
+            return cached(cache_key(*sources), *args, **kwargs)
+
+        wrapper.sources = sources
+        return wrapper
+    return decorate
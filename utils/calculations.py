@@ -1,2 +1,266 @@
 # Calculations for macros, BMI, etc.
+#
+# Incremental trend statistics. Each series (weight, daily calories,
+# steps, ...) is a sequence of (epoch day, value) points in day order.
+# Per point, SeriesState yields:
+#   - rolling count, mean, variance, min and max over each WINDOWS span
+#     of calendar days;
+#   - a gap-aware EWMA.
+# Adding a point is O(1) amortized, so keeping trends current costs the
+# same however long the history is.
+#
+# The latest day stays open: meals logged later that day replace its
+# value without a recompute, because the state is kept as of the day
+# before plus that one value. A change to any earlier day is a backfill:
+# the caller rebuilds the series from scratch.
+#
+# State and outputs persist in the user database:
+#   trend_state     series -> JSON state
+#   daily_trends    one row of statistics per series and day
+#   weekly_totals   sum and day count per series and Monday-based week
+# ml/feature_store.py feeds each refresh's changed days through
+# apply_days(), inside the same write transaction.
+import collections
+import copy
+import json
+
+
 def calculate_bmi(weight, height): return weight / (height ** 2)
+
+
+# ---------- trend statistics ----------
+# Bump whenever the statistics or tables below change; the next refresh
+# drops the tables and rebuilds every series.
+TRENDS_VERSION = 1
+
+WINDOWS = (7, 30)
+# Weight of a new day in the EWMA; a gap of g days decays the old value
+# by (1 - EWMA_ALPHA) ** g.
+EWMA_ALPHA = 0.1
+
+STAT_COLUMNS = ["value"] + [
+    f"{stat}_{days}" for days in WINDOWS for stat in ("count", "mean", "var", "min", "max")
+] + ["ewma"]
+
+TRENDS_DDL = [
+    "CREATE TABLE IF NOT EXISTS trend_state (series TEXT PRIMARY KEY, state TEXT NOT NULL)",
+    f"""
+        CREATE TABLE IF NOT EXISTS daily_trends (
+            series TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            {", ".join(f"{column} REAL" for column in STAT_COLUMNS)},
+            PRIMARY KEY (series, day)
+        ) WITHOUT ROWID
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS weekly_totals (
+            series TEXT NOT NULL,
+            week INTEGER NOT NULL,
+            total REAL NOT NULL,
+            days INTEGER NOT NULL,
+            PRIMARY KEY (series, week)
+        ) WITHOUT ROWID
+    """,
+]
+
+_UPSERT_TREND = (
+    f"INSERT OR REPLACE INTO daily_trends (series, day, {', '.join(STAT_COLUMNS)}) "
+    f"VALUES (?, ?, {', '.join('?' * len(STAT_COLUMNS))})"
+)
+_ADD_WEEKLY = """
+    INSERT INTO weekly_totals (series, week, total, days) VALUES (?, ?, ?, ?)
+    ON CONFLICT (series, week) DO UPDATE SET total = total + excluded.total, days = days + excluded.days
+"""
+
+
+def week_of(day):
+    # Monday-based week number of an epoch day (1970-01-01 was a Thursday).
+    return (day + 3) // 7
+
+
+class RollingWindow:
+    # Statistics over the values of the last `days` calendar days. push()
+    # keeps running sums (shifted by the first value, which keeps the
+    # variance accurate) and two monotonic deques whose fronts are the
+    # window's min and max; evicted points leave the same way.
+    def __init__(self, days, shift=None, total=0.0, total_sq=0.0, items=(), mins=(), maxs=()):
+        self.days = days
+        self.shift = shift
+        self.total = total
+        self.total_sq = total_sq
+        self.items = collections.deque(tuple(i) for i in items)
+        self.mins = collections.deque(tuple(i) for i in mins)
+        self.maxs = collections.deque(tuple(i) for i in maxs)
+
+    def push(self, day, value):
+        if self.shift is None:
+            self.shift = value
+        shifted = value - self.shift
+        self.items.append((day, value))
+        self.total += shifted
+        self.total_sq += shifted * shifted
+        while self.mins and self.mins[-1][1] >= value:
+            self.mins.pop()
+        self.mins.append((day, value))
+        while self.maxs and self.maxs[-1][1] <= value:
+            self.maxs.pop()
+        self.maxs.append((day, value))
+
+        oldest = day - self.days
+        while self.items[0][0] <= oldest:
+            shifted = self.items.popleft()[1] - self.shift
+            self.total -= shifted
+            self.total_sq -= shifted * shifted
+        while self.mins[0][0] <= oldest:
+            self.mins.popleft()
+        while self.maxs[0][0] <= oldest:
+            self.maxs.popleft()
+
+    def stats(self):
+        # (count, mean, sample variance, min, max); variance needs two points.
+        count = len(self.items)
+        if not count:
+            return 0, None, None, None, None
+        mean = self.shift + self.total / count
+        var = max((self.total_sq - self.total * self.total / count) / (count - 1), 0.0) if count > 1 else None
+        return count, mean, var, self.mins[0][1], self.maxs[0][1]
+
+    def to_dict(self):
+        return {
+            "days": self.days, "shift": self.shift, "total": self.total, "total_sq": self.total_sq,
+            "items": list(self.items), "mins": list(self.mins), "maxs": list(self.maxs),
+        }
+
+
+def ewma_step(previous, day, value):
+    # previous: (ewma, day) or None.
+    if previous is None:
+        return value
+    ewma, last_day = previous
+    keep = (1 - EWMA_ALPHA) ** (day - last_day)
+    return keep * ewma + (1 - keep) * value
+
+
+class SeriesState:
+    # Windows and EWMA as of the day before the open day, plus the open
+    # (day, value) itself.
+    def __init__(self, windows=None, ewma=None, open_point=None):
+        self.windows = windows or {days: RollingWindow(days) for days in WINDOWS}
+        self.ewma = tuple(ewma) if ewma else None
+        self.open = tuple(open_point) if open_point else None
+
+    def commit(self):
+        # Folds the open day into the state, before a later day opens.
+        day, value = self.open
+        for window in self.windows.values():
+            window.push(day, value)
+        self.ewma = (ewma_step(self.ewma, day, value), day)
+        self.open = None
+
+    def row(self):
+        # STAT_COLUMNS for the open day.
+        day, value = self.open
+        row = [value]
+        for days in WINDOWS:
+            window = copy.deepcopy(self.windows[days])
+            window.push(day, value)
+            row += window.stats()
+        return row + [ewma_step(self.ewma, day, value)]
+
+    def to_json(self):
+        return json.dumps({
+            "windows": [w.to_dict() for w in self.windows.values()],
+            "ewma": self.ewma, "open": self.open,
+        })
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        windows = {w["days"]: RollingWindow(**w) for w in data["windows"]}
+        return cls(windows, data["ewma"], data["open"])
+
+
+# ---------- persistence (writer thread, inside the caller's transaction) ----------
+def ensure_trend_tables(conn, stored_version):
+    # Creates the tables; drops them first when their version is stale.
+    # Returns True when they were (re)created empty.
+    if stored_version == TRENDS_VERSION:
+        return False
+    for table in ("trend_state", "daily_trends", "weekly_totals"):
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    for ddl in TRENDS_DDL:
+        conn.execute(ddl)
+    return True
+
+
+def _load_state(conn, series):
+    row = conn.execute("SELECT state FROM trend_state WHERE series = ?", (series,)).fetchone()
+    return SeriesState.from_json(row[0]) if row else None
+
+
+def _save_state(conn, series, state):
+    conn.execute("INSERT OR REPLACE INTO trend_state (series, state) VALUES (?, ?)", (series, state.to_json()))
+
+
+def rebuild_series(conn, series, points):
+    # Full recompute from every (day, value) point of the series, in day
+    # order. Only needed after a backfill.
+    conn.execute("DELETE FROM daily_trends WHERE series = ?", (series,))
+    conn.execute("DELETE FROM weekly_totals WHERE series = ?", (series,))
+    conn.execute("DELETE FROM trend_state WHERE series = ?", (series,))
+    state = SeriesState()
+    rows, weeks = [], {}
+    for day, value in points:
+        if state.open:
+            state.commit()
+        state.open = (day, value)
+        rows.append((series, day, *state.row()))
+        total, days = weeks.get(week_of(day), (0.0, 0))
+        weeks[week_of(day)] = (total + value, days + 1)
+    conn.executemany(_UPSERT_TREND, rows)
+    conn.executemany(_ADD_WEEKLY, [(series, week, total, days) for week, (total, days) in weeks.items()])
+    if state.open:
+        _save_state(conn, series, state)
+    return len(rows)
+
+
+def apply_days(conn, series, points):
+    # Applies the current (day, value) of each changed day, in day order;
+    # value None means the day has no value (any more). Returns False,
+    # having written nothing, when the change is a backfill and the
+    # caller must rebuild_series() instead.
+    state = _load_state(conn, series)
+    if state is None:
+        # Nothing stored yet: the first values are a (cheap) rebuild.
+        return all(value is None for _, value in points)
+    open_day, open_value = state.open
+    if any(day == open_day and value is None for day, value in points):
+        # The committed state cannot be unwound past the open day.
+        return False
+    # An earlier day only matters if its value differs from the stored one
+    # (other series may have changed that day).
+    earlier = {day: value for day, value in points if day < open_day}
+    days = list(earlier)
+    for start in range(0, len(days), 500):
+        chunk = days[start:start + 500]
+        stored = dict(conn.execute(
+            f"SELECT day, value FROM daily_trends WHERE series = ? AND day IN ({', '.join('?' * len(chunk))})",
+            (series, *chunk),
+        ).fetchall())
+        if any(stored.get(day) != earlier[day] for day in chunk):
+            return False
+
+    for day, value in points:
+        if day < open_day or value is None:
+            # Unchanged earlier days, or later days without a value for
+            # this series: nothing to do.
+            continue
+        if day == open_day:
+            conn.execute(_ADD_WEEKLY, (series, week_of(day), value - open_value, 0))
+        else:
+            state.commit()
+            conn.execute(_ADD_WEEKLY, (series, week_of(day), value, 1))
+        state.open = open_day, open_value = day, value
+        conn.execute(_UPSERT_TREND, (series, day, *state.row()))
+    _save_state(conn, series, state)
+    return True
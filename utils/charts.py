@@ -1,2 +1,142 @@
-# Chart utilities placeholder
-def plot_chart(data): pass
+# utils/charts.py
+# Line charts for long series. line_chart() crops each series to the
+# visible x range and decimates it to POINTS_PER_PIXEL points per pixel of
+# chart width before anything reaches Plotly, so a year of minute samples
+# ships a few thousand points per trace instead of half a million:
+#
+#   "lttb"    Largest-Triangle-Three-Buckets: keeps the visual shape (default)
+#   "minmax"  each bucket's minimum and maximum: keeps every spike
+#
+# Plotly's own zoom only magnifies the decimated points; pages that offer
+# zooming pass the chosen window as x_range to get full detail inside it.
+# Given a data_key and the utils/cache.py sources behind the frame, the
+# decimated traces are cached until those sources change. Large traces
+# are drawn with WebGL (scattergl).
+import numpy as np
+import pandas as pd
+
+from utils.cache import cache_key
+
+DEFAULT_WIDTH = 700
+POINTS_PER_PIXEL = 2
+# Points per trace beyond which WebGL draws faster than SVG.
+WEBGL_POINTS = 1_000
+MAX_ENTRIES = 64
+
+_cached_decimate = None
+
+
+def lttb(x, y, n_out):
+    # Indices of the n_out points LTTB keeps, first and last included. x
+    # is numeric and ascending.
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 buckets between the fixed first and last points; each is
+    # at least one point wide because n > n_out.
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Third vertex: the next bucket's average, or the last point.
+        if i + 2 < len(edges):
+            nxt = slice(end, edges[i + 2])
+            cx, cy = x[nxt].mean(), y[nxt].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        # Twice the area of the triangle (kept point, candidate, average).
+        area = np.abs((x[a] - cx) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (cy - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(y, n_out):
+    # Indices of the minimum and maximum of n_out // 2 equal buckets, in
+    # order; spikes survive however narrow they are.
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    edges = np.linspace(0, n, max(n_out // 2, 1) + 1).astype(np.int64)
+    keep = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        segment = y[start:end]
+        keep += [start + int(segment.argmin()), start + int(segment.argmax())]
+    return np.unique(keep)
+
+
+def _numeric(values):
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[ns]").astype(np.int64).astype(float)
+    return values.astype(float)
+
+
+def decimate(df, x, columns, n_points, x_range=None, method="lttb"):
+    # {column: (x values, y values)} with at most about n_points points
+    # each. Rows must be in x order; NaNs are dropped per column. Text x
+    # values (dates) are parsed.
+    xs = df[x]
+    if not (pd.api.types.is_numeric_dtype(xs) or pd.api.types.is_datetime64_any_dtype(xs)):
+        xs = pd.to_datetime(xs)
+    xs = xs.to_numpy()
+    visible = np.ones(len(xs), dtype=bool)
+    if x_range is not None:
+        lo, hi = x_range
+        if np.issubdtype(xs.dtype, np.datetime64):
+            lo, hi = np.datetime64(pd.Timestamp(lo)), np.datetime64(pd.Timestamp(hi))
+        visible = (xs >= lo) & (xs <= hi)
+
+    traces = {}
+    for column in columns:
+        ys = df[column].to_numpy(dtype=float)
+        mask = visible & ~np.isnan(ys)
+        cx, cy = xs[mask], ys[mask]
+        keep = lttb(_numeric(cx), cy, n_points) if method == "lttb" else minmax(cy, n_points)
+        traces[column] = (cx[keep], cy[keep])
+    return traces
+
+
+def _decimate_cached(data_key, sources, df, x, columns, n_points, x_range, method):
+    global _cached_decimate
+    if _cached_decimate is None:
+        import streamlit as st
+
+        # The frame itself is not hashed (leading underscore): data_key and
+        # the sources' versions identify it.
+        def cached(key, x, columns, n_points, x_range, method, _df):
+            return decimate(_df, x, columns, n_points, x_range, method)
+
+        _cached_decimate = st.cache_resource(max_entries=MAX_ENTRIES, show_spinner=False)(cached)
+    return _cached_decimate((data_key, cache_key(*sources)), x, tuple(columns), n_points, x_range, method, df)
+
+
+def line_chart(df, x, y, title=None, x_range=None, width=DEFAULT_WIDTH, method="lttb",
+               data_key=None, sources=(), labels=None):
+    # A Plotly figure of y (a column or a list of columns) against x. Pass
+    # data_key (naming df, e.g. its loader and arguments) with the cache
+    # sources df was read from to reuse the decimated traces across reruns.
+    import plotly.graph_objects as go
+
+    columns = [y] if isinstance(y, str) else list(y)
+    labels = labels or {}
+    n_points = width * POINTS_PER_PIXEL
+    if data_key is None:
+        traces = decimate(df, x, columns, n_points, x_range, method)
+    else:
+        traces = _decimate_cached(data_key, sources, df, x, columns, n_points, x_range, method)
+
+    fig = go.Figure()
+    for column, (xs, ys) in traces.items():
+        trace = go.Scattergl if len(xs) > WEBGL_POINTS else go.Scatter
+        fig.add_trace(trace(x=xs, y=ys, mode="lines", name=labels.get(column, column)))
+    fig.update_layout(
+        title=title,
+        xaxis_title=labels.get(x, x),
+        yaxis_title=labels.get(columns[0], columns[0]) if len(columns) == 1 else labels.get("value"),
+        showlegend=len(columns) > 1,
+    )
+    if x_range is not None:
+        fig.update_xaxes(range=list(x_range))
+    return fig
@@ -1,38 +1,200 @@
-# SQLite DB operations placeholder
+# SQLite DB operations
+import hashlib
 import json
 import os
 from datetime import datetime
 
-DB_PATH = "data/meal_logs.json"
-TEMPLATE_PATH = "data/meal_templates.json"
+from utils.cache import bump, cached_read
+from utils.db import epoch_day, fetch_all, run_write
+from utils.food_index import food_version
+from utils.instrumentation import span
+from utils.migrations import ensure_schema
+from utils.users import user_path
 
+MEAL_LOG_JSON_PATH = "data/meal_logs.json"
+# Per user; see utils/users.py.
+TEMPLATE_FILE = "meal_templates.json"
+
+
+def _meal_row(name, items, nutrition, timestamp):
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    nutrition = nutrition or {}
+    return (
+        timestamp.date().isoformat(),
+        timestamp.isoformat(),
+        name,
+        json.dumps(items),
+        nutrition.get("calories", 0),
+        nutrition.get("protein", 0),
+        nutrition.get("carbs", 0),
+        nutrition.get("fats", 0),
+    )
+
+
+_INSERT_MEAL = """
+    INSERT INTO meals (date, timestamp, name, items, calories, protein, carbs, fats)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+@span("database.save_meal_log")
 def save_meal_log(name, items, nutrition, timestamp):
-    os.makedirs("data", exist_ok=True)
-    log = {
-        "name": name,
-        "items": items,
-        "nutrition": nutrition,
-        "timestamp": timestamp.isoformat()
+    ensure_schema()
+    row = _meal_row(name, items, nutrition, timestamp)
+    run_write(lambda conn: conn.execute(_INSERT_MEAL, row))
+    bump("meals")
+
+
+@span("database.load_meal_logs")
+def load_meal_logs(start_date=None, end_date=None):
+    # Date bounds are inclusive ISO dates; both are optional.
+    query = "SELECT id, date, timestamp, name, items, calories, protein, carbs, fats FROM meals"
+    clauses, params = [], []
+    if start_date is not None:
+        clauses.append("day >= ?")
+        params.append(epoch_day(start_date))
+    if end_date is not None:
+        clauses.append("day <= ?")
+        params.append(epoch_day(end_date))
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY day, id"
+
+    ensure_schema()
+    rows = fetch_all(query, params)
+
+    logs = []
+    for row_id, date, timestamp, name, items, calories, protein, carbs, fats in rows:
+        logs.append({
+            "id": row_id,
+            "date": date,
+            "name": name,
+            "items": json.loads(items) if items else [],
+            "nutrition": {"calories": calories, "protein": protein, "carbs": carbs, "fats": fats},
+            "timestamp": timestamp,
+        })
+    return logs
+
+
+def update_meal_nutrition(rows):
+    # rows: iterable of (id, calories, protein, carbs, fats)
+    params = [(calories, protein, carbs, fats, meal_id) for meal_id, calories, protein, carbs, fats in rows]
+    run_write(lambda conn: conn.executemany(
+        "UPDATE meals SET calories = ?, protein = ?, carbs = ?, fats = ? WHERE id = ?", params
+    ))
+    bump("meals")
+
+
+def migrate_json_meal_logs(json_path=MEAL_LOG_JSON_PATH):
+    # One-shot import of the legacy JSON log. The file is renamed afterwards
+    # so running this again is a no-op.
+    if not os.path.exists(json_path):
+        return 0
+
+    with open(json_path, "r") as f:
+        logs = json.load(f)
+
+    ensure_schema()
+    rows = [
+        _meal_row(log.get("name"), log.get("items", []), log.get("nutrition"), log["timestamp"])
+        for log in logs
+    ]
+    run_write(lambda conn: conn.executemany(_INSERT_MEAL, rows))
+    bump("meals")
+
+    os.replace(json_path, json_path + ".migrated")
+    return len(logs)
+
+
+# ---------- meal templates ----------
+# TEMPLATE_FILE maps each name to {"items": [...], "nutrition": {...}}.
+# The nutrition totals are precomputed on save and record the hash of
+# the items and the food_version() they were computed from. Logging a
+# template reuses them unless either changed. Legacy entries (a bare
+# item list) get their totals on first use.
+def _items_hash(items):
+    # Quantity key ("qty" or "quantity") and name case do not matter.
+    canonical = [
+        [item["food"].lower(), float(item.get("quantity", item.get("qty", 0)) or 0), (item.get("unit") or "g").lower()]
+        for item in items
+    ]
+    return hashlib.sha256(json.dumps(canonical).encode()).hexdigest()[:32]
+
+
+@cached_read("meal_templates")
+def _load_template_records():
+    path = user_path(TEMPLATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        templates = json.load(f)
+    return {
+        name: record if isinstance(record, dict) else {"items": record, "nutrition": None}
+        for name, record in templates.items()
     }
-    if os.path.exists(DB_PATH):
-        with open(DB_PATH, "r") as f:
-            logs = json.load(f)
-    else:
-        logs = []
 
-    logs.append(log)
-    with open(DB_PATH, "w") as f:
-        json.dump(logs, f, indent=4)
+
+def _save_template_records(records):
+    path = user_path(TEMPLATE_FILE)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Written aside and renamed, so readers never see half a file.
+    with open(path + ".tmp", "w") as f:
+        json.dump(records, f, indent=4)
+    os.replace(path + ".tmp", path)
+    bump("meal_templates")
+
+
+def _template_totals(items):
+    # Imported here: utils.nutrition imports this module.
+    from utils.nutrition import get_nutrition_info
+
+    version = food_version()
+    return {**get_nutrition_info(items), "items_hash": _items_hash(items), "food_version": version}
+
+
+def _is_current(nutrition, items):
+    return (
+        nutrition is not None
+        and nutrition.get("items_hash") == _items_hash(items)
+        and nutrition.get("food_version") == food_version()
+    )
+
 
 def get_meal_templates():
-    if os.path.exists(TEMPLATE_PATH):
-        with open(TEMPLATE_PATH, "r") as f:
-            return json.load(f)
-    return {}
+    # {name: items} for the current user.
+    return {name: record["items"] for name, record in _load_template_records().items()}
+
 
 def save_meal_template(name, items):
-    templates = get_meal_templates()
-    templates[name] = items
-    with open(TEMPLATE_PATH, "w") as f:
-        json.dump(templates, f, indent=4)
+    # Totals are computed now, while the user waits anyway; a food that
+    # cannot be resolved leaves them to the first use.
+    try:
+        nutrition = _template_totals(items)
+    except ValueError:
+        nutrition = None
+    records = _load_template_records()
+    records[name] = {"items": items, "nutrition": nutrition}
+    _save_template_records(records)
+
+
+def delete_meal_template(name):
+    records = _load_template_records()
+    if records.pop(name, None) is not None:
+        _save_template_records(records)
+
 
+@span("database.get_template_nutrition")
+def get_template_nutrition(name):
+    # Calories/protein/carbs/fats of a saved template: a lookup of the
+    # stored totals, recomputed (and stored) only when the items or the
+    # food data changed since. KeyError for an unknown template.
+    record = _load_template_records()[name]
+    nutrition = record["nutrition"]
+    if not _is_current(nutrition, record["items"]):
+        nutrition = _template_totals(record["items"])
+        records = _load_template_records()
+        if name in records and records[name]["items"] == record["items"]:
+            records[name] = {"items": record["items"], "nutrition": nutrition}
+            _save_template_records(records)
+    return {key: value for key, value in nutrition.items() if key not in ("items_hash", "food_version")}
@@ -0,0 +1,231 @@
+# utils/db.py
+# Shared SQLite access: one tuned connection per thread for reads, and a
+# single writer thread per database file that runs every write in order.
+# With multiple users every user has their own database file (shard);
+# functions called without db_path use the current user's (utils/users.py).
+#
+# external_version() tells readers when another process (the CLI, the
+# HTTP API, the ingest server) committed to a file. It polls PRAGMA
+# data_version on a probe connection; the writer thread discounts the
+# commits it makes itself, whose readers are told through utils/cache.py.
+import datetime
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+
+from utils.users import DATA_DIR, user_path
+
+DB_FILE = "user_data.db"
+# The single-user database, used when no user is set.
+DB_PATH = os.path.join(DATA_DIR, DB_FILE)
+
+# Compiled statements kept per connection (sqlite3's statement cache).
+STATEMENT_CACHE_SIZE = 256
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,        # ~64 MB page cache (negative = KiB)
+    "mmap_size": 268435456,      # 256 MB memory-mapped reads
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+# Read connections kept open per thread; with many shards the least
+# recently used are closed.
+MAX_THREAD_CONNECTIONS = 32
+# A shard's writer thread exits after this long without work and is
+# restarted by the next write.
+WRITER_IDLE_SECONDS = 60
+
+_EPOCH = datetime.date(1970, 1, 1)
+
+_local = threading.local()
+_writers = {}
+_writers_lock = threading.Lock()
+_probes = {}
+_probes_lock = threading.Lock()
+
+
+def current_db_path():
+    return user_path(DB_FILE)
+
+
+def connect(db_path=None):
+    # A new tuned connection; most callers want get_connection() instead.
+    db_path = db_path or current_db_path()
+    if os.path.dirname(db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, cached_statements=STATEMENT_CACHE_SIZE)
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def get_connection(db_path=None):
+    # Per-thread pooled connection for reads. Never close it; the pool
+    # does. Writes go through run_write().
+    db_path = db_path or current_db_path()
+    pool = getattr(_local, "connections", None)
+    if pool is None:
+        pool = _local.connections = OrderedDict()
+    conn = pool.get(db_path)
+    if conn is None:
+        conn = pool[db_path] = connect(db_path)
+        while len(pool) > MAX_THREAD_CONNECTIONS:
+            pool.popitem(last=False)[1].close()
+    else:
+        pool.move_to_end(db_path)
+    return conn
+
+
+def epoch_day(value):
+    # Integer day key for a date, datetime or ISO string, matching the
+    # generated `day` columns.
+    if isinstance(value, str):
+        value = datetime.date.fromisoformat(value[:10])
+    if isinstance(value, datetime.datetime):
+        value = value.date()
+    return (value - _EPOCH).days
+
+
+def read_df(query, params=(), db_path=None):
+    return pd.read_sql_query(query, get_connection(db_path), params=params)
+
+
+def fetch_all(query, params=(), db_path=None):
+    return get_connection(db_path).execute(query, params).fetchall()
+
+
+class _Probe:
+    # Per database file: a private connection whose data_version changes
+    # with every commit by another connection, the last value accounted
+    # for, and how many times a foreign commit was seen.
+    def __init__(self, db_path):
+        # Shared by every thread, one at a time under the lock.
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.seen = self._data_version()
+        self.version = 0
+
+    def _data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def poll(self, own=False):
+        # own=True: the change, if any, is the writer's own commit.
+        with self.lock:
+            current = self._data_version()
+            if current != self.seen:
+                self.seen = current
+                if not own:
+                    self.version += 1
+            return self.version
+
+    def foreign(self):
+        with self.lock:
+            self.version += 1
+
+
+def _probe(db_path):
+    with _probes_lock:
+        probe = _probes.get(db_path)
+        if probe is None:
+            probe = _probes[db_path] = _Probe(db_path)
+        return probe
+
+
+def external_version(db_path=None):
+    # Goes up when another process commits to the database; commits made
+    # through this process's writer leave it alone.
+    return _probe(db_path or current_db_path()).poll()
+
+
+class _Writer(threading.Thread):
+    # Serializes all writes to one database file. Each job runs inside its
+    # own transaction on the writer's private connection.
+    def __init__(self, db_path):
+        super().__init__(name=f"sqlite-writer:{db_path}", daemon=True)
+        self.db_path = db_path
+        self.jobs = queue.Queue()
+        self.conn = None
+
+    def _retire(self):
+        # Jobs are queued under _writers_lock, so an empty queue checked
+        # under it stays empty; later writes start a new writer.
+        with _writers_lock:
+            if not self.jobs.empty():
+                return False
+            del _writers[self.db_path]
+        self.conn.close()
+        return True
+
+    def _data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _run_job(self, fn, probe):
+        # The writer's own data_version only moves for foreign commits.
+        # Read before the job and again after the probe has absorbed this
+        # commit, it catches one slipping in between.
+        before = self._data_version()
+        probe.poll()
+        with self.conn:
+            result = fn(self.conn)
+        probe.poll(own=True)
+        if self._data_version() != before:
+            probe.foreign()
+        return result
+
+    def run(self):
+        self.conn = connect(self.db_path)
+        probe = _probe(self.db_path)
+        while True:
+            try:
+                fn, future = self.jobs.get(timeout=WRITER_IDLE_SECONDS)
+            except queue.Empty:
+                if self._retire():
+                    return
+                continue
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = self._run_job(fn, probe)
+            except BaseException as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+def submit_write(fn, db_path=None):
+    # Queue fn(conn) on the writer thread; returns a Future.
+    db_path = db_path or current_db_path()
+    future = Future()
+    with _writers_lock:
+        writer = _writers.get(db_path)
+        if writer is None:
+            writer = _writers[db_path] = _Writer(db_path)
+            writer.start()
+        writer.jobs.put((fn, future))
+    return future
+
+
+def run_write(fn, db_path=None):
+    # Run fn(conn) on the writer thread and wait for its result.
+    db_path = db_path or current_db_path()
+    writer = threading.current_thread()
+    if isinstance(writer, _Writer) and writer.db_path == db_path:
+        # Nested write from inside a job: already in its transaction.
+        return fn(writer.conn)
+    return submit_write(fn, db_path).result()
+
+
+def execute_write(query, params=(), db_path=None):
+    return run_write(lambda conn: conn.execute(query, params).rowcount, db_path)
+
+
+def executemany_write(query, rows, db_path=None):
+    return run_write(lambda conn: conn.executemany(query, rows).rowcount, db_path)
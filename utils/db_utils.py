@@ -1,21 +1,7 @@
 # util/db_utils.py
 
-import sqlite3
+from utils.migrations import ensure_schema
 
 def init_simulation_table():
-    conn = sqlite3.connect("data/user_data.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS simulation_history (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        date TEXT,
-        action TEXT,
-        food TEXT,
-        quantity REAL,
-        unit TEXT,
-        caloric_change REAL,
-        duration_days INTEGER
-    )
-    """)
-    conn.commit()
-    conn.close()
+    # simulation_history is defined once, in utils/migrations.py
+    ensure_schema()
@@ -0,0 +1,210 @@
+# utils/food_index.py
+# Persistent search index over the local food database (SQLite FTS5).
+import difflib
+import json
+import os
+import sqlite3
+
+from utils.db import get_connection, run_write
+from utils.food_utils import FOOD_DB_PATH
+from utils.instrumentation import span
+
+INDEX_PATH = "data/food_index.db"
+NUTRIENTS = ["calories", "protein", "carbs", "fats"]
+
+# Candidate pool handed to difflib for typo-tolerant ranking.
+FUZZY_CANDIDATES = 200
+
+
+def _create_index_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS foods (
+            name TEXT PRIMARY KEY,
+            calories REAL,
+            protein REAL,
+            carbs REAL,
+            fats REAL
+        )
+    """)
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS foods_fts
+        USING fts5(name, content='foods', content_rowid='rowid', tokenize='trigram')
+    """)
+    conn.execute("CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+
+def _source_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return ""
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def build_index(food_data, signature=""):
+    rows = [(name.lower(), *(info.get(n, 0) for n in NUTRIENTS)) for name, info in food_data.items()]
+
+    def write(conn):
+        _create_index_tables(conn)
+        conn.execute("DELETE FROM foods")
+        conn.executemany(
+            "INSERT OR REPLACE INTO foods (name, calories, protein, carbs, fats) VALUES (?, ?, ?, ?, ?)", rows
+        )
+        conn.execute("INSERT INTO foods_fts (foods_fts) VALUES ('rebuild')")
+        conn.execute(
+            "INSERT OR REPLACE INTO index_meta (key, value) VALUES ('source_signature', ?)",
+            (signature,),
+        )
+        _bump_food_version(conn)
+
+    run_write(write, INDEX_PATH)
+
+
+def _bump_food_version(conn):
+    conn.execute("""
+        INSERT INTO index_meta (key, value) VALUES ('food_version', 1)
+        ON CONFLICT (key) DO UPDATE SET value = value + 1
+    """)
+
+
+def food_version():
+    # Version of the nutrient values: goes up on every rebuild and whenever
+    # a known food's values change, not when new foods are added. Totals
+    # computed from food data (meal templates) record it to know when
+    # they are stale.
+    row = _open_index().execute("SELECT value FROM index_meta WHERE key = 'food_version'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def _open_index():
+    # Rebuild only when the JSON source changed since the last build.
+    signature = _source_signature(FOOD_DB_PATH)
+    conn = get_connection(INDEX_PATH)
+    try:
+        row = conn.execute("SELECT value FROM index_meta WHERE key = 'source_signature'").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    if row is None or row[0] != signature:
+        food_data = {}
+        if signature:
+            with open(FOOD_DB_PATH, "r") as f:
+                food_data = json.load(f)
+        build_index(food_data, signature)
+    return conn
+
+
+def get_food(name):
+    row = _open_index().execute(
+        "SELECT calories, protein, carbs, fats FROM foods WHERE name = ?", (name.lower(),)
+    ).fetchone()
+    if row is None:
+        return None
+    return dict(zip(NUTRIENTS, row))
+
+
+@span("food_index.get_foods")
+def get_foods(names):
+    # Batch point lookup; names missing from the index are left out.
+    names = list({name.lower() for name in names})
+    conn = _open_index()
+    found = {}
+    # Stay well under SQLite's bound-parameter limit.
+    for start in range(0, len(names), 500):
+        chunk = names[start:start + 500]
+        rows = conn.execute(
+            f"SELECT name, calories, protein, carbs, fats FROM foods WHERE name IN ({','.join('?' * len(chunk))})",
+            chunk,
+        )
+        for name, *values in rows:
+            found[name] = dict(zip(NUTRIENTS, values))
+    return found
+
+
+def upsert_food(name, nutrition):
+    _open_index()
+    name = name.lower()
+    values = tuple(nutrition.get(n, 0) for n in NUTRIENTS)
+
+    def write(conn):
+        old = conn.execute("SELECT rowid, calories, protein, carbs, fats FROM foods WHERE name = ?", (name,)).fetchone()
+        if old is not None:
+            if tuple(old[1:]) != values:
+                _bump_food_version(conn)
+            conn.execute(
+                "INSERT INTO foods_fts (foods_fts, rowid, name) VALUES ('delete', ?, ?)", (old[0], name)
+            )
+            conn.execute("DELETE FROM foods WHERE rowid = ?", (old[0],))
+        cur = conn.execute(
+            "INSERT INTO foods (name, calories, protein, carbs, fats) VALUES (?, ?, ?, ?, ?)", (name, *values)
+        )
+        conn.execute("INSERT INTO foods_fts (rowid, name) VALUES (?, ?)", (cur.lastrowid, name))
+
+    run_write(write, INDEX_PATH)
+
+
+def record_source_signature():
+    # Called after the JSON file is rewritten with rows already upserted here.
+    signature = _source_signature(FOOD_DB_PATH)
+    run_write(lambda conn: conn.execute(
+        "INSERT OR REPLACE INTO index_meta (key, value) VALUES ('source_signature', ?)", (signature,)
+    ), INDEX_PATH)
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _fts_quote(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+@span("food_index.search_foods")
+def search_foods(query, k=10):
+    # Ranking: prefix matches first, then substring matches, then fuzzy
+    # matches sharing trigrams with the query (handles typos).
+    query = (query or "").strip().lower()
+    if not query:
+        return []
+
+    conn = _open_index()
+    results = []
+    seen = set()
+
+    def add(names):
+        for name in names:
+            if name not in seen and len(results) < k:
+                seen.add(name)
+                results.append(name)
+
+    # Prefix scan on the primary-key B-tree.
+    add(r[0] for r in conn.execute(
+        "SELECT name FROM foods WHERE name >= ? AND name < ? ORDER BY name LIMIT ?",
+        (query, query + "\U0010ffff", k),
+    ))
+
+    if len(results) < k and len(query) >= 3:
+        add(r[0] for r in conn.execute(
+            "SELECT name FROM foods_fts WHERE foods_fts MATCH ? ORDER BY bm25(foods_fts) LIMIT ?",
+            (_fts_quote(query), k),
+        ))
+
+    if len(results) < k and len(query) >= 3:
+        grams = " OR ".join(_fts_quote(g) for g in sorted(_trigrams(query)))
+        candidates = [r[0] for r in conn.execute(
+            "SELECT name FROM foods_fts WHERE foods_fts MATCH ? ORDER BY bm25(foods_fts) LIMIT ?",
+            (grams, FUZZY_CANDIDATES),
+        )]
+        candidates.sort(key=lambda name: difflib.SequenceMatcher(None, query, name).ratio(), reverse=True)
+        add(candidates)
+
+    return results
+
+
+def autocomplete_options(query, k=10):
+    # Suggestions for a selectbox; keeps the typed text selectable so foods
+    # missing from the index can still be looked up online.
+    query = (query or "").strip().lower()
+    options = search_foods(query, k)
+    if query and query not in options:
+        options.append(query)
+    return options
@@ -1,8 +1,9 @@
 import json
 import os
-import requests
+from utils.cache import bump, cached_read
+from utils.nutrition_fetcher import get_fetcher
 
-FOOD_DB_PATH = "data/food_data.json"
+FOOD_DB_PATH = "data/food_db.json"
 
 # util/food_utils.py
 
@@ -25,36 +26,33 @@ def get_valid_units_for_food(food_name):
     default_units = ["g", "ml", "tbsp", "tsp", "cup", "piece"]
     return food_units.get(food_name.lower(), default_units)
 
+@cached_read("food_db")
 def load_local_food_data():
     try:
-        with open("data/food_db.json", "r") as f:
+        with open(FOOD_DB_PATH, "r") as f:
             return json.load(f)
     except FileNotFoundError:
         return {}
 
 def save_to_food_data(name, nutrition):
+    save_foods_to_food_data({name: nutrition})
+
+def save_foods_to_food_data(foods):
+    from utils.food_index import upsert_food, record_source_signature
+
+    # Update the search index in place instead of letting the rewritten
+    # JSON file trigger a full rebuild.
+    for name, nutrition in foods.items():
+        upsert_food(name, nutrition)
     data = load_local_food_data()
-    data[name.lower()] = nutrition
+    for name, nutrition in foods.items():
+        data[name.lower()] = nutrition
     with open(FOOD_DB_PATH, "w") as f:
         json.dump(data, f, indent=4)
+    bump("food_db")
+    record_source_signature()
 
 def fetch_nutrition_from_internet(food_name):
-    # You can use OpenFoodFacts or other APIs. Here's OpenFoodFacts:
-    try:
-        url = f"https://world.openfoodfacts.org/api/v0/product/{food_name.lower().replace(' ', '_')}.json"
-        response = requests.get(url)
-        data = response.json()
-
-        if 'product' not in data or 'nutriments' not in data['product']:
-            return None
-
-        nutriments = data['product']['nutriments']
-        return {
-            "calories": nutriments.get("energy-kcal_100g", 0),
-            "protein": nutriments.get("proteins_100g", 0),
-            "carbs": nutriments.get("carbohydrates_100g", 0),
-            "fats": nutriments.get("fat_100g", 0)
-        }
-
-    except Exception as e:
-        return None
+    # Goes through the shared fetcher: pooled session, timeouts and a
+    # persistent cache of hits and misses (see utils/nutrition_fetcher.py).
+    return get_fetcher().fetch(food_name)
@@ -0,0 +1,204 @@
+# utils/instrumentation.py
+# Timing (and optional allocation) spans for hot paths, recorded to a
+# local SQLite sink (data/metrics.db) and summarized on the diagnostics page.
+#
+#   @span("xgboost_model.train_xgb_models")
+#   def train_xgb_models(...): ...
+#
+#   with span("ai_predictions.forecast"):
+#       ...
+#
+# Spans nest: each records the name of the span it ran inside. Set
+# FITNESS_SPANS=0 to turn recording off, FITNESS_SPANS_MEMORY=1 to also
+# track allocations with tracemalloc (noticeably slower).
+import atexit
+import contextlib
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+from utils.db import read_df, run_write, submit_write
+
+METRICS_PATH = "data/metrics.db"
+ENABLED = os.environ.get("FITNESS_SPANS", "1") != "0"
+TRACE_MEMORY = os.environ.get("FITNESS_SPANS_MEMORY") == "1"
+
+# Spans are buffered and written in batches by the metrics writer thread.
+FLUSH_EVERY = 200
+FLUSH_INTERVAL = 2.0
+RETENTION_DAYS = 30
+
+_parent = contextvars.ContextVar("span_parent", default=None)
+_buffer = []
+_buffer_lock = threading.Lock()
+_last_flush = time.monotonic()
+_tables_ready = False
+
+
+def _create_tables(conn):
+    global _tables_ready
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS spans (
+            ts REAL NOT NULL,
+            name TEXT NOT NULL,
+            parent TEXT,
+            duration_ms REAL NOT NULL,
+            alloc_kb REAL,
+            peak_kb REAL,
+            error INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_name_ts ON spans (name, ts)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_spans_ts ON spans (ts)")
+    _tables_ready = True
+
+
+class span(contextlib.ContextDecorator):
+    def __init__(self, name):
+        self.name = name
+
+    def _recreate_cm(self):
+        # A fresh instance per decorated call keeps recursion and threads apart.
+        return span(self.name)
+
+    def __enter__(self):
+        if not ENABLED:
+            return self
+        parent = _parent.get()
+        self._token = _parent.set(self.name)
+        self._top_level = parent is None
+        self._parent_name = parent
+        self._mem_start = None
+        if TRACE_MEMORY:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            if self._top_level:
+                tracemalloc.reset_peak()
+            self._mem_start = tracemalloc.get_traced_memory()[0]
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not ENABLED:
+            return False
+        duration_ms = (time.perf_counter() - self._start) * 1000
+        alloc_kb = peak_kb = None
+        if self._mem_start is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            alloc_kb = (current - self._mem_start) / 1024
+            # The peak is only exact for top-level spans; reset_peak() is global.
+            peak_kb = (peak - self._mem_start) / 1024 if self._top_level else None
+        _parent.reset(self._token)
+        # Streamlit's st.stop()/rerun are BaseExceptions, not failures.
+        failed = exc_type is not None and issubclass(exc_type, Exception)
+        record(self.name, duration_ms, self._parent_name, alloc_kb, peak_kb, failed)
+        return False
+
+
+def record(name, duration_ms, parent=None, alloc_kb=None, peak_kb=None, error=False):
+    row = (time.time(), name, parent, duration_ms, alloc_kb, peak_kb, int(error))
+    with _buffer_lock:
+        _buffer.append(row)
+        due = len(_buffer) >= FLUSH_EVERY or time.monotonic() - _last_flush >= FLUSH_INTERVAL
+    if due:
+        flush()
+
+
+def flush(wait=False):
+    global _last_flush
+    with _buffer_lock:
+        rows = _buffer[:]
+        _buffer.clear()
+        _last_flush = time.monotonic()
+    if not rows:
+        return
+
+    def write(conn):
+        if not _tables_ready:
+            _create_tables(conn)
+        conn.executemany("INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("DELETE FROM spans WHERE ts < ?", (time.time() - RETENTION_DAYS * 86400,))
+
+    future = submit_write(write, METRICS_PATH)
+    if wait:
+        future.result()
+
+
+atexit.register(flush, wait=True)
+
+
+def load_spans(since=None, names=None):
+    # Raw spans since a unix timestamp (default: last 24 hours).
+    flush(wait=True)
+    if not _tables_ready:
+        run_write(_create_tables, METRICS_PATH)
+    since = time.time() - 86400 if since is None else since
+    query = "SELECT * FROM spans WHERE ts >= ?"
+    params = [since]
+    if names:
+        query += f" AND name IN ({','.join('?' * len(names))})"
+        params += list(names)
+    df = read_df(query + " ORDER BY ts", params, db_path=METRICS_PATH)
+    df["time"] = pd.to_datetime(df["ts"], unit="s")
+    return df
+
+
+def summarize(spans):
+    # One row per span name: count, p50/p95/max latency and mean allocation.
+    if spans.empty:
+        return pd.DataFrame(columns=["name", "count", "p50_ms", "p95_ms", "max_ms", "alloc_kb", "errors"])
+    grouped = spans.groupby("name")
+    return pd.DataFrame({
+        "count": grouped.size(),
+        "p50_ms": grouped["duration_ms"].quantile(0.5),
+        "p95_ms": grouped["duration_ms"].quantile(0.95),
+        "max_ms": grouped["duration_ms"].max(),
+        "alloc_kb": grouped["alloc_kb"].mean(),
+        "errors": grouped["error"].sum(),
+    }).sort_values("p95_ms", ascending=False).reset_index()
+
+
+def percentiles_over_time(spans, freq="1h"):
+    # p50/p95 per span name per time bucket, for plotting.
+    if spans.empty:
+        return pd.DataFrame(columns=["time", "name", "p50_ms", "p95_ms"])
+    grouped = spans.groupby([pd.Grouper(key="time", freq=freq), "name"])["duration_ms"]
+    return pd.DataFrame({
+        "p50_ms": grouped.quantile(0.5),
+        "p95_ms": grouped.quantile(0.95),
+    }).reset_index()
+
+
+def profile_call(fn, *args, **kwargs):
+    # Runs fn under cProfile. Returns (result, stats DataFrame sorted by
+    # cumulative time, raw .prof bytes for snakeviz and friends).
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn, *args, **kwargs)
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    table = pd.DataFrame([
+        {
+            "function": f"{os.path.basename(path)}:{line}({func})",
+            "calls": nc,
+            "tottime_s": tt,
+            "cumtime_s": ct,
+        }
+        for (path, line, func), (cc, nc, tt, ct, callers) in stats.stats.items()
+    ]).sort_values("cumtime_s", ascending=False).reset_index(drop=True)
+
+    with tempfile.NamedTemporaryFile(suffix=".prof", delete=False) as f:
+        dump_path = f.name
+    try:
+        stats.dump_stats(dump_path)
+        with open(dump_path, "rb") as f:
+            raw = f.read()
+    finally:
+        os.remove(dump_path)
+    return result, table, raw
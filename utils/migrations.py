@@ -0,0 +1,240 @@
+# utils/migrations.py
+# Versioned schema for the user databases (data/user_data.db, or
+# data/users/<id>/user_data.db per user). The applied version lives in
+# PRAGMA user_version; each migration runs once, in order, inside the
+# writer's transaction, and upgrades existing databases in place.
+import threading
+
+from utils.db import current_db_path, run_write
+
+# Days since 1970-01-01 for a TEXT date/datetime column; integral because
+# date() strips any time part before julianday() sees it.
+EPOCH_DAY_SQL = "CAST(julianday(date({column})) - 2440587.5 AS INTEGER)"
+
+# Tables keyed by a TEXT date that get an integer epoch-day key.
+DATED_TABLES = ["body_metrics", "wearable_data", "wearable_daily", "simulation_history", "meals"]
+
+# Tables feeding ml/feature_store.py's daily_features. Rebuilding one with
+# _rebuild_table drops its triggers; call _create_feature_triggers again.
+FEATURE_SOURCE_TABLES = ["body_metrics", "wearable_data", "wearable_daily", "meals"]
+
+_ROLLUP_COLUMNS = """
+    hr_sum REAL NOT NULL DEFAULT 0,
+    hr_count INTEGER NOT NULL DEFAULT 0,
+    hr_min REAL,
+    hr_max REAL,
+    spo2_sum REAL NOT NULL DEFAULT 0,
+    spo2_count INTEGER NOT NULL DEFAULT 0,
+    steps INTEGER NOT NULL DEFAULT 0,
+    sleep_minutes REAL NOT NULL DEFAULT 0,
+    sample_count INTEGER NOT NULL DEFAULT 0
+"""
+
+BODY_METRICS_DDL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        date TEXT PRIMARY KEY,
+        weight REAL,
+        height_cm REAL,
+        bmi REAL,
+        fat_percent REAL,
+        waist_cm REAL,
+        biceps_cm REAL,
+        lats_cm REAL
+    )
+"""
+
+SIMULATION_HISTORY_DDL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT,
+        action TEXT,
+        food TEXT,
+        quantity REAL,
+        unit TEXT,
+        caloric_change REAL,
+        duration_days INTEGER
+    )
+"""
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")]
+
+
+def _rebuild_table(conn, table, ddl):
+    # Recreate `table` from `ddl` (with a {name} placeholder), copying the
+    # columns both versions share. Later rows win on primary-key clashes.
+    old_columns = _columns(conn, table)
+    conn.execute(ddl.format(name=f"{table}__new"))
+    shared = [c for c in _columns(conn, f"{table}__new") if c in old_columns]
+    cols = ", ".join(shared)
+    conn.execute(f"INSERT OR REPLACE INTO {table}__new ({cols}) SELECT {cols} FROM {table} ORDER BY rowid")
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}__new RENAME TO {table}")
+
+
+# Daily series served to pages and models: rollup days first, then
+# manually logged / CSV-imported days that have no samples. {day} is
+# ", day" once migration 3 added the key. utils/pagination.py pages the
+# branches one by one.
+WEARABLE_DAILY_BRANCHES = [
+    """
+        SELECT date,
+               CASE WHEN hr_count > 0 THEN hr_sum / hr_count END AS heart_rate_avg,
+               CASE WHEN spo2_count > 0 THEN spo2_sum / spo2_count END AS spo2_avg,
+               sleep_minutes / 60.0 AS sleep_hours,
+               steps{day}
+        FROM wearable_daily
+    """,
+    """
+        SELECT date, heart_rate_avg, spo2_avg, sleep_hours, steps{day}
+        FROM wearable_data
+        WHERE date NOT IN (SELECT date FROM wearable_daily)
+    """,
+]
+
+
+def _create_daily_view(conn, with_day):
+    day = ", day" if with_day else ""
+    conn.execute("DROP VIEW IF EXISTS wearable_daily_view")
+    union = "UNION ALL".join(branch.format(day=day) for branch in WEARABLE_DAILY_BRANCHES)
+    conn.execute(f"CREATE VIEW wearable_daily_view AS {union}")
+
+
+def _m1_baseline(conn):
+    # Every table as the app created it before migrations existed.
+    conn.execute(BODY_METRICS_DDL.format(name="body_metrics"))
+    conn.execute(SIMULATION_HISTORY_DDL.format(name="simulation_history"))
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS wearable_data (
+            date TEXT PRIMARY KEY,
+            heart_rate_avg REAL,
+            spo2_avg REAL,
+            sleep_hours REAL,
+            steps INTEGER
+        )
+    """)
+    # ts as INTEGER PRIMARY KEY keeps samples clustered by time in the rowid B-tree.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS wearable_samples (
+            ts INTEGER PRIMARY KEY,
+            heart_rate REAL,
+            spo2 REAL,
+            steps INTEGER,
+            sleep_minutes REAL
+        )
+    """)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS wearable_hourly (hour_ts INTEGER PRIMARY KEY, {_ROLLUP_COLUMNS})")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS wearable_daily (date TEXT PRIMARY KEY, {_ROLLUP_COLUMNS})")
+    # Append-only: one row per logged meal, never rewritten.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS meals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            name TEXT,
+            items TEXT,
+            calories REAL,
+            protein REAL,
+            carbs REAL,
+            fats REAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_meals_date ON meals (date)")
+    _create_daily_view(conn, with_day=False)
+
+
+def _m2_converge_duplicates(conn):
+    # init_db.py used to create a 3-column body_metrics without a key and a
+    # simulation_history without an id; bring both to the page schemas.
+    info = {row[1]: row[5] for row in conn.execute("PRAGMA table_info(body_metrics)")}
+    if "height_cm" not in info or not info.get("date"):
+        _rebuild_table(conn, "body_metrics", BODY_METRICS_DDL)
+    if "id" not in _columns(conn, "simulation_history"):
+        _rebuild_table(conn, "simulation_history", SIMULATION_HISTORY_DDL)
+
+
+def _m3_epoch_day_keys(conn):
+    # Integer day keys, computed by SQLite from the TEXT date and indexed,
+    # so range scans and joins compare integers instead of parsing strings.
+    for table in DATED_TABLES:
+        if "day" not in _columns(conn, table):
+            conn.execute(
+                f"ALTER TABLE {table} ADD COLUMN day INTEGER "
+                f"GENERATED ALWAYS AS ({EPOCH_DAY_SQL.format(column='date')}) VIRTUAL"
+            )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_day ON {table} (day)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_simulation_history_date ON simulation_history (date)")
+    _create_daily_view(conn, with_day=True)
+
+
+def _create_feature_triggers(conn, table):
+    # NOT EXISTS rather than INSERT OR IGNORE: inside a trigger the outer
+    # statement's conflict policy wins, and an UPSERT's is ABORT.
+    for event, rows in (("INSERT", ["NEW"]), ("UPDATE", ["OLD", "NEW"]), ("DELETE", ["OLD"])):
+        marks = "".join(
+            f"INSERT INTO feature_dirty (day) SELECT {row}.day WHERE {row}.day IS NOT NULL"
+            f" AND NOT EXISTS (SELECT 1 FROM feature_dirty WHERE day = {row}.day); "
+            for row in rows
+        )
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_features
+            AFTER {event} ON {table} BEGIN {marks}END
+        """)
+
+
+def _m4_feature_tracking(conn):
+    # feature_dirty holds the days whose sources changed since
+    # ml/feature_store.py last refreshed daily_features (a derived table
+    # that module creates and versions itself). Triggers catch every
+    # writer: pages, importers and the sample rollups alike.
+    conn.execute("CREATE TABLE IF NOT EXISTS feature_dirty (day INTEGER PRIMARY KEY)")
+    conn.execute("CREATE TABLE IF NOT EXISTS feature_meta (key TEXT PRIMARY KEY, value TEXT)")
+    for table in FEATURE_SOURCE_TABLES:
+        _create_feature_triggers(conn, table)
+        conn.execute(f"INSERT OR IGNORE INTO feature_dirty (day) SELECT day FROM {table} WHERE day IS NOT NULL")
+
+
+MIGRATIONS = [
+    (1, _m1_baseline),
+    (2, _m2_converge_duplicates),
+    (3, _m3_epoch_day_keys),
+    (4, _m4_feature_tracking),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def migrate_connection(conn):
+    # Applies pending migrations; returns the list of versions applied.
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    applied = []
+    if current < SCHEMA_VERSION and not conn.in_transaction:
+        # sqlite3 would otherwise autocommit each DDL statement; this makes a
+        # failed upgrade roll back as a whole.
+        conn.execute("BEGIN")
+    for version, migration in MIGRATIONS:
+        if version > current:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            applied.append(version)
+    return applied
+
+
+def migrate(db_path=None):
+    return run_write(migrate_connection, db_path)
+
+
+_migrated = set()
+_migrated_lock = threading.Lock()
+
+
+def ensure_schema(db_path=None):
+    # Cheap after the first call per database file in a process.
+    db_path = db_path or current_db_path()
+    if db_path in _migrated:
+        return
+    with _migrated_lock:
+        if db_path not in _migrated:
+            migrate(db_path)
+            _migrated.add(db_path)
@@ -1,34 +1,123 @@
-# External API integration placeholder
-import random
+# Nutrition totals for meals, computed in batches with NumPy
+import numpy as np
+import pandas as pd
+
+from utils.database import load_meal_logs, update_meal_nutrition
+from utils.food_index import NUTRIENTS, get_foods
+from utils.food_utils import save_foods_to_food_data
+from utils.instrumentation import span
+from utils.nutrition_fetcher import get_fetcher
+
+# Grams (or ml, treated as grams) per unit when nothing food-specific is known.
+UNIT_GRAMS = {
+    "g": 1.0,
+    "gm": 1.0,
+    "ml": 1.0,
+    "tsp": 5.0,
+    "tbsp": 15.0,
+    "cup": 240.0,
+    "piece": 100.0,
+    "slice": 30.0,
+    "oz": 28.35,
+}
+
+# Food-specific overrides, keyed by (food, unit).
+FOOD_UNIT_GRAMS = {
+    ("banana", "piece"): 118.0,
+    ("egg", "piece"): 50.0,
+    ("apple", "piece"): 182.0,
+    ("grapes", "piece"): 5.0,
+    ("milk", "cup"): 244.0,
+    ("oats", "cup"): 80.0,
+    ("oats", "tbsp"): 5.0,
+    ("peanut butter", "tbsp"): 16.0,
+    ("rice", "cup"): 185.0,
+    ("yogurt", "cup"): 245.0,
+}
+
+
+def grams_per_unit(food, unit):
+    unit = (unit or "g").lower()
+    if (food, unit) in FOOD_UNIT_GRAMS:
+        return FOOD_UNIT_GRAMS[(food, unit)]
+    if unit not in UNIT_GRAMS:
+        raise ValueError(f"Unknown unit '{unit}' for '{food}'.")
+    return UNIT_GRAMS[unit]
+
+
+def _resolve_foods(names):
+    food_data = get_foods(names)
+    missing = [name for name in names if name not in food_data]
+    if not missing:
+        return food_data
+
+    # All misses are fetched concurrently in one round.
+    fetched = get_fetcher().fetch_many(missing)
+    not_found = [name for name in missing if fetched.get(name) is None]
+    if not_found:
+        raise ValueError(f"'{not_found[0]}' is not a valid food item or not found online.")
+    save_foods_to_food_data({name: fetched[name] for name in missing})
+    food_data.update({name: fetched[name] for name in missing})
+    return food_data
+
+
+@span("nutrition.batch_nutrition")
+def batch_nutrition(meals):
+    # meals: list of {"items": [...], "date": optional}. Items use "food",
+    # "quantity" (or "qty" as in templates) and "unit".
+    # Returns (per_meal, per_day) DataFrames of calories/protein/carbs/fats.
+    foods, units, quantities, meal_idx = [], [], [], []
+    for i, meal in enumerate(meals):
+        for item in meal.get("items", []):
+            foods.append(item["food"].lower())
+            units.append((item.get("unit") or "g").lower())
+            quantities.append(float(item.get("quantity", item.get("qty", 0)) or 0))
+            meal_idx.append(i)
+
+    food_names, food_idx = np.unique(np.array(foods, dtype=object), return_inverse=True)
+    food_data = _resolve_foods(list(food_names))
+
+    # Nutrients per gram, one row per distinct food.
+    per_gram = np.array(
+        [[food_data[name].get(n, 0) or 0 for n in NUTRIENTS] for name in food_names],
+        dtype=float,
+    ).reshape(len(food_names), len(NUTRIENTS)) / 100.0
+
+    # Unit conversion is looked up once per distinct (food, unit) pair.
+    pairs = list(zip(foods, units))
+    pair_keys, pair_idx = np.unique(np.array([f"{f}\0{u}" for f, u in pairs], dtype=object), return_inverse=True)
+    pair_grams = np.array([grams_per_unit(*key.split("\0")) for key in pair_keys], dtype=float)
+    grams = np.asarray(quantities, dtype=float) * pair_grams[pair_idx]
+
+    # grams eaten: meals x foods, then a single product with the nutrient matrix.
+    eaten = np.zeros((len(meals), len(food_names)))
+    np.add.at(eaten, (np.asarray(meal_idx, dtype=int), food_idx), grams)
+    totals = eaten @ per_gram
+
+    per_meal = pd.DataFrame(totals, columns=NUTRIENTS)
+    dates = [meal.get("date") for meal in meals]
+    if any(d is not None for d in dates):
+        per_meal["date"] = dates
+        per_day = per_meal.groupby("date")[NUTRIENTS].sum().round(2)
+    else:
+        per_day = pd.DataFrame(columns=NUTRIENTS)
+    per_meal[NUTRIENTS] = per_meal[NUTRIENTS].round(2)
+    return per_meal, per_day
+
 
-# Placeholder function — will be replaced later with actual API + validation
 def get_nutrition_info(items):
-    total_calories = 0
-    total_protein = 0
-    total_carbs = 0
-    total_fats = 0
-
-    for item in items:
-        name = item["food"].lower()
-        qty = item["quantity"]
-
-        if name not in food_data:
-            fetched = fetch_nutrition_from_internet(name)
-            if fetched is None:
-                raise ValueError(f"'{name}' is not a valid food item or not found online.")
-            save_to_food_data(name, fetched)
-            food_data[name] = fetched
-
-        food_info = food_data[name]
-        total_calories += (food_info["calories"] / 100) * qty
-        total_protein += (food_info["protein"] / 100) * qty
-        total_carbs += (food_info["carbs"] / 100) * qty
-        total_fats += (food_info["fats"] / 100) * qty
-
-    return {
-        "calories": round(total_calories, 2),
-        "protein": round(total_protein, 2),
-        "carbs": round(total_carbs, 2),
-        "fats": round(total_fats, 2)
-    }
+    per_meal, _ = batch_nutrition([{"items": items}])
+    return {n: round(float(per_meal.at[0, n]), 2) for n in NUTRIENTS}
+
 
+@span("nutrition.rescore_meal_history")
+def rescore_meal_history(start_date=None, end_date=None):
+    # Recompute stored totals for logged meals, e.g. after food data changed.
+    logs = load_meal_logs(start_date, end_date)
+    if not logs:
+        return 0
+    per_meal, _ = batch_nutrition(logs)
+    update_meal_nutrition(
+        (log["id"], *per_meal.loc[i, NUTRIENTS].tolist()) for i, log in enumerate(logs)
+    )
+    return len(logs)
@@ -0,0 +1,216 @@
+# utils/nutrition_fetcher.py
+# Remote nutrition lookups: pooled HTTP session, concurrent fan-out for a
+# batch of misses, persistent TTL/LRU cache and coalescing of duplicates.
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.db import get_connection, run_write, submit_write
+
+CACHE_PATH = "data/nutrition_cache.db"
+
+CACHE_TTL_SECONDS = 30 * 24 * 3600
+# Misses are retried sooner in case the food gets added upstream.
+NEGATIVE_TTL_SECONDS = 24 * 3600
+CACHE_MAX_ENTRIES = 5000
+
+MAX_WORKERS = 8
+REQUEST_TIMEOUT = (3.05, 10)
+
+
+# ---------- Backends ----------
+class OpenFoodFactsBackend:
+    URL = "https://world.openfoodfacts.org/api/v0/product/{}.json"
+
+    def __init__(self, session=None, timeout=REQUEST_TIMEOUT):
+        self.session = session or make_session()
+        self.timeout = timeout
+
+    def fetch(self, food_name):
+        # None only when the food definitely does not exist (404, or a
+        # response without a product); timeouts, connection errors and
+        # other statuses raise, so they are never cached as misses.
+        url = self.URL.format(food_name.lower().replace(" ", "_"))
+        response = self.session.get(url, timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        data = response.json()
+
+        if "product" not in data or "nutriments" not in data["product"]:
+            return None
+
+        nutriments = data["product"]["nutriments"]
+        return {
+            "calories": nutriments.get("energy-kcal_100g", 0),
+            "protein": nutriments.get("proteins_100g", 0),
+            "carbs": nutriments.get("carbohydrates_100g", 0),
+            "fats": nutriments.get("fat_100g", 0),
+        }
+
+
+class LocalBackend:
+    # Offline stand-in: serves lookups from a dict or a JSON file shaped like
+    # data/food_db.json. Useful for tests and air-gapped runs.
+    def __init__(self, foods=None, path=None, delay=0.0):
+        if path is not None:
+            with open(path, "r") as f:
+                foods = json.load(f)
+        self.foods = {name.lower(): info for name, info in (foods or {}).items()}
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, food_name):
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return self.foods.get(food_name.lower())
+
+
+def make_session(pool_size=MAX_WORKERS):
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+# ---------- Cache ----------
+class NutritionCache:
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL_SECONDS,
+                 negative_ttl=NEGATIVE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        run_write(self._create_table, path)
+
+    @staticmethod
+    def _create_table(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS nutrition_cache (
+                name TEXT PRIMARY KEY,
+                payload TEXT,
+                fetched_at REAL,
+                last_access REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_nutrition_cache_access ON nutrition_cache (last_access)")
+
+    def get_many(self, names):
+        # Returns {name: nutrition or None} for fresh entries only; None marks
+        # a cached "not found".
+        if not names:
+            return {}
+        now = time.time()
+        hits = {}
+        rows = get_connection(self.path).execute(
+            f"SELECT name, payload, fetched_at FROM nutrition_cache WHERE name IN ({','.join('?' * len(names))})",
+            list(names),
+        ).fetchall()
+        for name, payload, fetched_at in rows:
+            ttl = self.ttl if payload is not None else self.negative_ttl
+            if now - fetched_at <= ttl:
+                hits[name] = json.loads(payload) if payload is not None else None
+        # LRU bookkeeping does not need to block the lookup.
+        touched = [(now, name) for name in hits]
+        if touched:
+            submit_write(lambda conn: conn.executemany(
+                "UPDATE nutrition_cache SET last_access = ? WHERE name = ?", touched
+            ), self.path)
+        return hits
+
+    def put_many(self, results):
+        now = time.time()
+        rows = [
+            (name, json.dumps(value) if value is not None else None, now, now)
+            for name, value in results.items()
+        ]
+
+        def write(conn):
+            conn.executemany(
+                "INSERT OR REPLACE INTO nutrition_cache (name, payload, fetched_at, last_access) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            # Evict least recently used rows beyond the size cap.
+            conn.execute("""
+                DELETE FROM nutrition_cache WHERE name IN (
+                    SELECT name FROM nutrition_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+        run_write(write, self.path)
+
+
+# ---------- Fetcher ----------
+class NutritionFetcher:
+    def __init__(self, backend=None, cache=None, max_workers=MAX_WORKERS):
+        self.backend = backend or OpenFoodFactsBackend()
+        self.cache = cache if cache is not None else NutritionCache()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nutrition-fetch")
+        self._inflight = {}
+        # Re-entrant: a future finishing before add_done_callback runs its
+        # callback (which takes the lock) immediately on this thread.
+        self._lock = threading.RLock()
+
+    def _fetch_one(self, name):
+        # A backend error propagates to the caller through the future and
+        # leaves the cache alone: the next lookup tries again.
+        result = self.backend.fetch(name)
+        self.cache.put_many({name: result})
+        return result
+
+    def _submit(self, name):
+        # Coalesce: concurrent callers asking for the same name share one request.
+        with self._lock:
+            future = self._inflight.get(name)
+            if future is None:
+                future = self._executor.submit(self._fetch_one, name)
+                self._inflight[name] = future
+                future.add_done_callback(lambda _f, n=name: self._forget(n))
+            return future
+
+    def _forget(self, name):
+        with self._lock:
+            self._inflight.pop(name, None)
+
+    def fetch_many(self, names):
+        names = list(dict.fromkeys(name.lower() for name in names))
+        results = self.cache.get_many(names)
+        futures = {name: self._submit(name) for name in names if name not in results}
+        for name, future in futures.items():
+            results[name] = future.result()
+        return results
+
+    def fetch(self, name):
+        return self.fetch_many([name])[name.lower()]
+
+
+_default_fetcher = None
+_default_lock = threading.Lock()
+
+
+def get_fetcher():
+    global _default_fetcher
+    with _default_lock:
+        if _default_fetcher is None:
+            _default_fetcher = NutritionFetcher()
+        return _default_fetcher
+
+
+def set_backend(backend, cache=None):
+    # Swap the process-wide backend, e.g. LocalBackend(...) when offline.
+    global _default_fetcher
+    with _default_lock:
+        if _default_fetcher is not None:
+            _default_fetcher._executor.shutdown(wait=False)
+        _default_fetcher = NutritionFetcher(backend, cache)
+        return _default_fetcher
@@ -0,0 +1,113 @@
+# utils/pagination.py
+# Keyset pagination for the history tables. A page holds the `limit` rows
+# that come after a cursor (the key of the last row already shown), newest
+# first. SQLite reads them with an index range scan on `day` that stops
+# after limit + 1 rows. Unlike OFFSET, page 1,000 costs the same as
+# page 1, and rows inserted meanwhile do not shift later pages. Date
+# filters bound the same range scan.
+#
+# paged_table() is the Streamlit component: it renders one page with
+# Newer/Older buttons and prefetches the next page into the read cache
+# (utils/cache.py), so paging forward is served from memory.
+import datetime
+
+import pandas as pd
+
+from utils.cache import cached_read
+from utils.db import epoch_day, read_df
+from utils.migrations import WEARABLE_DAILY_BRANCHES
+
+PAGE_SIZE = 50
+
+# Source -> (relations, key columns, cache source). The key is unique
+# within the source and led by the indexed `day` (a one-column index on
+# day also orders by rowid, which `id` aliases). The wearable daily view
+# is a UNION ALL; ordering it sorts the whole date window, so its
+# branches are paged one by one and merged.
+SOURCES = {
+    "simulation_history": (["simulation_history"], ("day", "id"), "simulation_history"),
+    "meals": (["meals"], ("day", "id"), "meals"),
+    "body_metrics": (["body_metrics"], ("day",), "body_metrics"),
+    "wearable": ([f"({branch.format(day=', day')})" for branch in WEARABLE_DAILY_BRANCHES], ("day",), "wearable"),
+}
+
+# Bounds for an open-ended date filter.
+_MIN_DAY, _MAX_DAY = -2**62, 2**62
+
+
+def fetch_page(source, cursor=None, start_day=None, end_day=None, limit=PAGE_SIZE, db_path=None):
+    # (rows, next cursor). cursor=None starts at the newest row; the next
+    # cursor is None on the last page. Days are epoch days, inclusive.
+    relations, keys, _ = SOURCES[source]
+    end_day = _MAX_DAY if end_day is None else end_day
+    where = "day >= ? AND day <= ?"
+    if cursor is not None:
+        # The planner bounds the index scan with the plain `day <= ?`, not
+        # the row value, so that bound has to start at the cursor's day.
+        end_day = min(end_day, cursor[0])
+        where += f" AND ({', '.join(keys)}) < ({', '.join('?' * len(keys))})"
+    params = [_MIN_DAY if start_day is None else start_day, end_day, *(cursor or ())]
+    order = ", ".join(f"{key} DESC" for key in keys)
+    frames = [
+        read_df(f"SELECT * FROM {relation} WHERE {where} ORDER BY {order} LIMIT ?", (*params, limit + 1), db_path)
+        for relation in relations
+    ]
+    rows = [df for df in frames if not df.empty]
+    if len(rows) > 1:
+        df = pd.concat(rows, ignore_index=True).sort_values(list(keys), ascending=False, ignore_index=True)
+    else:
+        df = rows[0] if rows else frames[0]
+    if len(df) <= limit:
+        return df, None
+    # Plain ints: sqlite3 cannot bind numpy integers.
+    return df.head(limit), tuple(int(df.at[limit - 1, key]) for key in keys)
+
+
+# Per source, so a write only drops that source's pages.
+_cached_pages = {name: cached_read(cache)(fetch_page) for name, (_, _, cache) in SOURCES.items()}
+
+
+def date_range_filter(key):
+    # "From"/"To" inputs; returns inclusive (start_day, end_day), None
+    # for an open end.
+    import streamlit as st
+
+    col1, col2 = st.columns(2)
+    start = col1.date_input("From", value=None, min_value=datetime.date(1970, 1, 1), key=f"{key}_from")
+    end = col2.date_input("To", value=None, min_value=datetime.date(1970, 1, 1), key=f"{key}_to")
+    return (epoch_day(start) if start else None, epoch_day(end) if end else None)
+
+
+def paged_table(source, key, start_day=None, end_day=None, page_size=PAGE_SIZE, date_filter=True):
+    # Renders `source` one page at a time and returns the visible page.
+    # date_filter=True shows its own date inputs; pass False to use the
+    # given start_day/end_day. The cursor stack lives in
+    # st.session_state[key] and restarts when the filter changes.
+    import streamlit as st
+
+    if date_filter:
+        start_day, end_day = date_range_filter(key)
+    state = st.session_state.setdefault(key, {"filters": None, "cursors": [None]})
+    if state["filters"] != (start_day, end_day, page_size):
+        state.update(filters=(start_day, end_day, page_size), cursors=[None])
+    cursors = state["cursors"]
+
+    read_page = _cached_pages[source]
+    page, next_cursor = read_page(source, cursors[-1], start_day, end_day, page_size)
+    if page.empty and len(cursors) > 1:
+        # The rows behind this cursor were deleted; start over.
+        del cursors[1:]
+        page, next_cursor = read_page(source, None, start_day, end_day, page_size)
+    if page.empty:
+        return page
+
+    st.dataframe(page, hide_index=True)
+    newer, label, older = st.columns([1, 4, 1])
+    newer.button("◀ Newer", key=f"{key}_newer", disabled=len(cursors) == 1, on_click=cursors.pop)
+    label.caption(f"Page {len(cursors)}")
+    older.button("Older ▶", key=f"{key}_older", disabled=next_cursor is None,
+                 on_click=cursors.append, args=(next_cursor,))
+    if next_cursor is not None:
+        # Prefetch: warms the cache for the Older button.
+        read_page(source, next_cursor, start_day, end_day, page_size)
+    return page
@@ -0,0 +1,92 @@
+# utils/users.py
+# Multi-user storage. Each user gets their own directory under data/users/
+# holding their SQLite shard, trained models and meal templates, so one
+# user's queries, writes and training never touch another user's files
+# (and each shard has its own writer thread, see utils/db.py).
+#
+# The current user is a context variable: pages set it once per rerun with
+# select_user(), scripts with set_user() or using_user(). With no user set
+# everything resolves to the single-user layout directly under data/.
+# The food DB, food index and nutrition cache are reference data and stay
+# shared.
+import contextlib
+import contextvars
+import os
+import re
+
+DATA_DIR = "data"
+USERS_DIR = os.path.join(DATA_DIR, "users")
+
+_VALID_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+_current = contextvars.ContextVar("fitness_user", default=None)
+
+
+def validate_user_id(user_id):
+    # Ids become directory names; reject anything that could escape USERS_DIR.
+    if not isinstance(user_id, str) or not _VALID_ID.match(user_id) or ".." in user_id:
+        raise ValueError(f"Invalid user id {user_id!r}: use up to 64 letters, digits, '.', '_' or '-'.")
+    return user_id
+
+
+def current_user():
+    return _current.get()
+
+
+def set_user(user_id):
+    # None switches back to the single-user layout.
+    if user_id is not None:
+        validate_user_id(user_id)
+    _current.set(user_id)
+
+
+@contextlib.contextmanager
+def using_user(user_id):
+    if user_id is not None:
+        validate_user_id(user_id)
+    token = _current.set(user_id)
+    try:
+        yield user_id
+    finally:
+        _current.reset(token)
+
+
+def user_path(filename, user_id=None):
+    # Where a per-user file lives for user_id (default: the current user).
+    user_id = user_id or current_user()
+    if user_id is None:
+        return os.path.join(DATA_DIR, filename)
+    return os.path.join(USERS_DIR, user_id, filename)
+
+
+def list_users():
+    try:
+        return sorted(
+            name for name in os.listdir(USERS_DIR)
+            if _VALID_ID.match(name) and os.path.isdir(os.path.join(USERS_DIR, name))
+        )
+    except FileNotFoundError:
+        return []
+
+
+def select_user():
+    # Sidebar picker for Streamlit pages. The choice comes from ?user=<id>
+    # on first load and is kept in session state across pages; blank means
+    # the single-user data. Sets and returns the current user.
+    import streamlit as st
+
+    if "user_id" not in st.session_state:
+        st.session_state.user_id = st.query_params.get("user", "")
+    user_id = st.sidebar.text_input("👤 User", key="user_id",
+                                    help="Each user has separate data, models and templates.").strip()
+    if not user_id:
+        set_user(None)
+        st.query_params.pop("user", None)
+        return None
+    try:
+        set_user(user_id)
+    except ValueError as e:
+        st.sidebar.error(str(e))
+        st.stop()
+    st.query_params["user"] = user_id
+    return user_id
@@ -0,0 +1,163 @@
+# utils/wearable_import.py
+# Streaming importer for wearable CSV exports. Also usable from the shell:
+#   python -m utils.wearable_import export.csv [--chunksize 50000] [--rejects rejects.csv]
+#   python -m utils.wearable_import samples.csv --samples
+#   python -m utils.wearable_import export.csv --user alice
+import argparse
+import sys
+
+import pandas as pd
+
+from utils.cache import bump
+from utils.db import submit_write
+from utils.instrumentation import span
+from utils.migrations import ensure_schema
+from utils.users import using_user
+from utils.wearable_store import SAMPLE_COLUMNS, insert_samples
+
+WEARABLE_COLUMNS = ["date", "heart_rate_avg", "spo2_avg", "sleep_hours", "steps"]
+
+# Inclusive plausible ranges; empty cells are stored as NULL, anything
+# unparseable or outside these bounds rejects the row.
+VALID_RANGES = {
+    "heart_rate_avg": (20, 250),
+    "spo2_avg": (50, 100),
+    "sleep_hours": (0, 24),
+    "steps": (0, 200_000),
+}
+
+# Minute-level samples: ts (epoch seconds or any parseable timestamp) plus
+# the readings taken during that minute.
+SAMPLE_RANGES = {
+    "heart_rate": (20, 250),
+    "spo2": (50, 100),
+    "steps": (0, 10_000),
+    "sleep_minutes": (0, 60),
+}
+
+CHUNKSIZE = 50_000
+# Keep memory bounded on very dirty files; the count is always exact.
+MAX_REPORTED_REJECTS = 1000
+
+
+def write_wearable_rows(conn, df):
+    # One executemany inside one transaction; NaN becomes NULL.
+    rows = df[WEARABLE_COLUMNS].astype(object).where(df[WEARABLE_COLUMNS].notna(), None)
+    with conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO wearable_data (date, heart_rate_avg, spo2_avg, sleep_hours, steps)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows.itertuples(index=False, name=None))
+    return len(rows)
+
+
+def _parse_timestamps(raw):
+    numeric = pd.to_numeric(raw, errors="coerce")
+    if numeric.notna().all():
+        return numeric.round()
+    parsed = pd.to_datetime(raw, errors="coerce", utc=True)
+    seconds = (parsed - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(seconds=1)
+    return numeric.fillna(seconds.astype("float64"))
+
+
+def validate_chunk(chunk, samples=False):
+    # Returns (clean rows, rejected rows with a "reason" column).
+    columns = SAMPLE_COLUMNS if samples else WEARABLE_COLUMNS
+    ranges = SAMPLE_RANGES if samples else VALID_RANGES
+    missing = [c for c in columns if c not in chunk.columns]
+    if samples:
+        # Readings are optional per sample; only the timestamp is required.
+        for col in missing:
+            if col != "ts":
+                chunk[col] = None
+        missing = [col for col in missing if col == "ts"]
+    if missing:
+        raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+
+    clean = pd.DataFrame(index=chunk.index)
+    reason = pd.Series("", index=chunk.index, dtype=object)
+
+    if samples:
+        ts = _parse_timestamps(chunk["ts"])
+        reason = reason.mask(ts.isna(), "invalid ts")
+        clean["ts"] = ts
+    else:
+        dates = pd.to_datetime(chunk["date"], errors="coerce")
+        reason = reason.mask(dates.isna() & (reason == ""), "invalid date")
+        clean["date"] = dates.dt.strftime("%Y-%m-%d")
+
+    for col, (low, high) in ranges.items():
+        raw = chunk[col]
+        values = pd.to_numeric(raw, errors="coerce")
+        unparseable = values.isna() & raw.notna() & (raw.astype(str).str.strip() != "")
+        out_of_range = values.notna() & ~values.between(low, high)
+        reason = reason.mask((unparseable | out_of_range) & (reason == ""), f"invalid {col}")
+        clean[col] = values
+
+    clean["steps"] = clean["steps"].round()
+    ok = (reason == "").to_numpy()
+    rejected = chunk.loc[~ok].assign(reason=reason[~ok])
+    return clean.loc[ok], rejected
+
+
+@span("wearable_import.import_wearable_csv")
+def import_wearable_csv(source, chunksize=CHUNKSIZE, progress=None, db_path=None, samples=False):
+    # source: path or file-like. progress(report) is called after each chunk.
+    # With samples=True rows go to wearable_samples and its rollups instead
+    # of the one-row-per-day wearable_data table.
+    report = {"rows_read": 0, "rows_written": 0, "rows_rejected": 0, "rejects": []}
+    writer = insert_samples if samples else write_wearable_rows
+
+    ensure_schema(db_path)
+    # The next chunk is parsed and validated while the writer thread
+    # commits the previous one.
+    pending = None
+    for chunk in pd.read_csv(source, chunksize=chunksize, dtype=str, skipinitialspace=True):
+        clean, rejected = validate_chunk(chunk, samples)
+        if pending is not None:
+            report["rows_written"] += pending.result()
+        pending = submit_write(lambda conn, rows=clean: writer(conn, rows), db_path)
+        report["rows_read"] += len(chunk)
+        report["rows_rejected"] += len(rejected)
+
+        room = MAX_REPORTED_REJECTS - len(report["rejects"])
+        if room > 0 and not rejected.empty:
+            # +2: header line plus 1-based line numbers.
+            for line, row in zip(rejected.index[:room] + 2, rejected.head(room).to_dict("records")):
+                report["rejects"].append({"line": int(line), **row})
+
+        if progress is not None:
+            progress(report)
+    if pending is not None:
+        report["rows_written"] += pending.result()
+    if report["rows_written"]:
+        bump("wearable")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a wearable CSV export into the tracker DB.")
+    parser.add_argument("csv_path")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument("--db", help="database file (default: the user's, or data/user_data.db)")
+    parser.add_argument("--user", help="import into this user's data")
+    parser.add_argument("--rejects", help="write rejected rows (with reasons) to this CSV")
+    parser.add_argument("--samples", action="store_true",
+                        help="file holds minute-level samples (ts, heart_rate, spo2, steps, sleep_minutes)")
+    args = parser.parse_args(argv)
+
+    def progress(report):
+        print(f"\r{report['rows_read']:,} rows read, {report['rows_rejected']:,} rejected",
+              end="", file=sys.stderr, flush=True)
+
+    with using_user(args.user):
+        report = import_wearable_csv(args.csv_path, args.chunksize, progress, args.db, args.samples)
+    print(file=sys.stderr)
+    print(f"✅ Imported {report['rows_written']:,} rows ({report['rows_rejected']:,} rejected).")
+    if args.rejects and report["rejects"]:
+        pd.DataFrame(report["rejects"]).to_csv(args.rejects, index=False)
+    return 0 if report["rows_written"] or not report["rows_read"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
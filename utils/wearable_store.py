@@ -0,0 +1,105 @@
+# utils/wearable_store.py
+# Minute-level wearable samples with hourly and daily rollups that are
+# updated incrementally as samples arrive. Timestamps are epoch seconds
+# (UTC); days and hours are bucketed in UTC.
+import pandas as pd
+
+from utils.instrumentation import span
+
+SAMPLE_COLUMNS = ["ts", "heart_rate", "spo2", "steps", "sleep_minutes"]
+
+# Tables and the daily view are defined in utils/migrations.py.
+
+_ROLLUP_SELECT = """
+    COALESCE(SUM(heart_rate), 0), COUNT(heart_rate), MIN(heart_rate), MAX(heart_rate),
+    COALESCE(SUM(spo2), 0), COUNT(spo2),
+    COALESCE(SUM(steps), 0), COALESCE(SUM(sleep_minutes), 0), COUNT(*)
+"""
+
+_ROLLUP_MERGE = """
+    hr_sum = hr_sum + excluded.hr_sum,
+    hr_count = hr_count + excluded.hr_count,
+    hr_min = MIN(COALESCE(hr_min, excluded.hr_min), COALESCE(excluded.hr_min, hr_min)),
+    hr_max = MAX(COALESCE(hr_max, excluded.hr_max), COALESCE(excluded.hr_max, hr_max)),
+    spo2_sum = spo2_sum + excluded.spo2_sum,
+    spo2_count = spo2_count + excluded.spo2_count,
+    steps = steps + excluded.steps,
+    sleep_minutes = sleep_minutes + excluded.sleep_minutes,
+    sample_count = sample_count + excluded.sample_count
+"""
+
+_ROLLUP_FIELDS = """
+    hr_sum, hr_count, hr_min, hr_max, spo2_sum, spo2_count, steps, sleep_minutes, sample_count
+"""
+
+
+@span("wearable_store.insert_samples")
+def insert_samples(conn, samples):
+    # samples: DataFrame (or records) with SAMPLE_COLUMNS; ts in epoch seconds.
+    # Samples whose ts is already stored are ignored, so re-sending a batch
+    # never double-counts in the rollups. Returns the number of new samples.
+    df = pd.DataFrame(samples)
+    for col in SAMPLE_COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    if pd.api.types.is_datetime64_any_dtype(df["ts"]):
+        df["ts"] = df["ts"].astype("datetime64[s]").astype("int64")
+    else:
+        df["ts"] = pd.to_numeric(df["ts"]).astype("int64")
+    df = df[SAMPLE_COLUMNS].astype(object).where(df[SAMPLE_COLUMNS].notna(), None)
+
+    with conn:
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS staged_samples (
+                ts INTEGER PRIMARY KEY, heart_rate REAL, spo2 REAL, steps INTEGER, sleep_minutes REAL
+            )
+        """)
+        conn.execute("DELETE FROM temp.staged_samples")
+        conn.executemany(
+            "INSERT OR IGNORE INTO temp.staged_samples VALUES (?, ?, ?, ?, ?)",
+            df.itertuples(index=False, name=None),
+        )
+        conn.execute("DELETE FROM temp.staged_samples WHERE ts IN (SELECT ts FROM main.wearable_samples)")
+        inserted = conn.execute("SELECT COUNT(*) FROM temp.staged_samples").fetchone()[0]
+
+        conn.execute("INSERT INTO wearable_samples SELECT * FROM temp.staged_samples")
+        # Rollups only see the new samples; existing buckets are merged in place.
+        conn.execute(f"""
+            INSERT INTO wearable_hourly (hour_ts, {_ROLLUP_FIELDS})
+            SELECT ts / 3600 * 3600, {_ROLLUP_SELECT}
+            FROM temp.staged_samples WHERE true GROUP BY ts / 3600
+            ON CONFLICT (hour_ts) DO UPDATE SET {_ROLLUP_MERGE}
+        """)
+        conn.execute(f"""
+            INSERT INTO wearable_daily (date, {_ROLLUP_FIELDS})
+            SELECT date(ts, 'unixepoch'), {_ROLLUP_SELECT}
+            FROM temp.staged_samples WHERE true GROUP BY date(ts, 'unixepoch')
+            ON CONFLICT (date) DO UPDATE SET {_ROLLUP_MERGE}
+        """)
+        conn.execute("DELETE FROM temp.staged_samples")
+    return inserted
+
+
+@span("wearable_store.load_daily_wearable")
+def load_daily_wearable(conn, start_day=None, end_day=None):
+    # Inclusive epoch-day bounds; both branches of the view filter on
+    # their indexed day column.
+    bounds = (start_day if start_day is not None else -2**62, end_day if end_day is not None else 2**62)
+    return pd.read_sql_query(
+        "SELECT * FROM wearable_daily_view WHERE day >= ? AND day <= ? ORDER BY day", conn, params=bounds
+    )
+
+
+def load_hourly_wearable(conn, start_ts=None, end_ts=None):
+    query = """
+        SELECT hour_ts,
+               CASE WHEN hr_count > 0 THEN hr_sum / hr_count END AS heart_rate_avg,
+               hr_min, hr_max,
+               CASE WHEN spo2_count > 0 THEN spo2_sum / spo2_count END AS spo2_avg,
+               steps, sleep_minutes
+        FROM wearable_hourly
+        WHERE hour_ts >= ? AND hour_ts <= ?
+        ORDER BY hour_ts
+    """
+    bounds = (start_ts if start_ts is not None else -2**62, end_ts if end_ts is not None else 2**62)
+    return pd.read_sql_query(query, conn, params=bounds)